@@ -0,0 +1,68 @@
+# RCA/bench_llm.py
+#
+# Measure RCA prompt throughput against the local mock LLM server, sequential
+# versus LLMExecutor:
+#   python -m RCA.bench_llm --prompts 200 --latency-ms 500 --concurrency 16 --rpm 1200
+
+import argparse
+import time
+
+from RCA.llm_executor import LLMExecutor
+from RCA.llm_providers import GroqProvider
+from RCA.mock_llm_server import MockLLMConfig, start_mock_server
+
+
+def sample_messages(i):
+    return [
+        {"role": "system", "content": "You are an expert in root cause analysis of service outages and transaction failures."},
+        {"role": "user", "content": f"Service: Gateway_A\nMetric: latency_ms\nValue: {2500 + i}\n"
+                                    "What is the likely root cause and a possible fix?"},
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RCA LLM throughput benchmark")
+    parser.add_argument("--prompts", type=int, default=100)
+    parser.add_argument("--latency-ms", type=float, default=500)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--server-rpm", type=float, default=0, help="Rate limit enforced by the mock server")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--rpm", type=float, default=1200, help="Client-side request budget")
+    parser.add_argument("--tpm", type=float, default=1_000_000, help="Client-side token budget")
+    parser.add_argument("--skip-sequential", action="store_true")
+    args = parser.parse_args()
+
+    config = MockLLMConfig(args.latency_ms, args.latency_ms / 5, args.server_rpm, args.error_rate)
+    server, base_url = start_mock_server(config)
+    provider = GroqProvider(api_key="mock", model="mock", base_url=base_url)
+
+    def prompt(i):
+        return provider.complete(sample_messages(i), temperature=0.4)
+
+    items = [(i,) for i in range(args.prompts)]
+    print(f"{args.prompts} prompts, mock latency {args.latency_ms:.0f}ms")
+
+    if not args.skip_sequential:
+        start = time.perf_counter()
+        for (i,) in items:
+            try:
+                prompt(i)
+            except Exception:
+                pass
+        elapsed = time.perf_counter() - start
+        print(f"sequential:  {elapsed:7.2f}s  {args.prompts / elapsed:7.2f} prompts/s")
+
+    executor = LLMExecutor(max_workers=args.concurrency, requests_per_minute=args.rpm,
+                           tokens_per_minute=args.tpm, base_delay=0.2)
+    start = time.perf_counter()
+    results = executor.map(prompt, items)
+    elapsed = time.perf_counter() - start
+    failed = sum(isinstance(r, Exception) for r in results)
+    print(f"executor x{args.concurrency}: {elapsed:7.2f}s  {args.prompts / elapsed:7.2f} prompts/s  "
+          f"failed={failed} stats={executor.stats}")
+    print(f"server stats: {config.stats}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,89 @@
+import time
 import pandas as pd
 from memory.db import get_engine
 import json
 
-from sqlalchemy import Table, MetaData
+from sqlalchemy import Table, MetaData, text
 from sqlalchemy.dialects.mysql import insert as mysql_insert
-from vectordb.add_to_db import add_failure_summary
+from vectordb.store import get_vector_store, store_lock
+from vectordb.embeddings import embed_texts
+
+# Columns copied from lamx_transactions into the new_uploaded_data staging table
+STAGED_COLUMNS = ['txn_id', 'acc_no', 'status', 'amount', 'gateway', 'region', 'service',
+                  'trace_id', 'span_id', 'error_code', 'latency_ms', 'cpu', 'memory_usage',
+                  'error_count', 'total_requests', 'timestamp', 'serial_no']
 
 class FailureDetectionAgent:
     def __init__(self):
         self.engine = get_engine()
 
+    def stage_new_data(self):
+        """
+        Copy failed transactions newer than the latest processed anomaly from
+        lamx_transactions into new_uploaded_data, which load_logs reads.
+        """
+        with self.engine.connect() as conn:
+            conn.execute(text("""
+                CREATE TABLE IF NOT EXISTS new_uploaded_data (
+                    id INT AUTO_INCREMENT PRIMARY KEY,
+                    txn_id VARCHAR(255),
+                    acc_no VARCHAR(255),
+                    status VARCHAR(50),
+                    amount DECIMAL(10,2),
+                    gateway VARCHAR(100),
+                    region VARCHAR(100),
+                    service VARCHAR(100),
+                    trace_id VARCHAR(255),
+                    span_id VARCHAR(255),
+                    error_code VARCHAR(100),
+                    latency_ms INT,
+                    cpu DECIMAL(5,2),
+                    memory_usage DECIMAL(5,2),
+                    error_count INT,
+                    total_requests INT,
+                    timestamp DATETIME,
+                    serial_no INT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """))
+            conn.commit()
+
+        with self.engine.connect() as conn:
+            # Get the latest processed timestamp from anomaly_logs
+            result = conn.execute(text("""
+                SELECT MAX(timestamp) as latest_processed
+                FROM anomaly_logs
+                WHERE timestamp IS NOT NULL
+            """)).fetchone()
+            latest_processed = result[0] if result and result[0] else None
+
+            # Filter columns that exist in lamx_transactions
+            lamx_columns = [col[0] for col in conn.execute(text("SHOW COLUMNS FROM lamx_transactions")).fetchall()]
+            columns_str = ', '.join(col for col in STAGED_COLUMNS if col in lamx_columns)
+
+            if latest_processed:
+                result = conn.execute(text(f"""
+                    INSERT INTO new_uploaded_data ({columns_str})
+                    SELECT {columns_str}
+                    FROM lamx_transactions
+                    WHERE timestamp > :latest_processed AND status = 'fail' AND latency_ms IS NOT NULL
+                """), {"latest_processed": latest_processed})
+            else:
+                # If no previous data, process all failed transactions
+                result = conn.execute(text(f"""
+                    INSERT INTO new_uploaded_data ({columns_str})
+                    SELECT {columns_str}
+                    FROM lamx_transactions
+                    WHERE status = 'fail' AND latency_ms IS NOT NULL
+                """))
+            conn.commit()
+        return result.rowcount
+
+    def clear_staged_data(self):
+        with self.engine.connect() as conn:
+            conn.execute(text("DELETE FROM new_uploaded_data"))
+            conn.commit()
+
     def load_logs(self):
         query = """
         SELECT *,
@@ -71,7 +145,7 @@ class FailureDetectionAgent:
         print(json.dumps(formatted, indent=2))
         return formatted
 
-    def save_anomalies(self, anomalies):
+    def save_anomalies(self, anomalies, index_failures=True):
         metadata = MetaData()
         metadata.reflect(bind=self.engine)
         table = metadata.tables.get("anomaly_logs")
@@ -80,24 +154,52 @@ class FailureDetectionAgent:
             print("Table anomaly_logs not found.")
             return
 
-        with self.engine.connect() as conn:
-            for anomaly in anomalies:
-                stmt = mysql_insert(table).values(
-                    txn_id=anomaly["txn_id"],
-                    service=anomaly["service"],
-                    metric=anomaly["metric"],
-                    value=anomaly["value"],
-                    timestamp=anomaly["timestamp"],
-                    z_score=anomaly["z_score"]
-                )
-                conn.execute(stmt)
-            conn.commit()
+        if anomalies:
+            with self.engine.connect() as conn:
+                conn.execute(mysql_insert(table), [{
+                    "txn_id": anomaly["txn_id"],
+                    "service": anomaly["service"],
+                    "metric": anomaly["metric"],
+                    "value": anomaly["value"],
+                    "timestamp": anomaly["timestamp"],
+                    "z_score": anomaly["z_score"]
+                } for anomaly in anomalies])
+                conn.commit()
         print(f"{len(anomalies)} anomalies saved to MySQL.")
 
         # Also store fingerprint to Chroma
+        if index_failures:
+            self.index_failures(anomalies)
+
+    def index_failures(self, anomalies):
+        """Store one failure_log fingerprint per transaction in the vector store, in one batch."""
+        docs = {}
         for anomaly in anomalies:
-            summary = f"{anomaly['service']} {anomaly['metric']} anomaly: {anomaly['value']} at {anomaly['timestamp']}"
-            add_failure_summary(summary, anomaly['txn_id'], anomaly['service'], f"{anomaly['metric']}_spike")
+            doc_id = f"log_{str(anomaly['txn_id'])[:8]}"
+            if doc_id in docs:
+                continue
+            docs[doc_id] = (
+                f"{anomaly['service']} {anomaly['metric']} anomaly: {anomaly['value']} at {anomaly['timestamp']}",
+                {
+                    "txn_id": anomaly["txn_id"],
+                    "service": anomaly["service"],
+                    "error_code": f"{anomaly['metric']}_spike",
+                    "type": "failure_log",
+                    "created_at": int(time.time())
+                }
+            )
+        if not docs:
+            return
+        summaries = [doc for doc, _ in docs.values()]
+        embeddings = embed_texts(summaries)
+        with store_lock:
+            get_vector_store().add(
+                ids=list(docs),
+                embeddings=embeddings,
+                documents=summaries,
+                metadatas=[meta for _, meta in docs.values()]
+            )
+        print(f"Added {len(docs)} failure summaries to the vector store.")
 
 if __name__ == "__main__":
     agent = FailureDetectionAgent()
@@ -0,0 +1,94 @@
+# RCA/incident_clustering.py
+
+import os
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+load_dotenv()
+
+RCA_CLUSTER_INCIDENTS = os.getenv("RCA_CLUSTER_INCIDENTS", "true").lower() == "true"
+# Anomalies on the same service closer than this (chained) belong to one outage window
+RCA_INCIDENT_WINDOW_MINUTES = float(os.getenv("RCA_INCIDENT_WINDOW_MINUTES", 30))
+# Minimum cosine similarity between anomaly descriptions inside one incident
+RCA_INCIDENT_SIMILARITY = float(os.getenv("RCA_INCIDENT_SIMILARITY", 0.85))
+
+
+# Rows per side of the similarity tiles compared at once, so memory stays at
+# O(BLOCK_SIZE^2) however large a segment grows
+BLOCK_SIZE = int(os.getenv("RCA_INCIDENT_BLOCK_SIZE", 1024))
+
+
+def _find(parent, rows):
+    roots = parent[rows]
+    while True:
+        up = parent[roots]
+        if np.array_equal(up, roots):
+            break
+        roots = up
+    parent[rows] = roots
+    return roots
+
+
+def _union(parent, a, b):
+    """Merge the sets of every pair (a[k], b[k]); each root points at the smallest row of its set."""
+    while len(a):
+        root_a, root_b = _find(parent, a), _find(parent, b)
+        differ = root_a != root_b
+        a, b, root_a, root_b = a[differ], b[differ], root_a[differ], root_b[differ]
+        np.minimum.at(parent, np.maximum(root_a, root_b), np.minimum(root_a, root_b))
+
+
+def _connected_components(vectors, similarity, block_size=BLOCK_SIZE):
+    """
+    Components of the graph with an edge wherever two rows' cosine similarity
+    is >= `similarity`. The graph is never built: it is scanned tile by tile
+    and each tile's edges are merged into a union-find. Labels are numbered
+    in order of each component's first row.
+    """
+    n = len(vectors)
+    parent = np.arange(n)
+    for row_start in range(0, n, block_size):
+        rows = vectors[row_start:row_start + block_size]
+        for col_start in range(row_start, n, block_size):
+            edges = rows @ vectors[col_start:col_start + block_size].T >= similarity
+            if col_start == row_start:
+                edges = np.triu(edges, 1)
+            a, b = np.nonzero(edges)
+            _union(parent, a + row_start, b + col_start)
+    return np.unique(_find(parent, np.arange(n)), return_inverse=True)[1]
+
+
+def cluster_incidents(df, embeddings, window_minutes=RCA_INCIDENT_WINDOW_MINUTES,
+                      similarity=RCA_INCIDENT_SIMILARITY):
+    """
+    Group anomaly rows into incidents. Rows are split by service, then into
+    time segments wherever consecutive anomalies are more than `window_minutes`
+    apart, then into connected components of the embedding-similarity graph
+    (edges where cosine similarity >= `similarity`) within each segment.
+    Returns one incident label per row of `df`, in row order.
+    """
+    n = len(df)
+    labels = np.full(n, -1)
+    if n == 0:
+        return labels
+
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    vectors = vectors / norms
+    timestamps = pd.to_datetime(df["timestamp"], errors="coerce").to_numpy()
+    services = df["service"].astype(str).to_numpy()
+    window = np.timedelta64(int(window_minutes * 60), "s")
+
+    next_label = 0
+    for service in np.unique(services):
+        rows = np.flatnonzero(services == service)
+        rows = rows[np.argsort(timestamps[rows], kind="stable")]
+        breaks = np.flatnonzero(np.diff(timestamps[rows]) > window) + 1
+        for segment in np.split(rows, breaks):
+            components = _connected_components(vectors[segment], similarity)
+            labels[segment] = components + next_label
+            next_label += components.max() + 1
+    return labels
@@ -0,0 +1,185 @@
+# RCA/llm_executor.py
+
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Defaults match Groq's free-tier limits for llama3-70b; raise them for paid keys
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 8))
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", 30))
+LLM_TOKENS_PER_MINUTE = float(os.getenv("LLM_TOKENS_PER_MINUTE", 6000))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 5))
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+# Rough completion size used when reserving tokens for a request
+EXPECTED_COMPLETION_TOKENS = 300
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled continuously at `rate` tokens per second.
+    A rate of 0 or less means unlimited (e.g. LLM_TOKENS_PER_MINUTE=0).
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.unlimited = rate <= 0
+        self.capacity = capacity
+        self._tokens = capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def acquire(self, amount=1):
+        if self.unlimited:
+            return
+        amount = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                wait = (amount - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def try_acquire(self, amount=1):
+        if self.unlimited:
+            return True
+        with self._lock:
+            self._refill()
+            if self._tokens >= amount:
+                self._tokens -= amount
+                return True
+            return False
+
+    def drain(self):
+        """Empty the bucket, e.g. after the provider answered 429."""
+        with self._lock:
+            self._refill()
+            self._tokens = 0
+
+
+def estimate_tokens(messages):
+    chars = sum(len(m.get("content") or "") for m in messages)
+    return chars // 4 + EXPECTED_COMPLETION_TOKENS
+
+
+def status_code(error):
+    code = getattr(error, "status_code", None)
+    if code is None:
+        code = getattr(getattr(error, "response", None), "status_code", None)
+    return code
+
+
+def is_retryable(error):
+    if status_code(error) in RETRYABLE_STATUS:
+        return True
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    # groq/openai SDK transport errors carry no status code
+    return type(error).__name__ in ("APIConnectionError", "APITimeoutError")
+
+
+def retry_after(error):
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class LLMExecutor:
+    """
+    Runs LLM calls on a bounded thread pool. Every attempt first takes one
+    request and its estimated tokens from per-minute token buckets, and
+    retryable failures (429, 5xx, connection errors) are retried with
+    full-jitter exponential backoff, honouring Retry-After when present.
+    """
+
+    def __init__(self, max_workers=LLM_MAX_CONCURRENCY, requests_per_minute=LLM_REQUESTS_PER_MINUTE,
+                 tokens_per_minute=LLM_TOKENS_PER_MINUTE, max_retries=LLM_MAX_RETRIES,
+                 base_delay=1.0, max_delay=30.0):
+        self.max_workers = max_workers
+        self.requests = TokenBucket(requests_per_minute / 60.0, max(1.0, requests_per_minute / 60.0 * max_workers))
+        self.tokens = TokenBucket(tokens_per_minute / 60.0, tokens_per_minute)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.stats = {"calls": 0, "retries": 0, "failures": 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, key):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def call(self, fn, *args, token_estimate=EXPECTED_COMPLETION_TOKENS):
+        for attempt in range(self.max_retries + 1):
+            self.requests.acquire()
+            self.tokens.acquire(token_estimate)
+            try:
+                self._count("calls")
+                return fn(*args)
+            except Exception as e:
+                if attempt == self.max_retries or not is_retryable(e):
+                    self._count("failures")
+                    raise
+                if status_code(e) == 429:
+                    self.requests.drain()
+                wait = retry_after(e)
+                if wait is not None:
+                    # A server asking for minutes would otherwise stall this worker that long
+                    delay = min(max(wait, 0.0), self.max_delay)
+                else:
+                    delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                self._count("retries")
+                print(f"LLM call failed ({e.__class__.__name__}, status {status_code(e)}); retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    def _call_or_error(self, fn, item, token_estimate):
+        try:
+            return self.call(fn, *item, token_estimate=token_estimate)
+        except Exception as e:
+            return e
+
+    def map(self, fn, items, token_estimates=None):
+        """
+        Call fn(*item) for every item concurrently and return the results in
+        input order. A call that still fails after retries yields its exception
+        in place of a result, so one bad anomaly does not abort the batch.
+        """
+        token_estimates = token_estimates or [EXPECTED_COMPLETION_TOKENS] * len(items)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            return list(pool.map(self._call_or_error, [fn] * len(items), items, token_estimates))
+
+    def as_completed(self, fn, items, token_estimates=None):
+        """
+        Like map, but yield (index, result) pairs as calls finish instead of
+        waiting for the slowest one. Closing the generator early cancels the
+        calls that have not started.
+        """
+        token_estimates = token_estimates or [EXPECTED_COMPLETION_TOKENS] * len(items)
+        if not items:
+            return
+        pool = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            futures = {
+                pool.submit(self._call_or_error, fn, item, estimate): i
+                for i, (item, estimate) in enumerate(zip(items, token_estimates))
+            }
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+        finally:
+            # If the caller stops early, drop the queued calls instead of
+            # blocking until every one of them has run
+            pool.shutdown(wait=False, cancel_futures=True)
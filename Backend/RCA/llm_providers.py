@@ -0,0 +1,155 @@
+# RCA/llm_providers.py
+#
+# Chat completion backends for RCA. Select one with LLM_PROVIDER:
+#   groq    - Groq API (GROQ_API_KEY, MODEL_ID; LLM_BASE_URL to point elsewhere)
+#   mock    - in-process mock server (LLM_MOCK_PROFILE, see RCA.mock_llm_server)
+#   record  - Groq, appending every request/response to LLM_RECORD_PATH
+#   replay  - answers from LLM_RECORD_PATH only, no network
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "groq").lower()
+LLM_BASE_URL = os.getenv("LLM_BASE_URL") or None
+LLM_MOCK_PROFILE = os.getenv("LLM_MOCK_PROFILE", "groq-free")
+LLM_RECORD_PATH = os.getenv(
+    "LLM_RECORD_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "llm_recordings.jsonl")
+)
+# Sleep for the recorded latency when replaying, to keep load tests realistic
+LLM_REPLAY_LATENCY = os.getenv("LLM_REPLAY_LATENCY", "false").lower() == "true"
+
+
+class ReplayMiss(LookupError):
+    """No recorded response for a request in replay mode."""
+
+
+class LLMProvider:
+    """Minimal chat completion interface used by the RCA agent."""
+
+    name = "base"
+
+    def complete(self, messages, temperature=0.4, json_mode=False):
+        """Return the assistant message content for `messages`."""
+        raise NotImplementedError
+
+
+class GroqProvider(LLMProvider):
+    name = "groq"
+
+    def __init__(self, api_key=None, model=None, base_url=LLM_BASE_URL):
+        from groq import Groq
+
+        self.model = model or os.getenv("MODEL_ID")
+        # Retries are handled by LLMExecutor, which also rate-limits them
+        self.client = Groq(api_key=api_key or os.getenv("GROQ_API_KEY"), base_url=base_url, max_retries=0)
+
+    def complete(self, messages, temperature=0.4, json_mode=False):
+        kwargs = {"response_format": {"type": "json_object"}} if json_mode else {}
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=temperature,
+            **kwargs
+        )
+        return response.choices[0].message.content.strip()
+
+
+def request_key(messages, temperature, json_mode):
+    payload = json.dumps([messages, temperature, bool(json_mode)], sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class RecordingProvider(LLMProvider):
+    """Pass requests through to `inner` and append each exchange to a JSONL file."""
+
+    name = "record"
+
+    def __init__(self, inner, path=LLM_RECORD_PATH):
+        self.inner = inner
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def complete(self, messages, temperature=0.4, json_mode=False):
+        started = time.perf_counter()
+        content = self.inner.complete(messages, temperature=temperature, json_mode=json_mode)
+        record = {
+            "key": request_key(messages, temperature, json_mode),
+            "messages": messages,
+            "temperature": temperature,
+            "json_mode": bool(json_mode),
+            "content": content,
+            "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+        return content
+
+
+class ReplayProvider(LLMProvider):
+    """
+    Serve responses recorded by RecordingProvider, matched on the exact request.
+    Unrecorded requests raise ReplayMiss, or get `fallback`'s answer if given.
+    """
+
+    name = "replay"
+
+    def __init__(self, path=LLM_RECORD_PATH, replay_latency=LLM_REPLAY_LATENCY, fallback=None):
+        self.replay_latency = replay_latency
+        self.fallback = fallback
+        self.records = {}
+        self.stats = {"hits": 0, "misses": 0}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        self.records[record["key"]] = record
+
+    def complete(self, messages, temperature=0.4, json_mode=False):
+        record = self.records.get(request_key(messages, temperature, json_mode))
+        if record is None:
+            self.stats["misses"] += 1
+            if self.fallback is not None:
+                return self.fallback.complete(messages, temperature=temperature, json_mode=json_mode)
+            raise ReplayMiss("No recorded LLM response for this request")
+        self.stats["hits"] += 1
+        if self.replay_latency:
+            time.sleep(record.get("latency_ms", 0) / 1000)
+        return record["content"]
+
+
+def start_mock_provider(profile=LLM_MOCK_PROFILE):
+    """Start the mock server in-process and return a provider pointed at it."""
+    from RCA.mock_llm_server import MockLLMConfig, start_mock_server
+
+    _, base_url = start_mock_server(MockLLMConfig.from_profile(profile))
+    return GroqProvider(api_key="mock", model="mock", base_url=base_url)
+
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def get_llm_provider():
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            if LLM_PROVIDER == "groq":
+                _provider = GroqProvider()
+            elif LLM_PROVIDER == "mock":
+                _provider = start_mock_provider()
+            elif LLM_PROVIDER == "record":
+                _provider = RecordingProvider(GroqProvider())
+            elif LLM_PROVIDER == "replay":
+                _provider = ReplayProvider()
+            else:
+                raise ValueError(f"Unknown LLM_PROVIDER '{LLM_PROVIDER}' (expected groq, mock, record or replay)")
+    return _provider
@@ -0,0 +1,144 @@
+# RCA/mock_llm_server.py
+#
+# Local stand-in for the Groq chat completions API, for load-testing the RCA
+# pipeline without network access:
+#   python -m RCA.mock_llm_server --port 8099 --latency-ms 800 --rpm 120 --error-rate 0.02
+#   python -m RCA.mock_llm_server --port 8099 --profile flaky
+# Point the RCA agent at it with LLM_BASE_URL=http://127.0.0.1:8099, or use
+# LLM_PROVIDER=mock to run one in-process.
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from RCA.llm_executor import TokenBucket
+
+
+# Named latency/error profiles for load tests
+MOCK_PROFILES = {
+    "fast": {"latency_ms": 20, "jitter_ms": 5, "rpm": 0, "error_rate": 0.0},
+    "groq-free": {"latency_ms": 800, "jitter_ms": 200, "rpm": 30, "error_rate": 0.0},
+    "slow": {"latency_ms": 4000, "jitter_ms": 1500, "rpm": 0, "error_rate": 0.0},
+    "flaky": {"latency_ms": 600, "jitter_ms": 300, "rpm": 0, "error_rate": 0.1,
+              "error_statuses": (500, 502, 503)},
+    "overloaded": {"latency_ms": 2000, "jitter_ms": 1000, "rpm": 60, "error_rate": 0.05,
+                   "error_statuses": (503,)},
+}
+
+
+class MockLLMConfig:
+    def __init__(self, latency_ms=500, jitter_ms=100, rpm=0, error_rate=0.0, error_statuses=(500,)):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rpm = rpm                # server-side rate limit, 0 = unlimited
+        self.error_rate = error_rate  # fraction of requests answered with an error status
+        self.error_statuses = tuple(error_statuses)
+        self.limiter = TokenBucket(rpm / 60.0, max(1.0, rpm / 60.0)) if rpm else None
+        self.stats = {"requests": 0, "rate_limited": 0, "errors": 0}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_profile(cls, name, **overrides):
+        if name not in MOCK_PROFILES:
+            raise ValueError(f"Unknown mock profile '{name}' (expected one of {', '.join(MOCK_PROFILES)})")
+        settings = dict(MOCK_PROFILES[name])
+        settings.update({key: value for key, value in overrides.items() if value is not None})
+        return cls(**settings)
+
+    def count(self, key):
+        with self.lock:
+            self.stats[key] += 1
+
+
+def mock_completion(body):
+    prompt = body["messages"][-1]["content"] if body.get("messages") else ""
+    content = (
+        "Likely root cause: upstream dependency saturation causing elevated latency. "
+        "Possible fix: restart the affected service and scale out the gateway pool."
+    )
+    if (body.get("response_format") or {}).get("type") == "json_object":
+        # Packed RCA prompts list one "txn_id: ..." line per anomaly
+        txn_ids = re.findall(r"^txn_id: (\S+)$", prompt, flags=re.MULTILINE)
+        content = json.dumps({txn_id: {"summary": content} for txn_id in txn_ids})
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model") or "mock",
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": {
+            "prompt_tokens": len(prompt) // 4,
+            "completion_tokens": len(content) // 4,
+            "total_tokens": (len(prompt) + len(content)) // 4,
+        },
+    }
+
+
+def make_handler(config):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def _reply(self, status, payload, headers=None):
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            if not self.path.endswith("/chat/completions"):
+                return self._reply(404, {"error": {"message": "not found"}})
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            config.count("requests")
+
+            if config.limiter is not None and not config.limiter.try_acquire():
+                config.count("rate_limited")
+                return self._reply(429, {"error": {"message": "rate limit exceeded"}}, {"retry-after": "1"})
+
+            delay = max(0.0, random.gauss(config.latency_ms, config.jitter_ms)) / 1000
+            time.sleep(delay)
+            if random.random() < config.error_rate:
+                config.count("errors")
+                return self._reply(random.choice(config.error_statuses), {"error": {"message": "mock upstream error"}})
+            self._reply(200, mock_completion(body))
+
+    return Handler
+
+
+def start_mock_server(config, host="127.0.0.1", port=0):
+    """Start the server on a background thread; returns (server, base_url)."""
+    server = ThreadingHTTPServer((host, port), make_handler(config))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mock Groq/OpenAI chat completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--profile", choices=sorted(MOCK_PROFILES), default="fast",
+                        help="Base latency/error profile; the flags below override it")
+    parser.add_argument("--latency-ms", type=float)
+    parser.add_argument("--jitter-ms", type=float)
+    parser.add_argument("--rpm", type=float)
+    parser.add_argument("--error-rate", type=float)
+    args = parser.parse_args()
+
+    config = MockLLMConfig.from_profile(args.profile, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                                        rpm=args.rpm, error_rate=args.error_rate)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(config))
+    print(f"Mock LLM server listening on http://{args.host}:{args.port}")
+    server.serve_forever()
@@ -1,29 +1,49 @@
 # pattern_detector.py
 
+import time
 import pandas as pd
 from datetime import datetime, timedelta
 from sentence_transformers import SentenceTransformer
+from sqlalchemy import text, bindparam
 from memory.db import get_engine
-from vectordb.chroma_client import client
-from vectordb.chroma_client import get_chroma_collection
-
-# Load ChromaDB collection
-collection = client.get_or_create_collection("failure_patterns")
+from vectordb.store import get_vector_store, store_lock
 
 model = SentenceTransformer("all-MiniLM-L6-v2") 
 
+
+def pattern_id(service, metric):
+    return f"pattern_{service}_{metric}"
+
+
 class PatternDetectorAgent:
     def __init__(self):
         self.engine = get_engine()
 
-    def load_anomalies(self):
+    def load_anomalies(self, groups=None):
+        """
+        Load the last 14 days of anomalies, or only those of the given
+        (service, metric) groups when `groups` is set.
+        """
         past_days = 14
         start_date = (datetime.now() - timedelta(days=past_days)).strftime('%Y-%m-%d')
         query = f"""
             SELECT * FROM anomaly_logs
             WHERE timestamp >= '{start_date}'
         """
-        return pd.read_sql(query, self.engine)
+        if groups is None:
+            return pd.read_sql(query, self.engine)
+        groups = set(groups)
+        if not groups:
+            return pd.DataFrame()
+        query = text(query + " AND service IN :services AND metric IN :metrics").bindparams(
+            bindparam("services", expanding=True), bindparam("metrics", expanding=True)
+        )
+        df = pd.read_sql(query, self.engine, params={
+            "services": sorted({service for service, _ in groups}),
+            "metrics": sorted({metric for _, metric in groups}),
+        })
+        keep = [(service, metric) in groups for service, metric in zip(df["service"], df["metric"])]
+        return df[keep]
 
     def detect_patterns(self, df):
         patterns = []
@@ -33,7 +53,7 @@ class PatternDetectorAgent:
 
         for (service, metric), group in df.groupby(["service", "metric"]):
             group = group.set_index("timestamp")
-            bucketed = group.resample("2H").count()
+            bucketed = group.resample("2h").count()
             threshold = 3
 
             for timestamp, row in bucketed.iterrows():
@@ -49,34 +69,66 @@ class PatternDetectorAgent:
         return patterns
 
     def save_to_chroma(self, patterns):
-        collection = get_chroma_collection()
-        for i, p in enumerate(patterns):
-            embedding = model.encode(p["summary"]).tolist()
-            collection.add(
-                documents=[p["summary"]],
-                embeddings=[embedding],
-                metadatas=[{
-                    "service": p["service"],
-                    "metric": p["metric"],
-                    "timestamp": str(p["timestamp"]),
-                    "type": "pattern"
-                }],
-                ids=[f"pattern_{p['service']}_{p['metric']}_{i}"]
-            )
-            print(f"Pattern added to ChromaDB: {p['summary']}")
-
-    def run(self):
-        df = self.load_anomalies()
+        """
+        Keep one document per (service, metric), keyed by that content rather
+        than by time bucket: spikes in buckets after the stored one add to its
+        `count`, and buckets already counted (re-detected on the next run, or
+        collapsed by vector store maintenance) are not written again.
+        """
+        if not patterns:
+            return
+        latest = {}
+        for p in patterns:
+            latest.setdefault(pattern_id(p["service"], p["metric"]), []).append(p)
+
+        collection = get_vector_store()
+        # Read-modify-write of counts, so hold off maintenance meanwhile
+        with store_lock:
+            existing = collection.get(ids=list(latest), include=["metadatas"])
+            stored = dict(zip(existing["ids"], existing["metadatas"]))
+            ids, metadatas, summaries = [], [], []
+            for doc_id, group in latest.items():
+                meta = stored.get(doc_id) or {}
+                last = pd.Timestamp(meta["timestamp"]) if meta.get("timestamp") else None
+                new = [p for p in group if last is None or p["timestamp"] > last]
+                if not new:
+                    continue
+                newest = max(new, key=lambda p: p["timestamp"])
+                first = min(p["timestamp"] for p in group).to_pydatetime().timestamp()
+                ids.append(doc_id)
+                summaries.append(newest["summary"])
+                metadatas.append({
+                    "service": newest["service"],
+                    "metric": newest["metric"],
+                    "timestamp": str(newest["timestamp"]),
+                    "type": "pattern",
+                    "count": int(meta.get("count", 0)) + len(new),
+                    "first_seen": min(meta.get("first_seen", first), first),
+                    "created_at": int(time.time())
+                })
+            if ids:
+                collection.upsert(
+                    documents=summaries,
+                    embeddings=model.encode(summaries).tolist(),
+                    metadatas=metadatas,
+                    ids=ids
+                )
+        for summary in summaries:
+            print(f"Pattern added to ChromaDB: {summary}")
+
+    def run(self, groups=None):
+        df = self.load_anomalies(groups)
         if df.empty:
             print("No anomalies found in last 24 hours.")
-            return
+            return []
 
         patterns = self.detect_patterns(df)
         if not patterns:
             print("No repeating patterns found.")
-            return
+            return []
 
         self.save_to_chroma(patterns)
+        return patterns
 
 
 if __name__ == "__main__":
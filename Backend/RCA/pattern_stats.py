@@ -0,0 +1,47 @@
+# RCA/pattern_stats.py
+#
+# Per-pattern RCA outcome counts, maintained incrementally as RCA results are
+# written, so success rates are a primary-key lookup instead of a scan of
+# anomaly_logs.
+
+from sqlalchemy import Table, Column, MetaData, String, Integer, DateTime, func, exc
+
+HIGH_CONFIDENCE_THRESHOLD = 0.7
+
+metadata = MetaData()
+
+rca_pattern_stats = Table(
+    "rca_pattern_stats",
+    metadata,
+    Column("pattern_id", String(255), primary_key=True),
+    Column("total", Integer, nullable=False, default=0),
+    Column("high_confidence", Integer, nullable=False, default=0),
+    Column("updated_at", DateTime, nullable=False, server_default=func.now(), onupdate=func.now()),
+)
+
+_table_ready = False
+
+
+def ensure_table(engine):
+    global _table_ready
+    if not _table_ready:
+        try:
+            metadata.create_all(engine, tables=[rca_pattern_stats], checkfirst=True)
+        except exc.DBAPIError:
+            # Another worker created it between the check and the CREATE
+            metadata.create_all(engine, tables=[rca_pattern_stats], checkfirst=True)
+        _table_ready = True
+
+
+def fetch_success_rates(conn, pattern_ids):
+    """Return {pattern_id: high_confidence / total} for the given ids in one query."""
+    pattern_ids = sorted({p for p in pattern_ids if p})
+    if not pattern_ids:
+        return {}
+    rows = conn.execute(
+        rca_pattern_stats.select().where(rca_pattern_stats.c.pattern_id.in_(pattern_ids))
+    ).fetchall()
+    return {
+        row.pattern_id: (row.high_confidence / row.total if row.total else 0.0)
+        for row in rows
+    }
@@ -0,0 +1,239 @@
+# RCA/pipeline.py
+#
+# In-process DAG for the detection pipeline. Stages hand their outputs to
+# dependents as in-memory frames instead of re-reading them from MySQL, stages
+# whose dependencies are met run concurrently, and every run reports per-stage
+# timings. Each run only processes transactions newer than the last detected
+# anomaly, so it can be scheduled repeatedly:
+#   python -m RCA.pipeline [--interval 300]
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pandas as pd
+from dotenv import load_dotenv
+
+load_dotenv()
+
+PIPELINE_MAX_WORKERS = int(os.getenv("PIPELINE_MAX_WORKERS", 4))
+
+
+class Stage:
+    def __init__(self, name, fn, deps=()):
+        self.name = name
+        self.fn = fn  # fn(inputs: {dep_name: output}) -> output
+        self.deps = tuple(deps)
+
+
+class Pipeline:
+    """
+    Runs a DAG of stages on a thread pool. A stage starts as soon as all of its
+    dependencies have finished; when a stage fails, its dependents are skipped
+    but independent branches still run.
+    """
+
+    def __init__(self, stages, max_workers=PIPELINE_MAX_WORKERS):
+        self.stages = {stage.name: stage for stage in stages}
+        for stage in stages:
+            missing = [dep for dep in stage.deps if dep not in self.stages]
+            if missing:
+                raise ValueError(f"Stage '{stage.name}' depends on unknown stages: {missing}")
+        self._check_acyclic()
+        self.max_workers = max_workers
+
+    def _check_acyclic(self):
+        state = {}
+
+        def visit(name, path):
+            if state.get(name) == "done":
+                return
+            if state.get(name) == "visiting":
+                raise ValueError(f"Pipeline has a cycle: {' -> '.join(path + [name])}")
+            state[name] = "visiting"
+            for dep in self.stages[name].deps:
+                visit(dep, path + [name])
+            state[name] = "done"
+
+        for name in self.stages:
+            visit(name, [])
+
+    def _run_stage(self, stage, outputs):
+        started = time.perf_counter()
+        output = stage.fn({dep: outputs[dep] for dep in stage.deps})
+        return output, time.perf_counter() - started
+
+    def run(self):
+        """Return {"outputs": {stage: output}, "stages": {stage: timing}, "elapsed_s": float}."""
+        started = time.perf_counter()
+        outputs, report = {}, {}
+        remaining = dict(self.stages)
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while remaining or running:
+                for name, stage in list(remaining.items()):
+                    if any(report.get(dep, {}).get("status") in ("failed", "skipped") for dep in stage.deps):
+                        report[name] = {"status": "skipped", "seconds": 0.0}
+                        del remaining[name]
+                    elif all(dep in outputs for dep in stage.deps):
+                        offset = round(time.perf_counter() - started, 3)
+                        running[pool.submit(self._run_stage, stage, outputs)] = (name, offset)
+                        del remaining[name]
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name, offset = running.pop(future)
+                    try:
+                        output, seconds = future.result()
+                    except Exception as e:
+                        print(f"Pipeline stage '{name}' failed: {e}")
+                        report[name] = {"status": "failed", "error": str(e), "started_at_s": offset}
+                        continue
+                    outputs[name] = output
+                    report[name] = {
+                        "status": "ok",
+                        "seconds": round(seconds, 3),
+                        "started_at_s": offset,
+                        "rows": len(output) if hasattr(output, "__len__") else None,
+                    }
+
+        elapsed = time.perf_counter() - started
+        for name, timing in report.items():
+            print(f"  {name:<16} {timing['status']:<8} {timing.get('seconds', 0):8.3f}s  rows={timing.get('rows')}")
+        return {"outputs": outputs, "stages": report, "elapsed_s": round(elapsed, 3)}
+
+
+# --- Detection pipeline stages ---
+
+def detect_stage(inputs):
+    from RCA.failure_detection import FailureDetectionAgent
+
+    agent = FailureDetectionAgent()
+    agent.stage_new_data()
+    try:
+        return pd.DataFrame(agent.run())
+    finally:
+        agent.clear_staged_data()
+
+
+def save_anomalies_stage(inputs):
+    from RCA.failure_detection import FailureDetectionAgent
+
+    anomalies = inputs["detect"]
+    if not anomalies.empty:
+        FailureDetectionAgent().save_anomalies(anomalies.to_dict("records"), index_failures=False)
+    return anomalies
+
+
+def index_failures_stage(inputs):
+    from RCA.failure_detection import FailureDetectionAgent
+
+    anomalies = inputs["detect"]
+    if not anomalies.empty:
+        FailureDetectionAgent().index_failures(anomalies.to_dict("records"))
+    return anomalies
+
+
+def patterns_stage(inputs):
+    from RCA.pattern import PatternDetectorAgent
+
+    anomalies = inputs["save_anomalies"]
+    if anomalies.empty:
+        return pd.DataFrame()
+    # Only the (service, metric) groups that received new anomalies can have new spikes
+    groups = set(zip(anomalies["service"], anomalies["metric"]))
+    return pd.DataFrame(PatternDetectorAgent().run(groups))
+
+
+def rca_stage(inputs):
+    from RCA.rca_reasoning import RCAReasoningAgent
+
+    anomalies = inputs["save_anomalies"]
+    if anomalies.empty:
+        return pd.DataFrame()
+    txn_ids = sorted(anomalies["txn_id"].astype(str).unique())
+    # Claims the rows through the RCA work queue, so a concurrent /api/rca-jobs
+    # worker or stream never runs the same anomalies
+    return pd.DataFrame(list(RCAReasoningAgent().stream(flush_each=False, txn_ids=txn_ids)))
+
+
+def sla_stage(inputs):
+    from SLA.sla_full import SLAAgent, METRIC_ALERT_TYPES
+
+    results = inputs["rca"]
+    if results.empty or "status" not in results:
+        return pd.DataFrame()
+    results = results[results["status"] == "ok"].reset_index(drop=True)
+    if results.empty:
+        # Every RCA call failed this run; nothing to evaluate
+        return pd.DataFrame()
+    # Failed results carry no RCA columns, so a frame built from them may lack these
+    rca = results.reindex(columns=["rca_confidence", "rca_summary"])
+    agent = SLAAgent()
+    alert_types = results["metric"].map(METRIC_ALERT_TYPES).fillna("gateway_error")
+    compliance = agent.calculate_sla_compliance_batch(results["timestamp"], [datetime.now()], alert_types)
+    return pd.DataFrame({
+        "txn_id": results["txn_id"],
+        "service": results["service"],
+        "metric": results["metric"],
+        "timestamp": results["timestamp"],
+        "alert_type": alert_types,
+        "duration_seconds": compliance["duration_seconds"],
+        "sla_level": compliance["sla_level"],
+        "breached": compliance["breached"],
+        "users_affected": agent.calculate_users_affected_batch(alert_types, ["default"] * len(results)),
+        "rca_confidence": rca["rca_confidence"],
+        "rca_summary": rca["rca_summary"],
+    })
+
+
+def sla_table_stage(inputs):
+    from SLA.sla_full import save_sla_analyses
+
+    results = inputs["sla"]
+    if results.empty:
+        return pd.DataFrame()
+    records = results.to_dict("records")
+    save_sla_analyses((record, record["rca_confidence"]) for record in records)
+    return results
+
+
+def build_detection_pipeline(max_workers=PIPELINE_MAX_WORKERS):
+    """failure detection -> (save | index) -> (patterns -> RCA) -> SLA -> sla_table (+ SLA rollups)"""
+    return Pipeline([
+        Stage("detect", detect_stage),
+        Stage("save_anomalies", save_anomalies_stage, ["detect"]),
+        Stage("index_failures", index_failures_stage, ["detect"]),
+        Stage("patterns", patterns_stage, ["save_anomalies"]),
+        # RCA looks up the patterns just written, so it waits for them
+        Stage("rca", rca_stage, ["save_anomalies", "patterns"]),
+        Stage("sla", sla_stage, ["rca"]),
+        # Writes the SLA rows and updates the rollups in one transaction
+        Stage("sla_table", sla_table_stage, ["sla"]),
+    ], max_workers=max_workers)
+
+
+def summarize(result):
+    """JSON-friendly view of a pipeline run: timings plus row counts, without the frames."""
+    return {"elapsed_s": result["elapsed_s"], "stages": result["stages"]}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the detection pipeline DAG")
+    parser.add_argument("--interval", type=float, default=0, help="Re-run every N seconds (0 = run once)")
+    args = parser.parse_args()
+
+    while True:
+        print(f"Pipeline run at {datetime.now().isoformat()}")
+        print(json.dumps(summarize(build_detection_pipeline().run()), indent=2))
+        if not args.interval:
+            break
+        time.sleep(args.interval)
@@ -0,0 +1,123 @@
+# RCA/rca_cache.py
+
+import math
+import os
+import sqlite3
+import threading
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+RCA_CACHE_ENABLED = os.getenv("RCA_CACHE_ENABLED", "true").lower() == "true"
+RCA_CACHE_PATH = os.getenv(
+    "RCA_CACHE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "rca_cache.sqlite3")
+)
+RCA_CACHE_TTL_S = int(os.getenv("RCA_CACHE_TTL_S", 24 * 3600))
+RCA_CACHE_MAX_ENTRIES = int(os.getenv("RCA_CACHE_MAX_ENTRIES", 10000))
+
+# Anomalies whose values fall in the same bucket are treated as the same incident shape
+METRIC_BUCKET_WIDTHS = {
+    "latency_ms": 250,
+    "error_rate": 0.05,
+    "cpu": 5,
+    "memory": 5,
+}
+
+
+def value_bucket(metric, value):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return "nan"
+    if not math.isfinite(value):
+        # nan / inf / -inf each get a bucket of their own
+        return str(value)
+    width = METRIC_BUCKET_WIDTHS.get(metric)
+    if width:
+        return str(math.floor(value / width))
+    # Unknown metrics: power-of-two buckets
+    return f"log{math.floor(math.log2(value))}" if value > 0 else "0"
+
+
+def anomaly_signature(anomaly, pattern_id):
+    metric = str(anomaly.get("metric", "")).lower()
+    return "|".join([
+        str(anomaly.get("service", "")),
+        metric,
+        value_bucket(metric, anomaly.get("value")),
+        pattern_id or "none",
+    ])
+
+
+class RCACache:
+    """
+    Persistent RCA summary cache in SQLite. Entries expire after `ttl_s` and
+    the least recently used ones are evicted beyond `max_entries`.
+    """
+
+    def __init__(self, path=RCA_CACHE_PATH, ttl_s=RCA_CACHE_TTL_S, max_entries=RCA_CACHE_MAX_ENTRIES):
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS rca_cache (
+                signature TEXT PRIMARY KEY,
+                summary TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_rca_cache_last_used ON rca_cache (last_used)")
+        self._conn.commit()
+
+    def get(self, signature):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT summary, created_at FROM rca_cache WHERE signature = ?", (signature,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl_s:
+                if row is not None:
+                    self._conn.execute("DELETE FROM rca_cache WHERE signature = ?", (signature,))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE rca_cache SET last_used = ?, hits = hits + 1 WHERE signature = ?", (now, signature)
+            )
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, signature, summary):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO rca_cache (signature, summary, created_at, last_used, hits) "
+                "VALUES (?, ?, ?, ?, 0)",
+                (signature, summary, now, now),
+            )
+            self._conn.execute("DELETE FROM rca_cache WHERE created_at < ?", (now - self.ttl_s,))
+            self._conn.execute(
+                "DELETE FROM rca_cache WHERE signature IN ("
+                "SELECT signature FROM rca_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def hit_ratio(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self):
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM rca_cache").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "hit_ratio": round(self.hit_ratio(), 3), "entries": size}
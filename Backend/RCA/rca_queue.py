@@ -0,0 +1,353 @@
+# RCA/rca_queue.py
+#
+# Durable RCA work queue in MySQL. Enqueuing a job snapshots the anomalies
+# pending RCA into rca_work_items; workers claim small batches with
+# SELECT ... FOR UPDATE SKIP LOCKED and hold them under a time-limited lease,
+# so concurrent workers never pay for the same LLM call and work held by a
+# crashed worker is picked up again once its lease expires. Every RCA entry
+# point (the API, the stream, the pipeline and the workers) claims its rows
+# here rather than selecting them from anomaly_logs directly.
+#   python -m RCA.rca_queue enqueue [--workers 4]
+#   python -m RCA.rca_queue work [--job JOB_ID] [--processes 4] [--forever]
+#   python -m RCA.rca_queue status JOB_ID
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from dotenv import load_dotenv
+from sqlalchemy import (
+    Table, Column, MetaData, String, Integer, BigInteger, DateTime, Text, Index, UniqueConstraint,
+    select, func, case, and_, or_, text, exc, bindparam,
+)
+
+from memory.db import get_engine
+
+load_dotenv()
+
+RCA_QUEUE_BATCH_SIZE = int(os.getenv("RCA_QUEUE_BATCH_SIZE", 20))
+RCA_QUEUE_LEASE_S = int(os.getenv("RCA_QUEUE_LEASE_S", 600))
+RCA_QUEUE_MAX_ATTEMPTS = int(os.getenv("RCA_QUEUE_MAX_ATTEMPTS", 3))
+RCA_QUEUE_WORKERS = int(os.getenv("RCA_QUEUE_WORKERS", 2))
+RCA_QUEUE_POLL_S = float(os.getenv("RCA_QUEUE_POLL_S", 5))
+# Consecutive failed rounds (e.g. MySQL unreachable) after which a draining worker gives up
+RCA_QUEUE_MAX_FAILURES = int(os.getenv("RCA_QUEUE_MAX_FAILURES", 5))
+
+logger = logging.getLogger(__name__)
+
+metadata = MetaData()
+
+rca_jobs = Table(
+    "rca_jobs",
+    metadata,
+    Column("job_id", String(32), primary_key=True),
+    Column("total", Integer, nullable=False, default=0),
+    Column("created_at", DateTime, nullable=False),
+)
+
+rca_work_items = Table(
+    "rca_work_items",
+    metadata,
+    Column("id", BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True),
+    Column("job_id", String(32), nullable=False),
+    Column("txn_id", String(255), nullable=False),
+    # pending -> leased -> done | failed (back to pending on a retryable failure)
+    Column("status", String(16), nullable=False, default="pending"),
+    Column("lease_owner", String(128)),
+    Column("lease_expires_at", DateTime),
+    Column("attempts", Integer, nullable=False, default=0),
+    Column("last_error", Text),
+    Column("updated_at", DateTime, nullable=False),
+    UniqueConstraint("job_id", "txn_id", name="uq_rca_work_items_job_txn"),
+    Index("idx_rca_work_items_claim", "status", "lease_expires_at"),
+    Index("idx_rca_work_items_txn", "txn_id", "status"),
+)
+
+_tables_ready = False
+
+
+def ensure_tables(engine):
+    global _tables_ready
+    if not _tables_ready:
+        try:
+            metadata.create_all(engine, tables=[rca_jobs, rca_work_items], checkfirst=True)
+        except exc.DBAPIError:
+            # Another worker created them between the check and the CREATE
+            metadata.create_all(engine, tables=[rca_jobs, rca_work_items], checkfirst=True)
+        _tables_ready = True
+
+
+def utcnow():
+    return datetime.now(timezone.utc)
+
+
+def worker_name():
+    """Lease owner id, unique per claimer even for several claimers in one process."""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def enqueue_job(engine, txn_ids=None):
+    """
+    Create a job covering every anomaly still pending RCA (only those among
+    `txn_ids` when given) that is not already queued or leased in another job.
+    Returns the job id and its item count.
+    """
+    ensure_tables(engine)
+    job_id = uuid.uuid4().hex
+    now = utcnow()
+    query = """
+            INSERT INTO rca_work_items (job_id, txn_id, status, attempts, updated_at)
+            SELECT DISTINCT :job_id, a.txn_id, 'pending', 0, :now
+            FROM anomaly_logs a
+            WHERE a.rca_confidence IS NULL
+              AND a.txn_id IS NOT NULL
+              AND NOT EXISTS (
+                  SELECT 1 FROM rca_work_items w
+                  WHERE w.txn_id = a.txn_id AND w.status IN ('pending', 'leased')
+              )
+    """
+    params = {"job_id": job_id, "now": now}
+    if txn_ids is not None:
+        query += "  AND a.txn_id IN :txn_ids"
+        params["txn_ids"] = [str(txn_id) for txn_id in txn_ids] or [None]
+    statement = text(query)
+    if txn_ids is not None:
+        statement = statement.bindparams(bindparam("txn_ids", expanding=True))
+    with engine.begin() as conn:
+        result = conn.execute(statement, params)
+        total = result.rowcount
+        conn.execute(rca_jobs.insert().values(job_id=job_id, total=total, created_at=now))
+    return {"job_id": job_id, "total": total}
+
+
+def claim(engine, worker_id, job_id=None, limit=RCA_QUEUE_BATCH_SIZE, lease_s=RCA_QUEUE_LEASE_S,
+          max_attempts=RCA_QUEUE_MAX_ATTEMPTS, txn_ids=None):
+    """
+    Lease up to `limit` pending (or lease-expired) items to `worker_id`, from
+    `job_id` or any job, and only for `txn_ids` when given. Rows locked by
+    another claimer are skipped rather than waited on. Returns [(item_id, txn_id)].
+    """
+    items = rca_work_items.c
+    now = utcnow()
+    with engine.begin() as conn:
+        # Leases that expired too often are given up on instead of re-claimed
+        conn.execute(
+            rca_work_items.update()
+            .where(and_(items.status == "leased", items.lease_expires_at < now, items.attempts >= max_attempts))
+            .values(status="failed", lease_owner=None, last_error="lease expired", updated_at=now)
+        )
+        claimable = or_(
+            items.status == "pending",
+            and_(items.status == "leased", items.lease_expires_at < now),
+        )
+        query = select(items.id, items.txn_id).where(claimable)
+        if job_id:
+            query = query.where(items.job_id == job_id)
+        if txn_ids is not None:
+            if not txn_ids:
+                return []
+            query = query.where(items.txn_id.in_([str(txn_id) for txn_id in txn_ids]))
+        rows = conn.execute(
+            query.order_by(items.id).limit(limit).with_for_update(skip_locked=True)
+        ).fetchall()
+        if not rows:
+            return []
+        conn.execute(
+            rca_work_items.update()
+            .where(items.id.in_([row.id for row in rows]))
+            .values(status="leased", lease_owner=worker_id, lease_expires_at=now + timedelta(seconds=lease_s),
+                    attempts=items.attempts + 1, updated_at=now)
+        )
+    return [(row.id, row.txn_id) for row in rows]
+
+
+def release(engine, worker_id, done_ids, errors, max_attempts=RCA_QUEUE_MAX_ATTEMPTS):
+    """
+    Mark `done_ids` done and the items in `errors` ({item_id: message}) pending
+    again, or failed once out of attempts. Only items still leased to
+    `worker_id` are touched, so a worker whose lease expired cannot overwrite
+    the outcome of the worker that took over.
+    """
+    items = rca_work_items.c
+    now = utcnow()
+    owned = and_(items.lease_owner == worker_id, items.status == "leased")
+    with engine.begin() as conn:
+        if done_ids:
+            conn.execute(
+                rca_work_items.update()
+                .where(and_(owned, items.id.in_(done_ids)))
+                .values(status="done", lease_owner=None, lease_expires_at=None, last_error=None, updated_at=now)
+            )
+        by_message = {}
+        for item_id, message in errors.items():
+            by_message.setdefault(message, []).append(item_id)
+        for message, ids in by_message.items():
+            conn.execute(
+                rca_work_items.update()
+                .where(and_(owned, items.id.in_(ids)))
+                .values(status=case((items.attempts >= max_attempts, "failed"), else_="pending"),
+                        lease_owner=None, lease_expires_at=None, last_error=message[:2000], updated_at=now)
+            )
+
+
+def job_status(engine, job_id):
+    ensure_tables(engine)
+    items = rca_work_items.c
+    with engine.connect() as conn:
+        job = conn.execute(rca_jobs.select().where(rca_jobs.c.job_id == job_id)).fetchone()
+        if job is None:
+            return None
+        counts = dict(conn.execute(
+            select(items.status, func.count()).where(items.job_id == job_id).group_by(items.status)
+        ).fetchall())
+        last_update = conn.execute(select(func.max(items.updated_at)).where(items.job_id == job_id)).scalar()
+    counts = {status: counts.get(status, 0) for status in ("pending", "leased", "done", "failed")}
+    finished = counts["done"] + counts["failed"]
+    return {
+        "job_id": job_id,
+        "state": "completed" if counts["pending"] + counts["leased"] == 0 else "running",
+        "total": job.total,
+        "counts": counts,
+        "progress": round(finished / job.total, 4) if job.total else 1.0,
+        "created_at": job.created_at.isoformat(),
+        "updated_at": last_update.isoformat() if last_update else None,
+    }
+
+
+def release_outcomes(engine, worker_id, item_ids, outcomes, finished):
+    """
+    Release a claimed batch given its results ({txn_id: result dict}).
+    Failed results go back to pending with their error. When the batch ran to
+    the end, every other item is done (items with no result already had an RCA
+    by the time they were fetched); otherwise they are released for a retry.
+    """
+    errors = {
+        item_id: outcomes[txn_id].get("error", "RCA failed")
+        for txn_id, item_id in item_ids.items()
+        if outcomes.get(txn_id, {}).get("status") == "failed"
+    }
+    if not finished:
+        # Results yielded before the interruption may not have been written yet
+        errors.update({item_id: "interrupted" for item_id in item_ids.values() if item_id not in errors})
+    release(engine, worker_id, [item_id for item_id in item_ids.values() if item_id not in errors], errors)
+    return errors
+
+
+def leased_results(engine, worker_id, run_batch, job_id=None, txn_ids=None, batch_size=RCA_QUEUE_BATCH_SIZE,
+                   lease_s=RCA_QUEUE_LEASE_S):
+    """
+    Claim batches until none are left and yield every result dict of
+    run_batch(txn_ids) for each, releasing the batch's leases by outcome once
+    it is done, or for a retry if it raised or the caller stopped early.
+    """
+    while True:
+        claimed = claim(engine, worker_id, job_id, batch_size, lease_s, txn_ids=txn_ids)
+        if not claimed:
+            return
+        item_ids = {str(txn_id): item_id for item_id, txn_id in claimed}
+        outcomes, finished = {}, False
+        try:
+            for result in run_batch(list(item_ids)):
+                outcomes[str(result["txn_id"])] = result
+                yield result
+            finished = True
+        finally:
+            errors = release_outcomes(engine, worker_id, item_ids, outcomes, finished)
+            print(f"[{worker_id}] processed {len(claimed)} items ({len(errors)} failed)")
+
+
+def work(job_id=None, worker_id=None, batch_size=RCA_QUEUE_BATCH_SIZE, lease_s=RCA_QUEUE_LEASE_S,
+         forever=False, poll_s=RCA_QUEUE_POLL_S, max_failures=RCA_QUEUE_MAX_FAILURES):
+    """
+    Claim and process batches until the queue is empty (or forever, polling).
+    A failed round is retried after `poll_s`; without `forever`, the last
+    error is raised once `max_failures` rounds in a row have failed.
+    """
+    from RCA.rca_reasoning import RCAReasoningAgent
+
+    worker_id = worker_id or worker_name()
+    engine = get_engine()
+    ensure_tables(engine)
+    agent = RCAReasoningAgent()
+    # The leases are held here, so the agent must not claim the rows again
+    run_batch = lambda txn_ids: agent.stream(flush_each=False, txn_ids=txn_ids, lease=False)
+    processed, failures = 0, 0
+    while True:
+        try:
+            for _ in leased_results(engine, worker_id, run_batch, job_id, batch_size=batch_size, lease_s=lease_s):
+                processed += 1
+        except Exception as e:
+            # A failed batch was released for a retry; back off before the next round
+            failures += 1
+            logger.warning("[%s] batch failed (%d in a row): %s", worker_id, failures, e)
+            if not forever and failures >= max_failures:
+                raise
+            time.sleep(poll_s)
+            continue
+        failures = 0
+        if not forever:
+            break
+        time.sleep(poll_s)
+    print(f"[{worker_id}] {processed} results in total")
+    return processed
+
+
+def run_workers(processes=RCA_QUEUE_WORKERS, job_id=None, forever=False):
+    """Run `processes` worker processes until the queue is drained."""
+    context = multiprocessing.get_context("spawn")
+    workers = [context.Process(target=work, kwargs={"job_id": job_id, "forever": forever}) for _ in range(processes)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+
+def spawn_workers(job_id, processes=RCA_QUEUE_WORKERS):
+    """Start detached worker processes for `job_id`, e.g. from the API."""
+    backend_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+    workers = [
+        subprocess.Popen([sys.executable, "-m", "RCA.rca_queue", "work", "--job", job_id], cwd=backend_dir)
+        for _ in range(processes)
+    ]
+    for worker in workers:
+        # Reap each worker when it exits so finished workers do not linger as zombies
+        threading.Thread(target=worker.wait, name=f"rca-worker-{worker.pid}", daemon=True).start()
+    return [worker.pid for worker in workers]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Durable RCA work queue")
+    sub = parser.add_subparsers(dest="command", required=True)
+    enqueue_parser = sub.add_parser("enqueue")
+    enqueue_parser.add_argument("--workers", type=int, default=0, help="Worker processes to run for the new job")
+    work_parser = sub.add_parser("work")
+    work_parser.add_argument("--job")
+    work_parser.add_argument("--processes", type=int, default=1)
+    work_parser.add_argument("--forever", action="store_true", help="Keep polling for new items")
+    status_parser = sub.add_parser("status")
+    status_parser.add_argument("job_id")
+    args = parser.parse_args()
+
+    if args.command == "enqueue":
+        job = enqueue_job(get_engine())
+        print(json.dumps(job))
+        if args.workers:
+            run_workers(args.workers, job["job_id"])
+    elif args.command == "work":
+        if args.processes > 1:
+            run_workers(args.processes, args.job, args.forever)
+        else:
+            work(args.job, forever=args.forever)
+    else:
+        print(json.dumps(job_status(get_engine(), args.job_id), indent=2))
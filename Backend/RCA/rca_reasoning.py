@@ -4,28 +4,39 @@ from sentence_transformers import SentenceTransformer
 import os
 import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
-from vectordb.chroma_client import get_chroma_collection
-from groq import Groq
+from vectordb.store import get_vector_store
 from memory.db import get_engine
-from sqlalchemy import update, MetaData, text
+from sqlalchemy import update, text, bindparam
 from datetime import datetime, timedelta
-from sqlalchemy.dialects.mysql import insert as mysql_insert
 from dotenv import load_dotenv
+from RCA.llm_providers import get_llm_provider
+from RCA.llm_executor import LLMExecutor, estimate_tokens, EXPECTED_COMPLETION_TOKENS
+from RCA.rca_cache import RCACache, RCA_CACHE_ENABLED, anomaly_signature
+from RCA.incident_clustering import cluster_incidents, RCA_CLUSTER_INCIDENTS
+from RCA import pattern_stats, rca_queue
+from RCA.rca_writer import RCAResultWriter
  
  
 load_dotenv()
  
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-model_id = os.getenv("MODEL_ID")
- 
-client = Groq(api_key=GROQ_API_KEY)
- 
 embedding_model = SentenceTransformer("all-MiniLM-L6-v2")
-collection = get_chroma_collection()
+collection = get_vector_store()
+
+# Raw failure logs from add_failure_summary are excluded from RCA lookups
+RCA_SEARCH_TYPES = ["pattern", "rca_summary"]
+# Anomalies packed into one JSON-mode completion; 1 sends every anomaly on its own
+RCA_PROMPT_BATCH_SIZE = int(os.getenv("RCA_PROMPT_BATCH_SIZE", 5))
+SYSTEM_PROMPT = "You are an expert in root cause analysis of service outages and transaction failures."
  
 class RCAReasoningAgent:
-    def __init__(self):
+    def __init__(self, llm_executor=None, cache=None, llm=None):
         self.engine = get_engine()
+        self.llm = llm or get_llm_provider()
+        self.llm_executor = llm_executor or LLMExecutor()
+        self.cache = cache or (RCACache() if RCA_CACHE_ENABLED else None)
+        self.success_rates = {}
+        pattern_stats.ensure_table(self.engine)
+        self.writer = RCAResultWriter(self.engine, collection, embedding_model)
 
     def calculate_confidence_score(self, success_rate, similarity, severity, sla_urgency, w1=0.3, w2=0.4, w3=0.2, w4=0.1):
         """
@@ -40,11 +51,21 @@ class RCAReasoningAgent:
             sla_urgency * w4
         )
 
-    def fetch_anomalies_for_rca(self):
+    def fetch_anomalies_for_rca(self, txn_ids=None):
         """
-        Fetch ALL anomalies that need RCA processing (have null rca_confidence).
+        Fetch ALL anomalies that need RCA processing (have null rca_confidence),
+        or only those among `txn_ids` when given.
         This will process all null values in the most efficient way.
         """
+        if txn_ids is not None:
+            if not txn_ids:
+                return pd.DataFrame()
+            query = text("""
+                SELECT * FROM anomaly_logs
+                WHERE rca_confidence IS NULL AND txn_id IN :txn_ids
+                ORDER BY timestamp DESC
+            """).bindparams(bindparam("txn_ids", expanding=True))
+            return pd.read_sql(query, self.engine, params={"txn_ids": list(txn_ids)})
         query = """
             SELECT * FROM anomaly_logs
             WHERE rca_confidence IS NULL
@@ -52,25 +73,46 @@ class RCAReasoningAgent:
         """
         return pd.read_sql(query, self.engine)
 
-    def query_similar_patterns(self, description):
-        emb = embedding_model.encode(description).tolist()
-        results = collection.query(query_embeddings=[emb], n_results=3)
+    def query_similar_patterns(self, description, service=None, embedding=None):
+        """
+        Search patterns and past RCA summaries, restricted to the anomaly's service
+        when that slice has any matches. Returns (best_doc, best_similarity, best_id).
+        """
+        emb = embedding if embedding is not None else embedding_model.encode(description).tolist()
+        type_filter = {"type": {"$in": RCA_SEARCH_TYPES}}
+        results = None
+        if service:
+            results = collection.query(
+                query_embeddings=[emb],
+                n_results=3,
+                where={"$and": [type_filter, {"service": service}]}
+            )
+        if not results or not results.get("documents", [[]])[0]:
+            results = collection.query(query_embeddings=[emb], n_results=3, where=type_filter)
         # Return both the best document and its similarity score (assume Chroma returns 'distances' as a list of lists)
         documents = results.get("documents", [[]])[0]
         distances = results.get("distances", [[1]])[0]  # Lower distance = higher similarity
+        ids = results.get("ids", [[]])[0]
         if documents and distances:
             best_doc = documents[0]
             best_distance = distances[0]
             # Convert distance to similarity (cosine similarity = 1 - distance)
             best_similarity = 1 - best_distance
-            return best_doc, best_similarity
-        return None, 0.0
+            return best_doc, best_similarity, ids[0] if ids else None
+        return None, 0.0, None
 
-    def prompt_llm(self, anomaly, similar_patterns):
-        messages = [
+    def build_messages(self, anomaly, similar_patterns, incident=None):
+        incident_context = ""
+        if incident and incident["size"] > 1:
+            incident_context = (
+                f"\nThis is the most severe of {incident['size']} related anomalies on {anomaly['service']} "
+                f"between {incident['start']} and {incident['end']} (metrics: {', '.join(incident['metrics'])}). "
+                "Explain their shared root cause.\n"
+            )
+        return [
             {
                 "role": "system",
-                "content": "You are an expert in root cause analysis of service outages and transaction failures."
+                "content": SYSTEM_PROMPT
             },
             {
                 "role": "user",
@@ -80,7 +122,7 @@ Service: {anomaly['service']}
 Metric: {anomaly['metric']}
 Value: {anomaly['value']}
 Timestamp: {anomaly['timestamp']}
-
+{incident_context}
 And similar past patterns:
 {chr(10).join(similar_patterns)}
 
@@ -90,38 +132,138 @@ Provide a brief, clear reasoning summary.
             }
         ]
 
-        response = client.chat.completions.create(
-            model=model_id,
-            messages=messages,
-            temperature=0.4
-        )
+    def prompt_llm(self, anomaly, similar_patterns, incident=None):
+        messages = self.build_messages(anomaly, similar_patterns, incident)
+        return self.llm.complete(messages, temperature=0.4)
+
+    def build_batch_messages(self, entries):
+        """
+        One prompt for several (anomaly, similar_patterns, incident) entries,
+        asking for a JSON object keyed by txn_id.
+        """
+        blocks = []
+        for anomaly, similar_patterns, incident in entries:
+            block = f"""txn_id: {anomaly['txn_id']}
+Service: {anomaly['service']}
+Metric: {anomaly['metric']}
+Value: {anomaly['value']}
+Timestamp: {anomaly['timestamp']}"""
+            if incident and incident["size"] > 1:
+                block += (f"\nIncident: most severe of {incident['size']} related anomalies between "
+                          f"{incident['start']} and {incident['end']} (metrics: {', '.join(incident['metrics'])})")
+            if similar_patterns:
+                block += "\nSimilar past patterns:\n" + "\n".join(f"- {p}" for p in similar_patterns)
+            blocks.append(block)
+
+        return [
+            {
+                "role": "system",
+                "content": SYSTEM_PROMPT + " Always answer with a single JSON object."
+            },
+            {
+                "role": "user",
+                "content": "For each anomaly below, what is the likely root cause and a possible fix?\n\n"
+                           + "\n\n".join(blocks)
+                           + "\n\nRespond with a JSON object mapping every txn_id above to "
+                             '{"summary": "<brief, clear reasoning summary of root cause and fix>"}. '
+                             "Include each txn_id exactly once and no other keys."
+            }
+        ]
 
-        full_response = response.choices[0].message.content.strip()
-        summary = full_response.strip()
-        return summary
+    def parse_batch_response(self, content, txn_ids):
+        """Return {txn_id: summary} for the entries that parsed and validated; the rest are omitted."""
+        try:
+            data = json.loads(content)
+        except (TypeError, ValueError):
+            return {}
+        if not isinstance(data, dict):
+            return {}
+        parsed = {}
+        for txn_id in txn_ids:
+            entry = data.get(str(txn_id))
+            summary = entry.get("summary") if isinstance(entry, dict) else None
+            if isinstance(summary, str) and summary.strip():
+                parsed[txn_id] = summary.strip()
+        return parsed
+
+    def prompt_llm_batch(self, entries):
+        messages = self.build_batch_messages(entries)
+        content = self.llm.complete(messages, temperature=0.4, json_mode=True)
+        return self.parse_batch_response(content, [anomaly['txn_id'] for anomaly, _, _ in entries])
 
-    def get_success_rate(self, anomaly, similar_patterns):
+    def pack_prompts(self, prompts, batch_size):
         """
-        Calculate the success rate as the proportion of similar anomalies with rca_confidence > 0.7.
-        similar_patterns: list of similar anomaly descriptions (best_doc, ...)
+        Split prompt indices into batches of up to `batch_size`, never putting two
+        entries with the same txn_id in one batch (the response is keyed by txn_id).
+        """
+        batches = []
+        for i, (anomaly, _, _) in enumerate(prompts):
+            for batch in batches:
+                if len(batch) < batch_size and all(prompts[j][0]['txn_id'] != anomaly['txn_id'] for j in batch):
+                    batch.append(i)
+                    break
+            else:
+                batches.append([i])
+        return batches
+
+    def iter_completions(self, prompts):
+        """
+        Run (anomaly, similar_patterns, incident) prompts through the LLM, packing
+        RCA_PROMPT_BATCH_SIZE of them per request, and yield (index, summary or
+        exception) as each answer arrives. Entries a batch fails to answer with a
+        valid summary are retried as single prompts.
+        """
+        pending = list(range(len(prompts)))
+        if RCA_PROMPT_BATCH_SIZE > 1 and len(prompts) > 1:
+            batches = self.pack_prompts(prompts, RCA_PROMPT_BATCH_SIZE)
+            packed = [[prompts[i] for i in batch] for batch in batches]
+            fallback = []
+            for b, answer in self.llm_executor.as_completed(
+                self.prompt_llm_batch,
+                [(entries,) for entries in packed],
+                token_estimates=[
+                    estimate_tokens(self.build_batch_messages(entries)) + (len(entries) - 1) * EXPECTED_COMPLETION_TOKENS
+                    for entries in packed
+                ]
+            ):
+                if isinstance(answer, Exception):
+                    print(f"Batch prompt failed ({answer}); falling back to single prompts.")
+                    fallback.extend(batches[b])
+                    continue
+                for i in batches[b]:
+                    summary = answer.get(prompts[i][0]['txn_id'])
+                    if summary is None:
+                        fallback.append(i)
+                    else:
+                        yield i, summary
+            pending = sorted(fallback)
+            if pending:
+                print(f"{len(pending)} of {len(prompts)} anomalies need single-prompt fallback.")
+
+        for j, result in self.llm_executor.as_completed(
+            self.prompt_llm,
+            [prompts[i] for i in pending],
+            token_estimates=[estimate_tokens(self.build_messages(*prompts[i])) for i in pending]
+        ):
+            yield pending[j], result
+
+    def load_success_rates(self, pattern_ids):
+        """
+        Batch-fetch success rates (share of past RCAs with confidence > 0.7) for the
+        matched patterns from the rca_pattern_stats aggregate.
         """
-        if not similar_patterns or not similar_patterns[0]:
-            return 0.0
-        best_doc = similar_patterns[0]
         with self.engine.connect() as conn:
-            query = text("""
-                SELECT COUNT(*) as total, SUM(CASE WHEN rca_confidence > 0.7 THEN 1 ELSE 0 END) as success
-                FROM anomaly_logs
-                WHERE rca_summary LIKE :like_pattern
-            """)
-            like_pattern = f"%{best_doc[:30]}%"
-            result = conn.execute(query, {"like_pattern": like_pattern}).fetchone()
-            # result is a tuple: (total, success)
-            total = result[0] if result and result[0] else 0
-            success = result[1] if result and result[1] else 0
-            if total == 0:
-                return 0.0
-            return success / total
+            self.success_rates = pattern_stats.fetch_success_rates(conn, pattern_ids)
+        return self.success_rates
+
+    def get_success_rate(self, anomaly, pattern_id):
+        """
+        Success rate of past RCAs whose best match was the same pattern, from the
+        rates loaded by load_success_rates.
+        """
+        if not pattern_id:
+            return 0.0
+        return self.success_rates.get(pattern_id, 0.0)
 
     def get_similarity(self, anomaly, similar_patterns):
         """
@@ -168,91 +310,158 @@ Provide a brief, clear reasoning summary.
             return 0.3
 
     def save_to_chroma(self, summary, anomaly, confidence):
-        emb = embedding_model.encode(summary).tolist()
-        collection.add(
-            documents=[summary],
-            embeddings=[emb],
-            metadatas=[{
-                "txn_id": anomaly["txn_id"],
-                "service": anomaly["service"],
-                "timestamp": str(anomaly["timestamp"]),
-                "type": "rca_summary",
-                "confidence": confidence
-            }],
-            ids=[f"rca_{anomaly['txn_id']}"],
-        )
-        print(f"RCA Summary stored in ChromaDB for txn_id: {anomaly['txn_id']}")
+        """Store one RCA summary in the vector store right away, bypassing the write buffer."""
+        self.writer.upsert_vectors([(summary, anomaly, confidence, None)])
+        print(f"RCA Summary stored in the vector store for txn_id: {anomaly['txn_id']}")
 
-    def save_to_mysql(self, summary, anomaly, confidence):
+    def save_to_mysql(self, summary, anomaly, confidence, pattern_id=None):
         """
-        Save the RCA summary and confidence to the anomaly_logs table.
-        If the txn_id exists, update the row; otherwise, insert a new row.
+        Write one RCA summary and confidence to anomaly_logs right away (update
+        or insert by txn_id). The first RCA for a row is also counted in
+        rca_pattern_stats under pattern_id, as in a batched flush.
         """
-        metadata = MetaData()
-        metadata.reflect(bind=self.engine)
-        table = metadata.tables.get("anomaly_logs")
+        self.writer.write_mysql([(summary, anomaly, confidence, pattern_id)])
+        print(f"RCA Summary saved in MySQL for txn_id: {anomaly['txn_id']}")
 
-        if table is None:
-            print("Table 'anomaly_logs' not found in MySQL.")
-            return
+    def describe(self, anomaly):
+        return f"{anomaly['service']} {anomaly['metric']} anomaly: {anomaly['value']} at {anomaly['timestamp']}"
 
-        with self.engine.connect() as conn:
-            # Check if txn_id exists
-            select_stmt = table.select().where(table.c.txn_id == anomaly["txn_id"])
-            result = conn.execute(select_stmt).fetchone()
-            if result:
-                # Update existing row
-                update_stmt = (
-                    table.update()
-                    .where(table.c.txn_id == anomaly["txn_id"])
-                    .values(
-                        rca_summary=summary,
-                        rca_confidence=confidence
-                    )
-                )
-                conn.execute(update_stmt)
-                print(f"RCA Summary updated in MySQL for txn_id: {anomaly['txn_id']}")
-            else:
-                # Insert new row
-                insert_stmt = mysql_insert(table).values(
-                    txn_id=anomaly["txn_id"],
-                    service=anomaly["service"],
-                    metric=anomaly["metric"],
-                    value=anomaly["value"],
-                    timestamp=anomaly["timestamp"],
-                    z_score=anomaly["z_score"],
-                    rca_summary=summary,
-                    rca_confidence=confidence
-                )
-                conn.execute(insert_stmt)
-                print(f"RCA Summary inserted in MySQL for txn_id: {anomaly['txn_id']}")
-            conn.commit()
+    def incident_context(self, rows, members):
+        timestamps = sorted(str(rows[i]['timestamp']) for i in members)
+        return {
+            "size": len(members),
+            "start": timestamps[0],
+            "end": timestamps[-1],
+            "metrics": sorted({str(rows[i]['metric']) for i in members}),
+        }
 
-    def run(self):
-        anomalies = self.fetch_anomalies_for_rca()
+    def stream(self, flush_each=True, txn_ids=None, lease=True):
+        """
+        Run RCA over all pending anomalies, yielding one result dict per anomaly
+        as soon as its incident has a summary: cache hits first, then LLM answers
+        in completion order. With `flush_each`, results are written to MySQL and
+        the vector store before they are yielded; otherwise they are written in
+        full batches. Failed incidents are yielded with an error and left pending
+        for the next run. `txn_ids` restricts the run to those anomalies.
+
+        The anomalies are queued and claimed in batches through the RCA work
+        queue, so concurrent runs never process the same rows; pass
+        `lease=False` only when the caller already holds their leases.
+        """
+        if not lease:
+            yield from self._stream_anomalies(flush_each, txn_ids)
+            return
+        rca_queue.enqueue_job(self.engine, txn_ids)
+        yield from rca_queue.leased_results(
+            self.engine, rca_queue.worker_name(), lambda ids: self._stream_anomalies(flush_each, ids), txn_ids=txn_ids
+        )
+
+    def _stream_anomalies(self, flush_each, txn_ids):
+        anomalies = self.fetch_anomalies_for_rca(txn_ids)
         if anomalies.empty:
             print("No anomalies found that need RCA processing (all have rca_confidence values).")
             return
 
         print(f"Processing {len(anomalies)} anomalies for RCA...")
-        for _, row in anomalies.iterrows():
-            anomaly = row.to_dict()
-            desc = f"{anomaly['service']} {anomaly['metric']} anomaly: {anomaly['value']} at {anomaly['timestamp']}"
-            best_doc, best_similarity = self.query_similar_patterns(desc)
-            rca_summary = self.prompt_llm(anomaly, [best_doc] if best_doc else [])
-
-            # Calculate each factor (replace with real logic as needed)
-            success_rate = self.get_success_rate(anomaly, [best_doc] if best_doc else [])
-            similarity = self.get_similarity(anomaly, (best_doc, best_similarity))
-            severity = self.get_severity(anomaly)
-            sla_urgency = self.get_sla_urgency(anomaly)
-
-            confidence = self.calculate_confidence_score(success_rate, similarity, severity, sla_urgency)
-
-            self.save_to_chroma(rca_summary, anomaly, confidence)
-            self.save_to_mysql(rca_summary, anomaly, confidence)
-        
+        rows = [row.to_dict() for _, row in anomalies.iterrows()]
+        descriptions = [self.describe(anomaly) for anomaly in rows]
+        embeddings = embedding_model.encode(descriptions)
+
+        # One RCA per incident (same service, close in time, similar description),
+        # reasoned about from its most severe anomaly and fanned out to every member
+        if RCA_CLUSTER_INCIDENTS:
+            labels = cluster_incidents(anomalies, embeddings)
+        else:
+            labels = list(range(len(rows)))
+        incidents = {}
+        for i, label in enumerate(labels):
+            incidents.setdefault(label, []).append(i)
+        incidents = list(incidents.values())
+        representatives = [max(members, key=lambda i: rows[i].get("z_score") or 0) for members in incidents]
+        contexts = [self.incident_context(rows, members) for members in incidents]
+        matches = [
+            self.query_similar_patterns(descriptions[r], rows[r]['service'], embeddings[r].tolist())
+            for r in representatives
+        ]
+        self.load_success_rates([match[2] for match in matches])
+
+        # Incidents with the same signature (service, metric, value bucket, best pattern)
+        # share one RCA, served from the cache when a recent one exists
+        if self.cache is not None:
+            keys = [anomaly_signature(rows[r], match[2]) for r, match in zip(representatives, matches)]
+        else:
+            keys = list(range(len(incidents)))
+        incidents_by_key = {}
+        for n, key in enumerate(keys):
+            incidents_by_key.setdefault(key, []).append(n)
+
+        def finish(key, rca_summary, source):
+            results = []
+            for n in incidents_by_key[key]:
+                best_doc, best_similarity, best_id = matches[n]
+                members = incidents[n]
+                if isinstance(rca_summary, Exception):
+                    # Leave rca_confidence NULL so the incident is picked up again next run
+                    print(f"RCA failed for txn_id {rows[representatives[n]]['txn_id']} "
+                          f"({len(members)} anomalies): {rca_summary}")
+                    self.failed += len(members)
+                    results.extend({**self.result_fields(rows[i]), "status": "failed",
+                                    "error": str(rca_summary), "incident_size": len(members)} for i in members)
+                    continue
+
+                for i in members:
+                    anomaly = rows[i]
+                    # Calculate each factor (replace with real logic as needed)
+                    success_rate = self.get_success_rate(anomaly, best_id)
+                    similarity = self.get_similarity(anomaly, (best_doc, best_similarity))
+                    severity = self.get_severity(anomaly)
+                    sla_urgency = self.get_sla_urgency(anomaly)
+
+                    confidence = self.calculate_confidence_score(success_rate, similarity, severity, sla_urgency)
+
+                    # Buffered; written in batches to MySQL and the vector store
+                    self.writer.add(rca_summary, anomaly, confidence, best_id)
+                    results.append({**self.result_fields(anomaly), "status": "ok", "rca_summary": rca_summary,
+                                    "rca_confidence": confidence, "pattern_id": best_id,
+                                    "incident_size": len(members), "source": source})
+            if flush_each:
+                self.writer.flush()
+            return results
+
+        self.failed = 0
+        prompt_keys = []
+        for key in incidents_by_key:
+            cached = self.cache.get(key) if self.cache is not None else None
+            if cached is not None:
+                yield from finish(key, cached, "cache")
+            else:
+                prompt_keys.append(key)
+
+        # LLM calls run concurrently under the provider's rate limits
+        prompts = [
+            (rows[representatives[n]], [matches[n][0]] if matches[n][0] else [], contexts[n])
+            for n in (incidents_by_key[key][0] for key in prompt_keys)
+        ]
+        for i, result in self.iter_completions(prompts):
+            if self.cache is not None and not isinstance(result, Exception):
+                self.cache.put(prompt_keys[i], result)
+            yield from finish(prompt_keys[i], result, "llm")
+        self.writer.flush()
+
+        if self.failed:
+            print(f"{self.failed} anomalies failed RCA and will be retried on the next run.")
+        print(f"RCA prompts: {len(prompts)} for {len(rows)} anomalies in {len(incidents)} incidents "
+              f"(LLM requests: {self.llm_executor.stats}).")
+        if self.cache is not None:
+            print(f"RCA cache: {self.cache.stats()}")
         print(f"RCA processing completed for {len(anomalies)} anomalies.")
+
+    def result_fields(self, anomaly):
+        return {key: anomaly.get(key) for key in ("txn_id", "service", "metric", "value", "timestamp", "z_score")}
+
+    def run(self):
+        for _ in self.stream(flush_each=False):
+            pass
  
 if __name__ == "__main__":
     RCAReasoningAgent().run()
@@ -0,0 +1,118 @@
+# RCA/rca_results.py
+#
+# Keyset-paginated reads of RCA results from anomaly_logs for the dashboards.
+# Pages are ordered newest first on (timestamp, id) and continue from an opaque
+# cursor holding the last row's key, so every page is an index range scan no
+# matter how deep the client pages, unlike LIMIT/OFFSET.
+
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import and_, or_, inspect, exc, select, table, column, text
+
+MAX_PAGE_SIZE = 1000
+RESULT_COLUMNS = ("id", "txn_id", "service", "metric", "value", "timestamp", "z_score", "rca_summary", "rca_confidence")
+DEFAULT_FIELDS = ("txn_id", "service", "metric", "value", "timestamp", "z_score", "rca_summary", "rca_confidence")
+
+anomaly_logs = table("anomaly_logs", *[column(name) for name in RESULT_COLUMNS])
+
+_index_ready = False
+
+
+def ensure_index(engine):
+    """Create the (timestamp, id) index the keyset predicate relies on, once."""
+    global _index_ready
+    if _index_ready:
+        return
+    indexes = inspect(engine).get_indexes("anomaly_logs")
+    if not any(index["column_names"][:2] == ["timestamp", "id"] for index in indexes):
+        try:
+            with engine.begin() as conn:
+                conn.execute(text("CREATE INDEX idx_anomaly_logs_timestamp_id ON anomaly_logs (timestamp, id)"))
+        except exc.DBAPIError as e:
+            # Concurrent creation, or no ALTER privilege: pages still work, just slower
+            print(f"Could not create anomaly_logs (timestamp, id) index: {e}")
+    _index_ready = True
+
+
+def encode_cursor(timestamp, row_id):
+    payload = json.dumps([timestamp.isoformat() if isinstance(timestamp, datetime) else str(timestamp), row_id])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        timestamp, row_id = json.loads(raw)
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def parse_fields(fields):
+    if not fields:
+        return list(DEFAULT_FIELDS)
+    requested = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in requested if name not in RESULT_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)} (allowed: {', '.join(RESULT_COLUMNS)})")
+    return list(dict.fromkeys(requested))
+
+
+def fetch_rca_page(engine, limit=100, cursor=None, services=None, metrics=None, min_confidence=None,
+                   max_confidence=None, start=None, end=None, fields=None, include_pending=False):
+    """
+    Return {"data": [...], "next_cursor": str | None, "has_more": bool} for one
+    page of anomaly_logs rows, newest first. Only the requested `fields` (plus
+    the key columns) are selected; all filters are applied in SQL.
+    """
+    ensure_index(engine)
+    fields = parse_fields(fields)
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    c = anomaly_logs.c
+
+    conditions = [c.timestamp.isnot(None)]
+    if not include_pending:
+        conditions += [c.rca_summary.isnot(None), c.rca_confidence.isnot(None)]
+    if services:
+        conditions.append(c.service.in_(services))
+    if metrics:
+        conditions.append(c.metric.in_(metrics))
+    if min_confidence is not None:
+        conditions.append(c.rca_confidence >= min_confidence)
+    if max_confidence is not None:
+        conditions.append(c.rca_confidence <= max_confidence)
+    if start is not None:
+        conditions.append(c.timestamp >= start)
+    if end is not None:
+        conditions.append(c.timestamp < end)
+    if cursor:
+        last_timestamp, last_id = decode_cursor(cursor)
+        conditions.append(or_(c.timestamp < last_timestamp, and_(c.timestamp == last_timestamp, c.id < last_id)))
+
+    selected = list(dict.fromkeys(["timestamp", "id"] + fields))
+    query = (
+        select(*[c[name] for name in selected])
+        .where(and_(*conditions))
+        .order_by(c.timestamp.desc(), c.id.desc())
+        .limit(limit + 1)
+    )
+    with engine.connect() as conn:
+        rows = conn.execute(query).fetchall()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    data = []
+    for row in rows:
+        record = {}
+        for name in fields:
+            value = row._mapping[name]
+            if name == "timestamp":
+                value = str(value)
+            elif name in ("value", "z_score", "rca_confidence") and value is not None:
+                value = float(value)
+            record[name] = value
+        data.append(record)
+    next_cursor = encode_cursor(rows[-1]._mapping["timestamp"], rows[-1]._mapping["id"]) if has_more else None
+    return {"data": data, "next_cursor": next_cursor, "has_more": has_more}
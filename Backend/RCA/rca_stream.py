@@ -0,0 +1,163 @@
+# RCA/rca_stream.py
+#
+# Streaming RCA runs for /api/rca-reasoning/stream. A run executes on its own
+# thread and appends each anomaly's result to an event log; any number of
+# clients follow the log and can reconnect with a resume token
+# ("<run_id>.<seq>") to pick up after the last event they saw. Disconnecting
+# does not cancel the run, and results are persisted as they are emitted, so a
+# reconnect never repeats LLM work.
+
+import json
+import math
+import os
+import threading
+import time
+import uuid
+from datetime import date, datetime
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Finished runs stay resumable for this long
+RCA_STREAM_RETENTION_S = int(os.getenv("RCA_STREAM_RETENTION_S", 900))
+# Idle streams send a keepalive this often so proxies do not close them
+RCA_STREAM_HEARTBEAT_S = float(os.getenv("RCA_STREAM_HEARTBEAT_S", 15))
+
+
+def jsonable(value):
+    """Convert numpy scalars, NaN and timestamps to plain JSON values."""
+    if hasattr(value, "item") and not isinstance(value, (datetime, date)):
+        value = value.item()
+    if isinstance(value, float) and (math.isnan(value) or math.isinf(value)):
+        return None
+    if isinstance(value, (datetime, date)):
+        return str(value)
+    return value
+
+
+def _default_agent():
+    from RCA.rca_reasoning import RCAReasoningAgent
+    return RCAReasoningAgent()
+
+
+class RCAStreamRun:
+    def __init__(self, agent_factory=_default_agent):
+        self.run_id = uuid.uuid4().hex[:12]
+        self.events = []
+        self.done = False
+        self.finished_at = None
+        self.started_at = time.time()
+        self._agent_factory = agent_factory
+        self._cond = threading.Condition()
+
+    def start(self):
+        threading.Thread(target=self._work, name=f"rca-stream-{self.run_id}", daemon=True).start()
+        return self
+
+    def _work(self):
+        counts = {"ok": 0, "failed": 0}
+        try:
+            for result in self._agent_factory().stream():
+                counts[result.get("status", "ok")] = counts.get(result.get("status", "ok"), 0) + 1
+                self._publish("rca", {key: jsonable(value) for key, value in result.items()})
+        except Exception as e:
+            self._publish("error", {"error": str(e)})
+        finally:
+            self._publish("done", {"results": counts, "elapsed_s": round(time.time() - self.started_at, 2)})
+            with self._cond:
+                self.done = True
+                self.finished_at = time.time()
+                self._cond.notify_all()
+
+    def _publish(self, event, data):
+        with self._cond:
+            self.events.append((len(self.events) + 1, event, data))
+            self._cond.notify_all()
+
+    def token(self, seq):
+        return f"{self.run_id}.{seq}"
+
+    def follow(self, after=0, heartbeat_s=RCA_STREAM_HEARTBEAT_S):
+        """
+        Yield (seq, event, data) for every event after `after`, blocking for new
+        ones until the run is done; yields (None, "heartbeat", None) while idle.
+        """
+        while True:
+            with self._cond:
+                if len(self.events) <= after and not self.done:
+                    self._cond.wait(heartbeat_s)
+                new = self.events[after:]
+                done = self.done
+            if new:
+                yield from new
+                after = new[-1][0]
+            elif done:
+                return
+            else:
+                yield None, "heartbeat", None
+
+
+class RCAStreamRegistry:
+    def __init__(self, agent_factory=_default_agent, retention_s=RCA_STREAM_RETENTION_S):
+        self.agent_factory = agent_factory
+        self.retention_s = retention_s
+        self.runs = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def parse_token(token):
+        run_id, _, seq = (token or "").partition(".")
+        try:
+            return run_id, int(seq)
+        except ValueError:
+            return run_id, 0
+
+    def open(self, token=None):
+        """
+        Return (run, after_seq, resumed). A token for a retained run resumes it
+        after the given event; otherwise the client attaches to the run in
+        progress, or a new run starts over the anomalies still pending RCA.
+        """
+        with self._lock:
+            now = time.time()
+            for run_id, run in list(self.runs.items()):
+                if run.done and now - run.finished_at > self.retention_s:
+                    del self.runs[run_id]
+
+            run_id, seq = self.parse_token(token)
+            if run_id in self.runs:
+                return self.runs[run_id], seq, True
+            for run in self.runs.values():
+                if not run.done:
+                    return run, 0, False
+            run = RCAStreamRun(self.agent_factory).start()
+            self.runs[run.run_id] = run
+            return run, 0, False
+
+
+def format_event(run, seq, event, data, fmt="ndjson"):
+    if fmt == "sse":
+        if event == "heartbeat":
+            return ": keepalive\n\n"
+        return f"id: {run.token(seq)}\nevent: {event}\ndata: {json.dumps(data)}\n\n"
+    if event == "heartbeat":
+        return json.dumps({"event": "heartbeat"}) + "\n"
+    return json.dumps({"event": event, "resume_token": run.token(seq), "data": data}) + "\n"
+
+
+def stream_run(run, after=0, resumed=False, fmt="ndjson"):
+    """Text chunks for one client following `run` from event `after`."""
+    yield format_event(run, after, "run", {"run_id": run.run_id, "resumed": resumed}, fmt)
+    for seq, event, data in run.follow(after):
+        yield format_event(run, seq, event, data, fmt)
+
+
+_registry = None
+
+
+def get_stream_registry():
+    global _registry
+    if _registry is None:
+        _registry = RCAStreamRegistry()
+    return _registry
@@ -0,0 +1,162 @@
+# RCA/rca_writer.py
+
+import os
+import time
+
+import pandas as pd
+from sqlalchemy import Table, Column, MetaData, String, Text, Float, DateTime, text
+
+from RCA.pattern_stats import HIGH_CONFIDENCE_THRESHOLD
+from vectordb.store import store_lock
+
+RCA_WRITE_BATCH_SIZE = int(os.getenv("RCA_WRITE_BATCH_SIZE", 200))
+
+# Per-connection staging table: one multi-row INSERT per batch, then set-based
+# statements against anomaly_logs
+staging = Table(
+    "rca_writeback",
+    MetaData(),
+    Column("txn_id", String(255)),
+    Column("service", String(100)),
+    Column("metric", String(100)),
+    Column("value", Float),
+    Column("timestamp", DateTime),
+    Column("z_score", Float),
+    Column("rca_summary", Text),
+    Column("rca_confidence", Float),
+    Column("pattern_id", String(255)),
+)
+
+CREATE_STAGING = text("""
+    CREATE TEMPORARY TABLE IF NOT EXISTS rca_writeback (
+        txn_id VARCHAR(255) PRIMARY KEY,
+        service VARCHAR(100),
+        metric VARCHAR(100),
+        value DOUBLE,
+        timestamp DATETIME,
+        z_score DOUBLE,
+        rca_summary TEXT,
+        rca_confidence DOUBLE,
+        pattern_id VARCHAR(255)
+    )
+""")
+
+# Count only rows getting their first RCA, so re-flushing a batch leaves the stats unchanged
+UPDATE_PATTERN_STATS = text("""
+    INSERT INTO rca_pattern_stats (pattern_id, total, high_confidence)
+    SELECT s.pattern_id, COUNT(*), SUM(s.rca_confidence > :threshold)
+    FROM rca_writeback s
+    WHERE s.pattern_id IS NOT NULL
+      AND NOT EXISTS (
+          SELECT 1 FROM anomaly_logs a
+          WHERE a.txn_id = s.txn_id AND a.rca_confidence IS NOT NULL
+      )
+    GROUP BY s.pattern_id
+    ON DUPLICATE KEY UPDATE
+        total = rca_pattern_stats.total + VALUES(total),
+        high_confidence = rca_pattern_stats.high_confidence + VALUES(high_confidence)
+""")
+
+INSERT_MISSING = text("""
+    INSERT INTO anomaly_logs (txn_id, service, metric, value, timestamp, z_score, rca_summary, rca_confidence)
+    SELECT s.txn_id, s.service, s.metric, s.value, s.timestamp, s.z_score, s.rca_summary, s.rca_confidence
+    FROM rca_writeback s
+    LEFT JOIN anomaly_logs a ON a.txn_id = s.txn_id
+    WHERE a.txn_id IS NULL
+""")
+
+UPDATE_EXISTING = text("""
+    UPDATE anomaly_logs a
+    JOIN rca_writeback s ON a.txn_id = s.txn_id
+    SET a.rca_summary = s.rca_summary, a.rca_confidence = s.rca_confidence
+""")
+
+
+def _plain(value):
+    """Convert numpy scalars and NaN/NaT to values the MySQL driver accepts."""
+    if value is None or isinstance(value, str):
+        return value
+    if pd.isna(value):
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.to_pydatetime()
+    return value.item() if hasattr(value, "item") else value
+
+
+class RCAResultWriter:
+    """
+    Accumulates RCA results and writes each batch with one staging INSERT plus
+    set-based statements in a single MySQL transaction, and one vector store
+    upsert. Rows are keyed by txn_id (last result wins inside a batch), so a
+    retried flush rewrites the same values and does not double count stats.
+    """
+
+    def __init__(self, engine, collection, embedding_model, batch_size=RCA_WRITE_BATCH_SIZE):
+        self.engine = engine
+        self.collection = collection
+        self.embedding_model = embedding_model
+        self.batch_size = batch_size
+        self.pending = {}
+        self.written = 0
+
+    def add(self, summary, anomaly, confidence, pattern_id=None):
+        self.pending[str(anomaly["txn_id"])] = (summary, anomaly, confidence, pattern_id)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return 0
+        batch = list(self.pending.values())
+        started = time.perf_counter()
+        # Vectors first: if the MySQL commit fails the rows stay pending and the
+        # next run re-upserts the same ids
+        self.upsert_vectors(batch)
+        self.write_mysql(batch)
+        self.pending.clear()
+        self.written += len(batch)
+        print(f"Flushed {len(batch)} RCA results in {time.perf_counter() - started:.2f}s")
+        return len(batch)
+
+    def upsert_vectors(self, batch):
+        """One vector store upsert for [(summary, anomaly, confidence, pattern_id)]."""
+        summaries = [summary for summary, _, _, _ in batch]
+        embeddings = self.embedding_model.encode(summaries).tolist()
+        with store_lock:
+            self.collection.upsert(
+                documents=summaries,
+                embeddings=embeddings,
+                metadatas=[{
+                    "txn_id": str(anomaly["txn_id"]),
+                    "service": anomaly["service"],
+                    "metric": anomaly["metric"],
+                    "timestamp": str(anomaly["timestamp"]),
+                    "type": "rca_summary",
+                    "confidence": confidence,
+                    "created_at": int(time.time())
+                } for _, anomaly, confidence, _ in batch],
+                ids=[f"rca_{anomaly['txn_id']}" for _, anomaly, _, _ in batch],
+            )
+
+    def write_mysql(self, batch):
+        """One MySQL transaction for [(summary, anomaly, confidence, pattern_id)]."""
+        rows = [{
+            "txn_id": str(anomaly["txn_id"]),
+            "service": _plain(anomaly.get("service")),
+            "metric": _plain(anomaly.get("metric")),
+            "value": _plain(anomaly.get("value")),
+            "timestamp": _plain(anomaly.get("timestamp")),
+            "z_score": _plain(anomaly.get("z_score")),
+            "rca_summary": summary,
+            "rca_confidence": _plain(confidence),
+            "pattern_id": pattern_id,
+        } for summary, anomaly, confidence, pattern_id in batch]
+
+        with self.engine.begin() as conn:
+            conn.execute(CREATE_STAGING)
+            conn.execute(text("DELETE FROM rca_writeback"))
+            conn.execute(staging.insert().values(rows))
+            conn.execute(UPDATE_PATTERN_STATS, {"threshold": HIGH_CONFIDENCE_THRESHOLD})
+            conn.execute(INSERT_MISSING)
+            conn.execute(UPDATE_EXISTING)
+            conn.execute(text("DELETE FROM rca_writeback"))
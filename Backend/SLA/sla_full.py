@@ -1,12 +1,20 @@
 # Updated SLA code with confidence score integrated from RCAReasoningAgent (rca_reasoning.py)
 
+import json
 import logging
-from typing import Dict, Any, Optional
+import os
+import sys
+from typing import Dict, Any, Optional, Sequence, Iterable, List
 from datetime import datetime, timedelta
 from pydantic import BaseModel, Field
-from sqlalchemy import Column, Integer, Float, Boolean, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, Float, Boolean, DateTime, ForeignKey, table, column, text
 from sqlalchemy.orm import declarative_base
-import pymysql
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from memory.db import get_engine
+from SLA.sla_rollups import ensure_table as ensure_rollups_table, record_sla_results
 
 # --- ORM Base (for standalone use) ---
 Base = declarative_base()
@@ -40,8 +48,32 @@ class SLAResponse(BaseModel):
     sla_level: str
     alert_type: str
 
+# Alert type used for SLA thresholds when an anomaly only carries its metric
+METRIC_ALERT_TYPES = {
+    "latency_ms": "latency_spike",
+    "error_rate": "gateway_error",
+}
+
+# SLA levels by how many of an alert type's (critical, warning, normal) thresholds the duration exceeds
+SLA_LEVELS = np.array(["met", "warning", "breached", "critical_breach"], dtype=object)
+
 # --- SLAAgent Logic ---
 class SLAAgent:
+    base_users = {
+        "latency_spike": 50,
+        "gateway_error": 100,
+        "timeout": 25,
+        "validation_error": 75,
+        "insufficient_funds": 10
+    }
+    region_multipliers = {
+        "us-east": 1.5,
+        "us-west": 1.2,
+        "eu-west": 1.3,
+        "ap-southeast": 1.1,
+        "default": 1.0
+    }
+
     def __init__(self):
         self.sla_thresholds = {
             "latency_spike": {"critical": 60, "warning": 300, "normal": 600},
@@ -89,22 +121,8 @@ class SLAAgent:
 
     def calculate_users_affected(self, alert_type: str, region: str) -> int:
         try:
-            base_users = {
-                "latency_spike": 50,
-                "gateway_error": 100,
-                "timeout": 25,
-                "validation_error": 75,
-                "insufficient_funds": 10
-            }
-            region_multipliers = {
-                "us-east": 1.5,
-                "us-west": 1.2,
-                "eu-west": 1.3,
-                "ap-southeast": 1.1,
-                "default": 1.0
-            }
-            base_count = base_users.get(alert_type, 25)
-            multiplier = region_multipliers.get(region, region_multipliers["default"])
+            base_count = self.base_users.get(alert_type, 25)
+            multiplier = self.region_multipliers.get(region, self.region_multipliers["default"])
             affected_users = int(base_count * multiplier)
             self.logger.info(f"Calculated {affected_users} users affected for alert type {alert_type} in region {region}")
             return affected_users
@@ -112,64 +130,172 @@ class SLAAgent:
             self.logger.error(f"Error calculating users affected: {e}")
             return 1
 
-# --- Updated SLA Analysis Storage ---
+    def calculate_sla_compliance_batch(self, alert_detected_at: Sequence, fix_completed_at: Sequence,
+                                       alert_types: Sequence[str]) -> pd.DataFrame:
+        """
+        Vectorized calculate_sla_compliance: one row per alert, with the same
+        columns and values the scalar version returns. Levels come from one
+        np.searchsorted per alert type over its sorted threshold table.
+        Rows whose timestamps cannot be parsed get the scalar error result.
+        """
+        detected = pd.to_datetime(pd.Series(alert_detected_at), errors="coerce")
+        completed = pd.to_datetime(pd.Series(fix_completed_at), errors="coerce")
+        if len(completed) == 1 and len(detected) > 1:
+            completed = pd.Series(completed.iloc[0], index=detected.index)
+        # Positional, so a Series of alert types with its own index is not realigned into NaN
+        alert_types = pd.Series(np.asarray(alert_types, dtype=object), index=detected.index)
+        durations = ((completed.to_numpy() - detected.to_numpy()) / np.timedelta64(1, "s")).astype(float)
+        valid = ~np.isnan(durations)
+
+        # Unknown alert types fall back to gateway_error thresholds, as in the scalar version
+        resolved = np.where(alert_types.isin(list(self.sla_thresholds)), alert_types, "gateway_error")
+        codes, uniques = pd.factorize(resolved)
+        tables = [self.sla_thresholds[alert_type] for alert_type in uniques]
+        level_index = np.zeros(len(durations), dtype=int)
+        for code, thresholds_for in enumerate(tables):
+            mask = valid & (codes == code)
+            edges = np.array([thresholds_for["critical"], thresholds_for["warning"], thresholds_for["normal"]], dtype=float)
+            # side="left": a duration equal to a threshold still meets that level, as in the scalar version
+            level_index[mask] = np.searchsorted(edges, durations[mask], side="left")
+
+        levels = SLA_LEVELS[level_index]
+        breached = level_index >= 2
+        table_array = np.empty(len(tables), dtype=object)
+        table_array[:] = tables
+        thresholds = table_array[codes] if len(tables) else np.empty(0, dtype=object)
+        levels[~valid] = "unknown"
+        breached[~valid] = True
+        for i in np.flatnonzero(~valid):
+            thresholds[i] = {}
+        result = pd.DataFrame({
+            "duration_seconds": np.where(valid, durations, 0),
+            "sla_level": levels,
+            "breached": breached,
+            "thresholds": thresholds,
+            "alert_type": alert_types,
+        }, index=detected.index)
+        self.logger.info(f"SLA batch calculation: {len(result)} alerts, {int(breached.sum())} breached")
+        return result
+
+    def calculate_users_affected_batch(self, alert_types: Sequence[str], regions: Sequence[str]) -> np.ndarray:
+        """Vectorized calculate_users_affected; returns an int array matching the scalar results."""
+        base = pd.Series(np.asarray(alert_types, dtype=object)).map(self.base_users).fillna(25).to_numpy(dtype=float)
+        multiplier = (
+            pd.Series(np.asarray(regions, dtype=object)).map(self.region_multipliers)
+            .fillna(self.region_multipliers["default"]).to_numpy(dtype=float)
+        )
+        return np.trunc(base * multiplier).astype(int)
+
+# --- SLA Analysis Storage ---
+SLA_TABLE_COLUMNS = (
+    "acc_no", "txn_id", "root_cause", "fix_suggestion", "actions_taken", "confidence", "explanation",
+    "sla_breached", "estimated_loss", "users_affected", "severity",
+)
+sla_table = table("sla_table", *[column(name) for name in SLA_TABLE_COLUMNS])
+
+# Rows per INSERT statement, to stay well under max_allowed_packet
+SLA_WRITE_CHUNK_SIZE = int(os.getenv("SLA_WRITE_CHUNK_SIZE", 500))
+
+# Placeholder values used until the remediation flow reports real ones
+SLA_ROW_DEFAULTS = {
+    "acc_no": "UDAX43321819",
+    "fix_suggestion": "reroute_gateway",
+    "actions_taken": ["rerouted_gateway"],
+    "sla_breached": True,
+    "estimated_loss": 348,
+    "users_affected": 1,
+    "severity": "critical",
+}
+
+SEVERITY_BY_SLA_LEVEL = {
+    "met": "low",
+    "warning": "medium",
+    "breached": "high",
+    "critical_breach": "critical",
+}
+
+
+def build_sla_row(anomaly: Dict[str, Any], confidence_score: float) -> Dict[str, Any]:
+    """
+    sla_table row for one anomaly. Fields the anomaly carries (acc_no,
+    sla_breached, users_affected, severity or sla_level, ...) override the
+    placeholders; root cause and explanation come from its RCA summary.
+    """
+    def value(key, default=None):
+        item = anomaly.get(key, default)
+        return default if item is None or (isinstance(item, float) and np.isnan(item)) else item
+
+    severity = value("severity") or SEVERITY_BY_SLA_LEVEL.get(value("sla_level"), SLA_ROW_DEFAULTS["severity"])
+    actions_taken = value("actions_taken", SLA_ROW_DEFAULTS["actions_taken"])
+    row = {
+        "acc_no": value("acc_no", SLA_ROW_DEFAULTS["acc_no"]),
+        "txn_id": value("txn_id", "TXN12345"),
+        "root_cause": value("rca_summary", "gateway_timeout"),
+        "fix_suggestion": value("fix_suggestion", SLA_ROW_DEFAULTS["fix_suggestion"]),
+        "actions_taken": actions_taken if isinstance(actions_taken, str) else json.dumps(list(actions_taken)),
+        "confidence": confidence_score,
+        "explanation": value("rca_summary", "RCA not available"),
+        "sla_breached": bool(value("sla_breached", value("breached", SLA_ROW_DEFAULTS["sla_breached"]))),
+        "estimated_loss": value("estimated_loss", SLA_ROW_DEFAULTS["estimated_loss"]),
+        "users_affected": int(value("users_affected", SLA_ROW_DEFAULTS["users_affected"])),
+        "severity": severity,
+    }
+    return {key: item.item() if hasattr(item, "item") else item for key, item in row.items()}
+
+
+def sla_results_frame(anomalies: List[Dict[str, Any]]) -> pd.DataFrame:
+    """
+    The SLA result columns the rollups aggregate (timestamp, service,
+    alert_type, duration_seconds, breached) for the given anomalies. Anomalies
+    without an alert type or compliance result are evaluated against now.
+    """
+    frame = pd.DataFrame(anomalies)
+    if "alert_type" not in frame:
+        metrics = frame["metric"] if "metric" in frame else pd.Series(None, index=frame.index, dtype=object)
+        frame["alert_type"] = metrics.map(METRIC_ALERT_TYPES).fillna("gateway_error")
+    if "duration_seconds" not in frame or "breached" not in frame:
+        compliance = SLAAgent().calculate_sla_compliance_batch(frame["timestamp"], [datetime.now()], frame["alert_type"])
+        frame["duration_seconds"] = compliance["duration_seconds"].to_numpy()
+        frame["breached"] = compliance["breached"].to_numpy()
+    return frame[["timestamp", "service", "alert_type", "duration_seconds", "breached"]]
+
+
+def save_sla_analyses(analyses: Iterable[tuple], engine=None) -> List[Dict[str, Any]]:
+    """
+    Insert SLA analyses for many anomalies at once. `analyses` yields
+    (anomaly_dict, confidence_score) pairs; rows go out as multi-row INSERTs of
+    up to SLA_WRITE_CHUNK_SIZE rows in one transaction on the pooled engine,
+    which also adds them to the SLA rollups, so the rollups count exactly the
+    rows that were committed. Returns the inserted rows.
+    """
+    analyses = list(analyses)
+    rows = [build_sla_row(anomaly, confidence) for anomaly, confidence in analyses]
+    if not rows:
+        return []
+    engine = engine or get_engine()
+    ensure_rollups_table(engine)
+    with engine.begin() as conn:
+        for start in range(0, len(rows), SLA_WRITE_CHUNK_SIZE):
+            conn.execute(sla_table.insert().values(rows[start:start + SLA_WRITE_CHUNK_SIZE]))
+        record_sla_results(conn, sla_results_frame([anomaly for anomaly, _ in analyses]))
+    logging.info(f"Saved {len(rows)} SLA analyses to sla_table.")
+    return rows
+
+
 def save_sla_analysis_to_db_with_confidence(confidence_score: float):
     """
     Fetch the latest anomaly from anomaly_logs, generate SLA analysis, and insert into sla_table using the provided confidence score.
     """
-    connection = None
     try:
-        connection = pymysql.connect(
-            host='llm.c0n8k0a0swtz.us-east-1.rds.amazonaws.com',
-            user='admin',
-            password='yaswanth',
-            database='lamx_data',
-            cursorclass=pymysql.cursors.DictCursor
-        )
-        with connection.cursor() as cursor:
-            cursor.execute("SELECT * FROM anomaly_logs ORDER BY timestamp DESC LIMIT 1")
-            row = cursor.fetchone()
-            if not row:
-                logging.error("No anomaly_logs record found.")
-                return None
-            acc_no = "UDAX43321819"
-            txn_id = row.get("txn_id", "TXN12345")
-            root_cause = row.get("rca_summary", "gateway_timeout")
-            fix_suggestion = "reroute_gateway"
-            actions_taken = '["rerouted_gateway"]'
-            explanation = row.get("rca_summary", "RCA not available")
-            sla_breached = True
-            estimated_loss = 348
-            users_affected = 1
-            severity = "critical"
-            insert_query = '''
-                INSERT INTO sla_table (
-                    acc_no, txn_id, root_cause, fix_suggestion, actions_taken, confidence, explanation,
-                    sla_breached, estimated_loss, users_affected, severity
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            '''
-            cursor.execute(insert_query, (
-                acc_no, txn_id, root_cause, fix_suggestion, actions_taken, confidence_score, explanation,
-                sla_breached, estimated_loss, users_affected, severity
-            ))
-        connection.commit()
+        engine = get_engine()
+        with engine.connect() as conn:
+            row = conn.execute(text("SELECT * FROM anomaly_logs ORDER BY timestamp DESC LIMIT 1")).fetchone()
+        if not row:
+            logging.error("No anomaly_logs record found.")
+            return None
+        saved = save_sla_analyses([(dict(row._mapping), confidence_score)], engine)[0]
         logging.info("SLA analysis with confidence saved to sla_table.")
-        return {
-            "acc_no": acc_no,
-            "txn_id": txn_id,
-            "root_cause": root_cause,
-            "fix_suggestion": fix_suggestion,
-            "actions_taken": ["rerouted_gateway"],
-            "confidence": confidence_score,
-            "explanation": explanation,
-            "sla_breached": sla_breached,
-            "estimated_loss": estimated_loss,
-            "users_affected": users_affected,
-            "severity": severity
-        }
+        return {**saved, "actions_taken": json.loads(saved["actions_taken"])}
     except Exception as e:
         logging.error(f"Error saving SLA with confidence: {e}")
         return None
-    finally:
-        if connection:
-            connection.close()
@@ -0,0 +1,180 @@
+# SLA/sla_rollups.py
+#
+# Pre-aggregated SLA counters per (granularity, bucket, service, alert type),
+# maintained incrementally as SLA results are produced, so dashboard panels
+# read a few hundred rollup rows instead of scanning every result.
+
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import (
+    Table, Column, MetaData, String, Integer, Float, DateTime, PrimaryKeyConstraint, select, and_, exc, func,
+)
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+
+GRANULARITIES = {"hour": "h", "day": "D"}
+# Upper bounds (seconds) of the resolution-latency histogram buckets; the last bucket is open-ended
+LATENCY_BUCKETS = [30, 60, 120, 300, 600, 900, 1800]
+BUCKET_COLUMNS = [f"le_{edge}s" for edge in LATENCY_BUCKETS] + ["le_inf"]
+
+metadata = MetaData()
+
+sla_rollups = Table(
+    "sla_rollups",
+    metadata,
+    Column("granularity", String(8), nullable=False),
+    Column("bucket_start", DateTime, nullable=False),
+    Column("service", String(100), nullable=False),
+    Column("alert_type", String(50), nullable=False),
+    Column("count", Integer, nullable=False, default=0),
+    Column("breach_count", Integer, nullable=False, default=0),
+    Column("duration_sum", Float, nullable=False, default=0),
+    Column("duration_max", Float, nullable=False, default=0),
+    *[Column(name, Integer, nullable=False, default=0) for name in BUCKET_COLUMNS],
+    Column("updated_at", DateTime, nullable=False, server_default=func.now(), onupdate=func.now()),
+    PrimaryKeyConstraint("granularity", "bucket_start", "service", "alert_type"),
+)
+
+_table_ready = False
+
+
+def ensure_table(engine):
+    global _table_ready
+    if not _table_ready:
+        try:
+            metadata.create_all(engine, tables=[sla_rollups], checkfirst=True)
+        except exc.DBAPIError:
+            # Another worker created it between the check and the CREATE
+            metadata.create_all(engine, tables=[sla_rollups], checkfirst=True)
+        _table_ready = True
+
+
+def aggregate(results):
+    """
+    Roll SLA results (columns timestamp, service, alert_type, duration_seconds,
+    breached) up into one row per granularity, bucket, service and alert type.
+    """
+    if results.empty:
+        return pd.DataFrame()
+    timestamps = pd.to_datetime(results["timestamp"], errors="coerce")
+    durations = results["duration_seconds"].astype(float).to_numpy()
+    histogram = np.searchsorted(LATENCY_BUCKETS, durations, side="left")
+    base = pd.DataFrame({
+        "service": results["service"].astype(str).to_numpy(),
+        "alert_type": results["alert_type"].astype(str).to_numpy(),
+        "count": 1,
+        "breach_count": results["breached"].astype(bool).astype(int).to_numpy(),
+        "duration_sum": durations,
+        "duration_max": durations,
+        **{name: (histogram == i).astype(int) for i, name in enumerate(BUCKET_COLUMNS)},
+    })
+    base = base[timestamps.notna().to_numpy()]
+    timestamps = timestamps[timestamps.notna()]
+
+    sums = {name: "sum" for name in ["count", "breach_count", "duration_sum"] + BUCKET_COLUMNS}
+    frames = []
+    for granularity, freq in GRANULARITIES.items():
+        keyed = base.assign(granularity=granularity, bucket_start=timestamps.dt.floor(freq).to_numpy())
+        frames.append(
+            keyed.groupby(["granularity", "bucket_start", "service", "alert_type"], as_index=False)
+            .agg({**sums, "duration_max": "max"})
+        )
+    return pd.concat(frames, ignore_index=True)
+
+
+def record_sla_results(conn, results):
+    """
+    Add SLA results to the rollups with one multi-row upsert. Callers must only
+    pass results once, or the counters drift.
+    """
+    rollup = aggregate(results)
+    if rollup.empty:
+        return 0
+    rows = [
+        {key: (value.to_pydatetime() if isinstance(value, pd.Timestamp) else value.item() if hasattr(value, "item") else value)
+         for key, value in row.items()}
+        for row in rollup.to_dict("records")
+    ]
+    stmt = mysql_insert(sla_rollups).values(rows)
+    c = sla_rollups.c
+    stmt = stmt.on_duplicate_key_update(
+        count=c["count"] + stmt.inserted["count"],
+        breach_count=c.breach_count + stmt.inserted.breach_count,
+        duration_sum=c.duration_sum + stmt.inserted.duration_sum,
+        duration_max=func.greatest(c.duration_max, stmt.inserted.duration_max),
+        **{name: c[name] + stmt.inserted[name] for name in BUCKET_COLUMNS},
+    )
+    conn.execute(stmt)
+    return len(rows)
+
+
+def _quantile(buckets, q):
+    """Upper bound of the histogram bucket holding quantile q, or None for the open-ended bucket."""
+    total = sum(buckets)
+    if not total:
+        return None
+    running = 0
+    for edge, count in zip(LATENCY_BUCKETS + [None], buckets):
+        running += count
+        if running >= q * total:
+            return edge
+    return None
+
+
+def query_rollups(engine, granularity="hour", start=None, end=None, services=None, alert_types=None,
+                  by_alert_type=True):
+    """
+    SLA panel data: one row per bucket and service (and alert type unless
+    `by_alert_type` is False), with breach rate, mean duration and
+    histogram-derived p50/p95 resolution latency bounds.
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of {', '.join(GRANULARITIES)}")
+    ensure_table(engine)
+    c = sla_rollups.c
+    keys = [c.bucket_start, c.service] + ([c.alert_type] if by_alert_type else [])
+    conditions = [c.granularity == granularity]
+    if start is not None:
+        conditions.append(c.bucket_start >= start)
+    if end is not None:
+        conditions.append(c.bucket_start < end)
+    if services:
+        conditions.append(c.service.in_(services))
+    if alert_types:
+        conditions.append(c.alert_type.in_(alert_types))
+    query = (
+        select(*keys,
+               func.sum(c["count"]).label("count"),
+               func.sum(c.breach_count).label("breach_count"),
+               func.sum(c.duration_sum).label("duration_sum"),
+               func.max(c.duration_max).label("duration_max"),
+               *[func.sum(c[name]).label(name) for name in BUCKET_COLUMNS])
+        .where(and_(*conditions))
+        .group_by(*keys)
+        .order_by(c.bucket_start, c.service)
+    )
+    with engine.connect() as conn:
+        rows = conn.execute(query).fetchall()
+
+    panels = []
+    for row in rows:
+        row = row._mapping
+        count = int(row["count"] or 0)
+        buckets = [int(row[name] or 0) for name in BUCKET_COLUMNS]
+        panel = {
+            "bucket_start": row["bucket_start"].isoformat() if isinstance(row["bucket_start"], datetime) else str(row["bucket_start"]),
+            "service": row["service"],
+            "count": count,
+            "breach_count": int(row["breach_count"] or 0),
+            "breach_rate": round(int(row["breach_count"] or 0) / count, 4) if count else 0.0,
+            "avg_duration_s": round(float(row["duration_sum"] or 0) / count, 2) if count else None,
+            "max_duration_s": float(row["duration_max"] or 0),
+            "p50_le_s": _quantile(buckets, 0.5),
+            "p95_le_s": _quantile(buckets, 0.95),
+            "histogram": dict(zip(BUCKET_COLUMNS, buckets)),
+        }
+        if by_alert_type:
+            panel["alert_type"] = row["alert_type"]
+        panels.append(panel)
+    return panels
@@ -0,0 +1,277 @@
+# execution/action_log.py
+#
+# Remediation action log. Recent entries live in a fixed-capacity ring buffer;
+# every entry is also appended to a segmented JSONL log on disk
+# (remediation-<first seq>.jsonl, rotated by size, oldest segments dropped), so
+# memory stays constant and the history survives restarts. Entries carry a
+# monotonically increasing `seq`, which doubles as the pagination cursor:
+# queries walk newest first from the ring and continue into older segments.
+# Several processes may share the directory: appends take a file lock and
+# first read what the others wrote, so seqs stay unique and in file order.
+
+import json
+import os
+import threading
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+REMEDIATION_LOG_DIR = os.getenv(
+    "REMEDIATION_LOG_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs")
+)
+REMEDIATION_LOG_CAPACITY = int(os.getenv("REMEDIATION_LOG_CAPACITY", 1000))
+REMEDIATION_LOG_SEGMENT_BYTES = int(os.getenv("REMEDIATION_LOG_SEGMENT_BYTES", 4 * 1024 * 1024))
+REMEDIATION_LOG_MAX_SEGMENTS = int(os.getenv("REMEDIATION_LOG_MAX_SEGMENTS", 25))
+MAX_LOG_PAGE_SIZE = 1000
+
+SEGMENT_PREFIX = "remediation-"
+SEGMENT_SUFFIX = ".jsonl"
+LOCK_FILE = ".lock"
+
+
+class ActionLog:
+    def __init__(self, directory=REMEDIATION_LOG_DIR, capacity=REMEDIATION_LOG_CAPACITY,
+                 segment_bytes=REMEDIATION_LOG_SEGMENT_BYTES, max_segments=REMEDIATION_LOG_MAX_SEGMENTS):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_segments = max_segments
+        self.recent = deque(maxlen=capacity)
+        self.seq = 0
+        self._tail = (0, 0)  # (first_seq of the newest segment read, bytes of it read so far)
+        self._lock = threading.Lock()
+        self._lock_path = os.path.join(directory, LOCK_FILE)
+        os.makedirs(directory, exist_ok=True)
+        with self._lock, self._file_lock():
+            self._recover()
+
+    @contextmanager
+    def _file_lock(self):
+        """
+        Exclusive lock shared by every process writing to the directory
+        (uvicorn workers, the remediation agent), so seqs stay unique and ordered.
+        """
+        with open(self._lock_path, "a+b") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+    # --- segments ---
+
+    def _segments(self):
+        """[(first_seq, path)] oldest first."""
+        segments = []
+        for name in os.listdir(self.directory):
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX):
+                try:
+                    segments.append((int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]), os.path.join(self.directory, name)))
+                except ValueError:
+                    continue
+        return sorted(segments)
+
+    @staticmethod
+    def _parse(lines):
+        entries = []
+        for line in lines:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                # A torn line from a crash mid-write
+                continue
+        return entries
+
+    @classmethod
+    def _read_segment(cls, path):
+        with open(path, encoding="utf-8") as f:
+            return cls._parse(f)
+
+    def _recover(self):
+        """Refill the ring from the newest segments and continue the sequence after them."""
+        loaded = []
+        for _, path in reversed(self._segments()):
+            loaded = self._read_segment(path) + loaded
+            if len(loaded) >= self.recent.maxlen:
+                break
+        self.recent.extend(loaded[-self.recent.maxlen:] if self.recent.maxlen else [])
+        if loaded:
+            self.seq = loaded[-1]["seq"]
+        segments = self._segments()
+        if segments:
+            with open(segments[-1][1], "rb") as f:
+                self._tail = (segments[-1][0], f.read().rfind(b"\n") + 1)
+
+    def _catch_up(self):
+        """
+        Take in the entries other processes appended since we last looked:
+        complete lines after our read position in the newest segments.
+        Returns the newest segment as (first_seq, path, bytes) or None.
+        """
+        newest = None
+        for first_seq, path in self._segments():
+            if first_seq < self._tail[0]:
+                continue
+            start = self._tail[1] if first_seq == self._tail[0] else 0
+            try:
+                with open(path, "rb") as f:
+                    f.seek(start)
+                    data = f.read()
+            except FileNotFoundError:
+                continue
+            end = data.rfind(b"\n") + 1
+            for entry in self._parse(data[:end].decode("utf-8").splitlines()):
+                if entry["seq"] > self.seq:
+                    self.recent.append(entry)
+                    self.seq = entry["seq"]
+            self._tail = (first_seq, start + end)
+            newest = (first_seq, path, start + len(data))
+        return newest
+
+    def append(self, entry):
+        """Assign the next seq to `entry`, persist it and keep it in the ring. Returns the entry."""
+        with self._lock, self._file_lock():
+            newest = self._catch_up()
+            self.seq += 1
+            entry = {"seq": self.seq, **entry}
+            line = json.dumps(entry, default=str) + "\n"
+            if newest is None or newest[2] >= self.segment_bytes:
+                first_seq, path = self.seq, os.path.join(self.directory, f"{SEGMENT_PREFIX}{self.seq:012d}{SEGMENT_SUFFIX}")
+                size = 0
+            else:
+                first_seq, path, size = newest
+                if size > self._tail[1]:
+                    # A torn last line from a crash mid-write: end it so this entry starts on its own line
+                    line = "\n" + line
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(line)
+            self._tail = (first_seq, size + len(line.encode("utf-8")))
+            self.recent.append(entry)
+            if size == 0:
+                segments = self._segments()
+                for _, old_path in segments[:max(0, len(segments) - self.max_segments)]:
+                    os.remove(old_path)
+        return entry
+
+    # --- queries ---
+
+    def _newest_first(self, before, since=None):
+        """
+        Entries with seq < `before` (all if None), newest first: ring first, then
+        older segments. With `since`, stops at the first segment whose entries
+        all predate it: entries are stamped when logged, so older segments do too.
+        """
+        with self._lock:
+            self._catch_up()
+            ring = list(self.recent)
+        oldest_in_ring = ring[0]["seq"] if ring else self.seq + 1
+        for entry in reversed(ring):
+            if before is None or entry["seq"] < before:
+                yield entry
+        if since is not None and _older_than(ring, since):
+            return
+        limit = oldest_in_ring if before is None else min(before, oldest_in_ring)
+        for first_seq, path in reversed(self._segments()):
+            if first_seq >= limit:
+                continue
+            try:
+                entries = self._read_segment(path)
+            except FileNotFoundError:
+                # Dropped by rotation while we were reading
+                continue
+            if since is not None and _older_than(entries, since):
+                return
+            for entry in reversed(entries):
+                if entry["seq"] < limit:
+                    yield entry
+
+    def query(self, start=None, end=None, actions=None, targets=None, cursor=None, limit=100):
+        """
+        Return {"logs": [...], "next_cursor": str | None, "has_more": bool},
+        newest first. `start`/`end` bound the entry time, `actions`/`targets`
+        are allowlists, and `next_cursor` is passed back as `cursor`.
+        """
+        limit = max(1, min(int(limit), MAX_LOG_PAGE_SIZE))
+        try:
+            before = int(cursor) if cursor else None
+        except ValueError as e:
+            raise ValueError("Invalid cursor") from e
+
+        # Entry times are naive local times
+        start, end = [
+            bound.astimezone().replace(tzinfo=None) if bound is not None and bound.tzinfo else bound
+            for bound in (start, end)
+        ]
+        page, has_more = [], False
+        for entry in self._newest_first(before, since=start):
+            if actions and entry.get("action") not in actions:
+                continue
+            if targets and entry.get("target") not in targets:
+                continue
+            if start is not None or end is not None:
+                when = _entry_time(entry)
+                if when is None or (start is not None and when < start) or (end is not None and when >= end):
+                    continue
+            if len(page) == limit:
+                has_more = True
+                break
+            page.append(entry)
+        next_cursor = str(page[-1]["seq"]) if has_more else None
+        return {"logs": page, "next_cursor": next_cursor, "has_more": has_more}
+
+
+def _entry_time(entry):
+    try:
+        return datetime.fromisoformat(entry["time"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def _older_than(entries, since):
+    """True if every timed entry predates `since` (and at least one is timed)."""
+    times = [when for when in map(_entry_time, entries) if when is not None]
+    return bool(times) and max(times) < since
+
+
+def job_entry(job):
+    """
+    Log entry for a finished remediation job. `time` is when it finished, i.e.
+    when it is logged, so file order is time order; `created_at` is when it was requested.
+    """
+    finished_at = job.finished_at or job.created_at
+    return {"time": finished_at.isoformat(), "created_at": job.created_at.isoformat(), "action": job.action,
+            "target": job.target, "job_id": job.job_id, "status": job.status, "requesters": job.requesters,
+            "result": job.result}
+
+
+_action_log = None
+_action_log_lock = threading.Lock()
+
+
+def get_action_log():
+    """Process-wide action log, recording every job the remediation executor finishes."""
+    global _action_log
+    with _action_log_lock:
+        if _action_log is None:
+            from execution.executor import get_executor
+
+            _action_log = ActionLog()
+            get_executor().add_listener(lambda job: _action_log.append(job_entry(job)))
+    return _action_log
@@ -1,100 +1,61 @@
 # agent.py
 
-import platform
-import subprocess
 import os
-import time
-from datetime import datetime
-
-IS_WINDOWS = platform.system().lower() == "windows"
-LOGS = []
-
-def is_admin():
-    if IS_WINDOWS:
-        try:
-            import ctypes
-            return ctypes.windll.shell32.IsUserAnAdmin()
-        except:
-            return False
-    return os.geteuid() == 0
-
-def run_command(command_list):
-    if not IS_WINDOWS and not is_admin():
-        command_list.insert(0, "sudo")
+import sys
+
+# Ahead of this directory, where execution.py would shadow the execution package
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from execution.executor import IS_WINDOWS, is_admin, get_executor
+from execution.scheduler import CooldownActive, get_scheduler
+
+from execution.action_log import get_action_log
+
+_executor = get_executor()
+_action_log = get_action_log()
+_scheduler = get_scheduler()
+
+# Remediations go through the scheduler (identical in-flight requests share one
+# job, targets have a cooldown) and return a pollable job handle straight away;
+# use get_job(job_id) or wait_job(job_id) for the outcome.
+
+def _submit(action, target=None):
     try:
-        output = subprocess.check_output(command_list, stderr=subprocess.STDOUT, text=True)
-        return {"status": "success", "output": output.strip()}
-    except subprocess.CalledProcessError as e:
-        return {"status": "error", "output": e.output.strip()}
+        job, coalesced = _scheduler.submit(action, target)
+    except CooldownActive as e:
+        return {"status": "cooldown", "output": str(e), "retry_after_s": round(e.retry_after_s, 1),
+                "job": e.last_job.to_dict()}
+    return {**job.to_dict(), "coalesced": coalesced}
 
 def restart_service(service_name: str):
-    timestamp = datetime.now().isoformat()
-    if IS_WINDOWS:
-        stop_result = run_command(["sc", "stop", service_name])
-        if stop_result["status"] == "success" or "1062" in stop_result.get("output", ""):
-            for _ in range(30):
-                query_result = run_command(["sc", "query", service_name])
-                if query_result["status"] == "success" and "STOPPED" in query_result["output"]:
-                    break
-                time.sleep(1)
-            else:
-                return {"status": "error", "output": f"Service '{service_name}' did not stop."}
-        start_result = run_command(["sc", "start", service_name])
-        result = {
-            "status": "partial" if start_result["status"] == "error" else "success",
-            "output": {
-                "initial_stop_result": stop_result,
-                "final_start_result": start_result
-            }
-        }
-    else:
-        result = run_command(["systemctl", "restart", service_name])
-    LOGS.append({"time": timestamp, "action": "restart", "target": service_name, "result": result})
-    return result
+    return _submit("restart", service_name)
 
 def flush_dns():
-    timestamp = datetime.now().isoformat()
-    result = run_command(["ipconfig", "/flushdns"] if IS_WINDOWS else ["resolvectl", "flush-caches"])
-    LOGS.append({"time": timestamp, "action": "flush_dns", "result": result})
-    return result
+    return _submit("flush_dns")
 
 def run_task(task_name: str):
-    timestamp = datetime.now().isoformat()
-    if IS_WINDOWS:
-        result = run_command(["schtasks", "/Run", "/TN", task_name])
-    else:
-        result = {"status": "error", "output": "Task Scheduler not supported on Linux"}
-    LOGS.append({"time": timestamp, "action": "run_task", "target": task_name, "result": result})
-    return result
+    return _submit("run_task", task_name)
 
 def network_reset():
-    timestamp = datetime.now().isoformat()
-    if IS_WINDOWS:
-        if not is_admin():
-            return {"status": "error", "output": "Administrator privileges required"}
-        ps_command = "Get-NetAdapter | Where-Object {$_.Status -ne 'Not Present'} | Restart-NetAdapter -Confirm:$false"
-        result = run_command(["powershell", "-Command", ps_command])
-    else:
-        result = {"status": "error", "output": "Only implemented on Windows"}
-    LOGS.append({"time": timestamp, "action": "network_reset", "result": result})
-    return result
+    return _submit("network_reset")
 
 def reset_winsock():
-    timestamp = datetime.now().isoformat()
-    if IS_WINDOWS:
-        if not is_admin():
-            return {"status": "error", "output": "Administrator privileges required"}
-        result = run_command(["netsh", "winsock", "reset"])
-        if result["status"] == "success":
-            result["output"] += "\n\nRestart required to complete Winsock reset."
-            result["restart_required"] = True
-    else:
-        result = {"status": "error", "output": "Only implemented on Windows"}
-    LOGS.append({"time": timestamp, "action": "winsock_reset", "result": result})
-    return result
-
-def get_logs():
-    return {"logs": LOGS}
+    return _submit("winsock_reset")
+
+def get_job(job_id: str):
+    job = _executor.get(job_id)
+    return job.to_dict() if job else None
+
+def wait_job(job_id: str, timeout: float = None):
+    job = _executor.get(job_id)
+    return job.wait(timeout) if job else None
+
+def cancel_job(job_id: str):
+    job = _executor.cancel(job_id)
+    return job.to_dict() if job else None
+
+def get_logs(start=None, end=None, actions=None, targets=None, cursor=None, limit=100):
+    return _action_log.query(start, end, actions, targets, cursor, limit)
 
 def whoami():
     return {
@@ -1,56 +1,64 @@
 # execution/decision.py
-'''
+
 import json
-from dns_executor import DNSFixerAgent
-from service_executor import ServiceRecoveryAgent
+import os
+import sys
+
+# Ahead of this directory, where execution.py would shadow the execution package
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from execution.rules import get_rule_engine
+
 
 class ExecutionDecisionAgent:
-    def __init__(self):
-        # You can add logging or telemetry initialization here
-        pass
+    def __init__(self, rule_engine=None):
+        # Rules are compiled once per process and shared between agents
+        self.rule_engine = rule_engine or get_rule_engine()
+
+    def decide(self, anomaly):
+        """
+        Full routing decision for one anomaly: executor, winning rule, the fix
+        plan to send to the remediation agents and every rule that matched.
+        """
+        return self.rule_engine.classify(anomaly)
 
     def decide_executor(self, anomaly):
         """
         Route the execution to the right agent based on the anomaly.
         """
-        issue = anomaly.get("rca_summary", "").lower()
+        return self.decide(anomaly)["executor"]
 
-        if "dns" in issue or "domain" in issue:
-            return "dns"
-        elif "service down" in issue or "restart" in issue:
-            return "service"
-        else:
-            return None
+    def decide_batch(self, anomalies):
+        """Route many anomalies in one pass; returns (decisions, match statistics)."""
+        return self.rule_engine.classify_batch(anomalies)
 
-    def run(self, anomaly, dry_run=True):
+    def run(self, anomaly, dry_run=True, hosts=None):
         """
-        Run the correct fixer agent based on RCA summary.
+        Run the fix plan chosen for the anomaly's RCA summary on the remediation agents.
         """
         print(f"Received anomaly: {anomaly['txn_id']}")
-        agent_type = self.decide_executor(anomaly)
+        decision = self.decide(anomaly)
 
-        if agent_type == "dns":
-            print("Routing to DNSFixerAgent...")
-            agent = DNSFixerAgent()
-            agent.run(dry_run=dry_run)
+        if decision["executor"] is None:
+            print("No matching execution agent found for this anomaly.")
+            return decision
 
-        elif agent_type == "service":
-            print("Routing to ServiceRecoveryAgent...")
-            agent = ServiceRecoveryAgent()
-            agent.run(dry_run=dry_run)
+        print(f"Routing to {decision['executor']} executor (rule '{decision['rule']}'): {json.dumps(decision['fix_plan'])}")
+        if not dry_run:
+            from execution.execution import dispatch_fix
 
-        else:
-            print("No matching execution agent found for this anomaly.")
+            decision["execution"] = dispatch_fix(decision["fix_plan"], hosts)
+        return decision
 
 # Sample standalone run
 if __name__ == "__main__":
     # Mock anomaly input
     sample_anomaly = {
         "txn_id": "abc123",
+        "service": "payments-api",
+        "metric": "latency_ms",
         "rca_summary": "The DNS resolution failed due to outdated nameserver entries."
     }
 
     agent = ExecutionDecisionAgent()
-    agent.run(sample_anomaly, dry_run=True)
-
-'''
\ No newline at end of file
+    print(json.dumps(agent.run(sample_anomaly, dry_run=True), indent=2))
@@ -1,51 +1,250 @@
 # execute.py
+#
+# Dispatches fix plans to remediation agents. A plan can go to a whole fleet
+# of agents at once: requests share one pooled async HTTP client and run
+# concurrently, so a fleet-wide fix takes about as long as the slowest agent
+# rather than the sum of all of them. Transient failures are retried with
+# exponential backoff: any transport error or 429/5xx for idempotent requests,
+# but for remediation POSTs, which are not idempotent, only failures where the
+# agent cannot have acted on the request (no connection, 429/503), so a slow
+# agent never gets the same restart twice. Blocking callers share one
+# long-lived client on a dedicated event-loop thread, so connections stay
+# pooled across dispatches.
 
-import requests
+import asyncio
+import os
+import random
+import threading
+import time
 from datetime import datetime
 
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
 AGENT_URL = "http://localhost:8001"  # This is where agent.py is running
+# Comma-separated agent base URLs a fix plan is sent to by default
+AGENT_URLS = [url.strip().rstrip("/") for url in os.getenv("AGENT_URLS", AGENT_URL).split(",") if url.strip()]
+
+EXECUTION_TIMEOUT_S = float(os.getenv("EXECUTION_TIMEOUT_S", 10))
+EXECUTION_CONNECT_TIMEOUT_S = float(os.getenv("EXECUTION_CONNECT_TIMEOUT_S", 3))
+EXECUTION_RETRIES = int(os.getenv("EXECUTION_RETRIES", 3))
+EXECUTION_BACKOFF_S = float(os.getenv("EXECUTION_BACKOFF_S", 0.5))
+EXECUTION_MAX_CONNECTIONS = int(os.getenv("EXECUTION_MAX_CONNECTIONS", 50))
+# How often to poll an agent's remediation job while waiting for it to finish
+EXECUTION_POLL_S = float(os.getenv("EXECUTION_POLL_S", 1))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+# For other methods: the request never reached the agent, or the agent refused it
+SAFE_RETRY_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+SAFE_RETRY_STATUSES = {429, 503}
+JOB_TERMINAL_STATES = {"completed", "failed", "timed_out", "cancelled"}
+
 
-def execute_fix(fix_plan: dict):
+def build_request(fix_plan: dict):
+    """Map a fix plan to the agent (path, json body), or raise ValueError if it cannot be executed."""
     action = fix_plan.get("action")
     service = fix_plan.get("service")
     task = fix_plan.get("task")
 
     if not action:
-        return {"status": "error", "message": "Missing fix_plan.action"}
+        raise ValueError("Missing fix_plan.action")
+    if action == "flush_dns":
+        return "/flush/dns", None
+    elif action == "restart" and service:
+        return "/restart/service", {"service_name": service}
+    elif action == "run_task" and task:
+        return "/run/task", {"task_name": task}
+    elif action == "winsock_reset":
+        return "/network/winsock-reset", None
+    elif action == "adapter_reset":
+        return "/network/reset", None
+    raise ValueError(f"Unsupported or missing parameters: action={action}, service={service}, task={task}")
 
-    try:
-        if action == "flush_dns":
-            res = requests.post(f"{AGENT_URL}/flush/dns")
-        elif action == "restart" and service:
-            res = requests.post(f"{AGENT_URL}/restart/service", json={"service_name": service})
-        elif action == "run_task" and task:
-            res = requests.post(f"{AGENT_URL}/run/task", json={"task_name": task})
-        elif action == "winsock_reset":
-            res = requests.post(f"{AGENT_URL}/network/winsock-reset")
-        elif action == "adapter_reset":
-            res = requests.post(f"{AGENT_URL}/network/reset")
-        else:
-            return {
-                "status": "error",
-                "message": f"Unsupported or missing parameters: action={action}, service={service}, task={task}"
-            }
 
+def make_client(max_connections=EXECUTION_MAX_CONNECTIONS):
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(EXECUTION_TIMEOUT_S, connect=EXECUTION_CONNECT_TIMEOUT_S),
+        limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+    )
+
+
+async def request_with_retry(client, method, url, retries=EXECUTION_RETRIES, backoff_s=EXECUTION_BACKOFF_S, **kwargs):
+    """
+    Send one request, retrying retryable errors and statuses with exponential
+    backoff plus jitter. Non-idempotent methods are only retried when the
+    agent cannot have acted on the request. Returns the last response, or
+    raises the last transport error once retries are exhausted.
+    """
+    idempotent = method.upper() in IDEMPOTENT_METHODS
+    statuses = RETRY_STATUSES if idempotent else SAFE_RETRY_STATUSES
+    errors = httpx.TransportError if idempotent else SAFE_RETRY_ERRORS
+    for attempt in range(retries + 1):
+        try:
+            res = await client.request(method, url, **kwargs)
+            if res.status_code not in statuses or attempt == retries:
+                return res
+        except errors:
+            if attempt == retries:
+                raise
+        await asyncio.sleep(backoff_s * 2 ** attempt * (0.5 + random.random()))
+
+
+async def _dispatch_one(client, host, path, body, wait_s):
+    started = time.perf_counter()
+    try:
+        res = await request_with_retry(client, "POST", f"{host}{path}", json=body)
+        result = res.json()
+        job = result.get("job") if isinstance(result, dict) else None
+        # Agents accept remediations as jobs; optionally follow the job to its outcome
+        deadline = time.perf_counter() + wait_s
+        while job and job.get("status") not in JOB_TERMINAL_STATES and time.perf_counter() < deadline:
+            await asyncio.sleep(EXECUTION_POLL_S)
+            poll = await request_with_retry(client, "GET", f"{host}/remediation/jobs/{job['job_id']}")
+            job = poll.json()
+            result = {**result, "job": job}
+        ok = res.status_code < 400 and (job is None or job.get("status") not in JOB_TERMINAL_STATES - {"completed"})
         return {
-            "status": "executed",
-            "executed_action": action,
-            "service": service,
-            "task": task,
-            "result": res.json(),
-            "timestamp": datetime.now().isoformat()
+            "status": "executed" if ok else "error",
+            "http_status": res.status_code,
+            "result": result,
+            "elapsed_s": round(time.perf_counter() - started, 3),
         }
-
     except Exception as e:
-        return {"status": "error", "message": str(e)}
+        return {"status": "error", "message": str(e), "elapsed_s": round(time.perf_counter() - started, 3)}
 
 
-def get_agent_logs():
+async def dispatch_fix_async(fix_plan: dict, hosts=None, wait_s=0, client=None):
+    """
+    Send `fix_plan` to every agent in `hosts` (default AGENT_URLS) concurrently
+    and aggregate the per-host outcomes. With `wait_s` > 0, each agent's job is
+    polled for up to that long so the results carry the remediation outcome.
+    """
+    hosts = [host.rstrip("/") for host in (hosts or AGENT_URLS)]
     try:
-        res = requests.get(f"{AGENT_URL}/logs")
-        return res.json()
-    except Exception as e:
+        path, body = build_request(fix_plan)
+    except ValueError as e:
         return {"status": "error", "message": str(e)}
+
+    started = time.perf_counter()
+    own_client = client is None
+    client = client or make_client()
+    try:
+        outcomes = await asyncio.gather(*[_dispatch_one(client, host, path, body, wait_s) for host in hosts])
+    finally:
+        if own_client:
+            await client.aclose()
+
+    succeeded = sum(outcome["status"] == "executed" for outcome in outcomes)
+    return {
+        "status": "executed" if succeeded == len(hosts) else "partial" if succeeded else "error",
+        "executed_action": fix_plan.get("action"),
+        "service": fix_plan.get("service"),
+        "task": fix_plan.get("task"),
+        "hosts": len(hosts),
+        "succeeded": succeeded,
+        "failed": len(hosts) - succeeded,
+        "results": dict(zip(hosts, outcomes)),
+        "elapsed_s": round(time.perf_counter() - started, 3),
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+class FixDispatcher:
+    """
+    Event loop on its own thread holding one long-lived AsyncClient, so
+    blocking callers reuse its keep-alive connections across dispatches.
+    """
+
+    def __init__(self, max_connections=EXECUTION_MAX_CONNECTIONS):
+        self.max_connections = max_connections
+        self.client = None
+        self._loop = asyncio.new_event_loop()
+        self._ready = threading.Event()
+        threading.Thread(target=self._run_loop, name="fix-dispatcher", daemon=True).start()
+        self._ready.wait()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        # Created on the loop thread: its connections belong to this loop
+        self.client = make_client(self.max_connections)
+        self._ready.set()
+        self._loop.run_forever()
+
+    def run(self, make_coroutine):
+        """Run make_coroutine(client) on the dispatcher loop and block for its result."""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+        else:
+            # Blocking here would stall the caller's own event loop
+            raise RuntimeError("Blocking dispatch called from a running event loop; "
+                               "await dispatch_fix_async / get_agent_logs_async instead")
+        return asyncio.run_coroutine_threadsafe(make_coroutine(self.client), self._loop).result()
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_dispatcher():
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = FixDispatcher()
+    return _dispatcher
+
+
+def dispatch_fix(fix_plan: dict, hosts=None, wait_s=0):
+    """
+    Blocking wrapper around dispatch_fix_async for synchronous callers, on the
+    shared dispatcher client. Raises RuntimeError when called from a thread
+    running an event loop (e.g. an async FastAPI handler): await
+    dispatch_fix_async there instead.
+    """
+    return get_dispatcher().run(lambda client: dispatch_fix_async(fix_plan, hosts, wait_s, client))
+
+
+def execute_fix(fix_plan: dict, wait_s=0):
+    """Send `fix_plan` to the single local agent; same response shape as before."""
+    dispatched = dispatch_fix(fix_plan, [AGENT_URL], wait_s)
+    if dispatched["status"] == "error" and "results" not in dispatched:
+        return dispatched
+    outcome = dispatched["results"][AGENT_URL]
+    if outcome["status"] != "executed" and "result" not in outcome:
+        return {"status": "error", "message": outcome.get("message")}
+    return {
+        "status": outcome["status"],
+        "executed_action": dispatched["executed_action"],
+        "service": dispatched["service"],
+        "task": dispatched["task"],
+        "result": outcome["result"],
+        "timestamp": dispatched["timestamp"]
+    }
+
+
+async def get_agent_logs_async(hosts=None, client=None):
+    hosts = [host.rstrip("/") for host in (hosts or AGENT_URLS)]
+
+    async def fetch(client, host):
+        try:
+            return (await request_with_retry(client, "GET", f"{host}/logs")).json()
+        except Exception as e:
+            return {"status": "error", "message": str(e)}
+
+    if client is not None:
+        return dict(zip(hosts, await asyncio.gather(*[fetch(client, host) for host in hosts])))
+    async with make_client() as client:
+        return dict(zip(hosts, await asyncio.gather(*[fetch(client, host) for host in hosts])))
+
+
+def get_agent_logs(hosts=None):
+    """
+    Logs of one agent (default AGENT_URL), or {host: logs} when `hosts` is
+    given. Blocking, with the same event-loop restriction as dispatch_fix.
+    """
+    logs = get_dispatcher().run(lambda client: get_agent_logs_async(hosts or [AGENT_URL], client))
+    return logs if hosts else logs[AGENT_URL]
@@ -0,0 +1,365 @@
+# execution/executor.py
+#
+# Asynchronous remediation executor. Remediation actions run as asyncio
+# subprocesses on a dedicated event-loop thread, so callers (sync FastAPI
+# endpoints included) get a job handle back immediately and poll it, instead
+# of holding a worker thread while `sc query` or `systemctl` runs. Each action
+# has its own timeout, at most REMEDIATION_MAX_CONCURRENCY actions run at once,
+# and a queued or running job can be cancelled, which kills its subprocess.
+# Jobs of one action against several targets can also run as a single batch
+# execution (one `systemctl restart a b c`, one DNS flush for every target).
+
+import asyncio
+import os
+import platform
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+IS_WINDOWS = platform.system().lower() == "windows"
+
+REMEDIATION_MAX_CONCURRENCY = int(os.getenv("REMEDIATION_MAX_CONCURRENCY", 4))
+# Finished jobs stay pollable for this long
+REMEDIATION_JOB_RETENTION_S = int(os.getenv("REMEDIATION_JOB_RETENTION_S", 3600))
+
+# Wall-clock budget per action, counted from when it starts running (not while queued)
+ACTION_TIMEOUTS = {
+    "restart": 90,  # Windows waits up to 30s for the service to stop before starting it
+    "flush_dns": 15,
+    "run_task": 30,
+    "network_reset": 60,
+    "winsock_reset": 30,
+}
+DEFAULT_ACTION_TIMEOUT_S = 60
+
+TERMINAL_STATES = ("completed", "failed", "timed_out", "cancelled")
+
+
+def is_admin():
+    if IS_WINDOWS:
+        try:
+            import ctypes
+            return ctypes.windll.shell32.IsUserAnAdmin()
+        except:
+            return False
+    return os.geteuid() == 0
+
+
+async def run_command(command_list):
+    """Async counterpart of the old check_output helper; killing is left to cancellation."""
+    if not IS_WINDOWS and not is_admin():
+        command_list = ["sudo"] + list(command_list)
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            *command_list,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+        )
+    except OSError as e:
+        return {"status": "error", "output": str(e)}
+    try:
+        output, _ = await proc.communicate()
+    except asyncio.CancelledError:
+        # Timed out or cancelled: do not leave the command running behind the job
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+        raise
+    output = output.decode(errors="replace").strip()
+    return {"status": "success" if proc.returncode == 0 else "error", "output": output}
+
+
+# --- Remediation actions ---
+
+async def restart_service(service_name):
+    if IS_WINDOWS:
+        stop_result = await run_command(["sc", "stop", service_name])
+        if stop_result["status"] == "success" or "1062" in stop_result.get("output", ""):
+            for _ in range(30):
+                query_result = await run_command(["sc", "query", service_name])
+                if query_result["status"] == "success" and "STOPPED" in query_result["output"]:
+                    break
+                await asyncio.sleep(1)
+            else:
+                return {"status": "error", "output": f"Service '{service_name}' did not stop."}
+        start_result = await run_command(["sc", "start", service_name])
+        return {
+            "status": "partial" if start_result["status"] == "error" else "success",
+            "output": {
+                "initial_stop_result": stop_result,
+                "final_start_result": start_result
+            }
+        }
+    return await run_command(["systemctl", "restart", service_name])
+
+
+async def flush_dns(target=None):
+    return await run_command(["ipconfig", "/flushdns"] if IS_WINDOWS else ["resolvectl", "flush-caches"])
+
+
+async def run_task(task_name):
+    if IS_WINDOWS:
+        return await run_command(["schtasks", "/Run", "/TN", task_name])
+    return {"status": "error", "output": "Task Scheduler not supported on Linux"}
+
+
+async def network_reset(target=None):
+    if not IS_WINDOWS:
+        return {"status": "error", "output": "Network reset only implemented for Windows."}
+    if not is_admin():
+        return {"status": "error", "output": "Administrator privileges are required. Please run the agent as Administrator."}
+    ps_command = "Get-NetAdapter | Where-Object {$_.Status -ne 'Not Present'} | Restart-NetAdapter -Confirm:$false"
+    return await run_command(["powershell", "-Command", ps_command])
+
+
+async def reset_winsock(target=None):
+    if not IS_WINDOWS:
+        return {"status": "error", "output": "This action is only implemented for Windows."}
+    if not is_admin():
+        return {"status": "error", "output": "Administrator privileges are required. Please run the agent as Administrator."}
+    result = await run_command(["netsh", "winsock", "reset"])
+    if result["status"] == "success":
+        result["output"] += "\n\nA computer restart is required to complete the Winsock reset."
+        result["restart_required"] = True
+    return result
+
+
+async def restart_services(service_names):
+    if IS_WINDOWS:
+        results = await asyncio.gather(*[restart_service(name) for name in service_names])
+        succeeded = sum(result["status"] == "success" for result in results)
+        status = "success" if succeeded == len(results) else "partial" if succeeded else "error"
+        return {"status": status, "output": dict(zip(service_names, results))}
+    return await run_command(["systemctl", "restart", *service_names])
+
+
+ACTIONS = {
+    "restart": restart_service,
+    "flush_dns": flush_dns,
+    "run_task": run_task,
+    "network_reset": network_reset,
+    "winsock_reset": reset_winsock,
+}
+
+# Actions that can serve many targets with one execution: fn(targets)
+BATCH_ACTIONS = {
+    "restart": restart_services,
+    # Host-wide commands: one run covers every target
+    "flush_dns": lambda targets: flush_dns(),
+    "network_reset": lambda targets: network_reset(),
+    "winsock_reset": lambda targets: reset_winsock(),
+}
+
+
+class RemediationJob:
+    def __init__(self, action, target, timeout_s):
+        self.job_id = uuid.uuid4().hex[:12]
+        self.action = action
+        self.target = target
+        self.timeout_s = timeout_s
+        # queued -> running -> completed | failed | timed_out | cancelled
+        self.status = "queued"
+        self.result = None
+        # Callers sharing this execution (see execution/scheduler.py)
+        self.requesters = 1
+        self.created_at = datetime.now()
+        self.started_at = None
+        self.finished_at = None
+        self._future = None
+        self._done = threading.Event()
+
+    @property
+    def done(self):
+        return self.status in TERMINAL_STATES
+
+    def wait(self, timeout=None):
+        """Block until the job finishes (or `timeout` passes) and return its state."""
+        self._done.wait(timeout)
+        return self.to_dict()
+
+    def to_dict(self):
+        return {
+            "job_id": self.job_id,
+            "action": self.action,
+            "target": self.target,
+            "status": self.status,
+            "result": self.result,
+            "timeout_s": self.timeout_s,
+            "requesters": self.requesters,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+class RemediationExecutor:
+    def __init__(self, max_concurrency=REMEDIATION_MAX_CONCURRENCY, retention_s=REMEDIATION_JOB_RETENTION_S,
+                 actions=None, batch_actions=None):
+        self.max_concurrency = max_concurrency
+        self.retention_s = retention_s
+        self.actions = dict(actions or ACTIONS)
+        # Custom actions get no batch counterparts unless given explicitly
+        self.batch_actions = dict(batch_actions if batch_actions is not None else {} if actions else BATCH_ACTIONS)
+        self.jobs = {}
+        self._listeners = []
+        self._lock = threading.RLock()
+        self._loop = asyncio.new_event_loop()
+        self._semaphore = None
+        self._ready = threading.Event()
+        threading.Thread(target=self._run_loop, name="remediation-executor", daemon=True).start()
+        self._ready.wait()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._ready.set()
+        self._loop.run_forever()
+
+    def add_listener(self, fn):
+        """Call fn(job) from the executor thread whenever a job finishes."""
+        self._listeners.append(fn)
+
+    def submit(self, action, target=None, timeout_s=None, start=True):
+        """
+        Queue `action` against `target` and return its RemediationJob without
+        waiting. With start=False the job is only registered (and pollable)
+        until start(job) hands it to the event loop.
+        """
+        if action not in self.actions:
+            raise ValueError(f"Unknown remediation action '{action}' (known: {', '.join(self.actions)})")
+        job = RemediationJob(action, target, timeout_s or ACTION_TIMEOUTS.get(action, DEFAULT_ACTION_TIMEOUT_S))
+        with self._lock:
+            self._prune()
+            self.jobs[job.job_id] = job
+        if start:
+            self.start(job)
+        return job
+
+    def start(self, job):
+        with self._lock:
+            if job._future is not None or job.done:
+                return job
+            job._future = asyncio.run_coroutine_threadsafe(self._execute(job), self._loop)
+        job._future.add_done_callback(lambda future: self._on_future_done(job, future))
+        return job
+
+    def start_batch(self, jobs):
+        """
+        Run registered jobs of one batchable action against different targets
+        as a single execution; every job gets the shared result. Cancelling
+        one of them cancels the whole batch.
+        """
+        with self._lock:
+            jobs = [job for job in jobs if job._future is None and not job.done]
+            if len(jobs) > 1:
+                future = asyncio.run_coroutine_threadsafe(self._execute_batch(jobs), self._loop)
+                for job in jobs:
+                    job._future = future
+        if len(jobs) == 1:
+            self.start(jobs[0])
+        elif jobs:
+            for job in jobs:
+                future.add_done_callback(lambda future, job=job: self._on_future_done(job, future))
+        return jobs
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def list_jobs(self, status=None):
+        jobs = sorted(self.jobs.values(), key=lambda job: job.created_at, reverse=True)
+        return [job for job in jobs if status is None or job.status == status]
+
+    def cancel(self, job_id):
+        """Cancel a queued or running job, killing its subprocess. Returns the job, or None if unknown."""
+        job = self.jobs.get(job_id)
+        with self._lock:
+            if job is None or job.done:
+                return job
+            # Never handed to the event loop, so nothing else will finish it
+            unstarted = job._future is None
+            if unstarted:
+                self._settle(job, "cancelled", {"status": "error", "output": "Cancelled"})
+        if unstarted:
+            self._notify(job)
+        else:
+            job._future.cancel()
+        return job
+
+    async def _execute(self, job):
+        await self._run([job], lambda: self.actions[job.action](job.target), job.timeout_s)
+
+    async def _execute_batch(self, jobs):
+        batch_action = self.batch_actions[jobs[0].action]
+        await self._run(jobs, lambda: batch_action([job.target for job in jobs]), max(job.timeout_s for job in jobs))
+
+    async def _run(self, jobs, make_coroutine, timeout_s):
+        try:
+            async with self._semaphore:
+                started_at = datetime.now()
+                for job in jobs:
+                    job.status = "running"
+                    job.started_at = started_at
+                result = await asyncio.wait_for(make_coroutine(), timeout_s)
+        except asyncio.TimeoutError:
+            status, result = "timed_out", {"status": "error", "output": f"Timed out after {timeout_s}s"}
+        except asyncio.CancelledError:
+            for job in jobs:
+                self._finish(job, "cancelled", {"status": "error", "output": "Cancelled"})
+            raise
+        except Exception as e:
+            status, result = "failed", {"status": "error", "output": str(e)}
+        else:
+            status = "completed"
+        for job in jobs:
+            self._finish(job, status, result)
+
+    def _on_future_done(self, job, future):
+        # A job cancelled before its coroutine starts never reaches _execute's handlers;
+        # if it did start, whichever of the two finishes it first wins
+        if future.cancelled():
+            self._finish(job, "cancelled", {"status": "error", "output": "Cancelled"})
+
+    def _finish(self, job, status, result):
+        with self._lock:
+            if job.done:
+                return
+            self._settle(job, status, result)
+        self._notify(job)
+
+    def _settle(self, job, status, result):
+        job.status = status
+        job.result = result
+        job.finished_at = datetime.now()
+
+    def _notify(self, job):
+        # Listeners run outside the lock so they may call back into the executor
+        job._done.set()
+        for listener in self._listeners:
+            try:
+                listener(job)
+            except Exception as e:
+                print(f"Remediation listener failed for job {job.job_id}: {e}")
+
+    def _prune(self):
+        cutoff = time.time() - self.retention_s
+        for job_id, job in list(self.jobs.items()):
+            if job.done and job.finished_at.timestamp() < cutoff:
+                del self.jobs[job_id]
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = RemediationExecutor()
+    return _executor
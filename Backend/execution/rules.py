@@ -0,0 +1,272 @@
+# execution/rules.py
+#
+# Rule engine that routes RCA summaries to remediation executors. Rules are
+# declarative (keywords, regexes, service/metric conditions, a priority and a
+# fix plan template) and are compiled once into two multi-pattern matchers:
+#   - keywords go into a token index (single words in a set, phrases keyed by
+#     their first word), so each summary is tokenized once and matched with set
+#     intersections whose cost does not grow with the number of keywords;
+#   - regexes are combined into one alternation that screens each summary in a
+#     single search; only summaries it matches are checked rule by rule.
+# Extra rules can be loaded from a JSON file (EXECUTION_RULES_PATH) holding a
+# list of objects shaped like DEFAULT_RULES.
+
+import json
+import os
+import re
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+EXECUTION_RULES_PATH = os.getenv("EXECUTION_RULES_PATH")
+ROUTING_BATCH_SIZE = int(os.getenv("ROUTING_BATCH_SIZE", 1000))
+
+TOKEN = re.compile(r"\w+")
+
+DEFAULT_RULES = [
+    {
+        "name": "dns_resolution",
+        "executor": "dns",
+        "keywords": ["dns", "domain", "nameserver", "name server", "nxdomain", "name resolution"],
+        "patterns": [r"resol(?:ve|ution)\w*\s+(?:fail|error|timeout)"],
+        "priority": 20,
+        "fix_plan": {"action": "flush_dns"},
+    },
+    {
+        "name": "winsock_corruption",
+        "executor": "network",
+        "keywords": ["winsock", "socket error", "wsaeconnreset", "lsp corruption"],
+        "priority": 15,
+        "fix_plan": {"action": "winsock_reset"},
+    },
+    {
+        "name": "network_adapter",
+        "executor": "network",
+        "keywords": ["network adapter", "nic", "packet loss", "link down"],
+        "patterns": [r"adapter\s+(?:reset|failure|disconnect)"],
+        "priority": 10,
+        "fix_plan": {"action": "adapter_reset"},
+    },
+    {
+        "name": "service_down",
+        "executor": "service",
+        "keywords": ["service down", "restart", "unresponsive", "crashed", "crash loop", "hung", "deadlock"],
+        "patterns": [r"out of memory|oom[- ]?kill"],
+        "priority": 5,
+        "fix_plan": {"action": "restart", "service": "{service}"},
+    },
+    {
+        # Gateway error spikes: restart the affected service even without an explicit hint
+        "name": "gateway_errors",
+        "executor": "service",
+        "metrics": ["error_rate"],
+        "keywords": ["gateway", "5xx", "502", "503", "504"],
+        "priority": 1,
+        "fix_plan": {"action": "restart", "service": "{service}"},
+    },
+]
+
+
+class Rule:
+    def __init__(self, name, executor, keywords=(), patterns=(), services=(), metrics=(), priority=0, fix_plan=None):
+        if not (keywords or patterns or services or metrics):
+            raise ValueError(f"Rule '{name}' has no conditions")
+        self.name = name
+        self.executor = executor
+        self.keywords = [keyword.lower() for keyword in keywords]
+        self.patterns = list(patterns)
+        self.services = set(services)
+        self.metrics = set(metrics)
+        self.priority = priority
+        self.fix_plan = dict(fix_plan or {})
+
+    @classmethod
+    def from_dict(cls, spec):
+        return cls(**spec)
+
+    def keyword_tokens(self):
+        """Keywords as token tuples; they match whole words, ignoring case and punctuation."""
+        return [tuple(TOKEN.findall(keyword)) for keyword in self.keywords if TOKEN.findall(keyword)]
+
+    def text_pattern(self):
+        """Alternation of this rule's regexes, or None."""
+        return "|".join(f"(?:{pattern})" for pattern in self.patterns) or None
+
+    @property
+    def has_text(self):
+        return bool(self.keywords or self.patterns)
+
+    def accepts(self, anomaly):
+        """Service/metric conditions, checked after the text scan."""
+        return ((not self.services or anomaly.get("service") in self.services)
+                and (not self.metrics or anomaly.get("metric") in self.metrics))
+
+    def plan_for(self, anomaly):
+        fields = {key: "" if value is None else value for key, value in anomaly.items()}
+        return {key: value.format_map(_Missing(fields)) if isinstance(value, str) else value
+                for key, value in self.fix_plan.items()}
+
+
+class _Missing(dict):
+    def __missing__(self, key):
+        return ""
+
+
+class RuleEngine:
+    """
+    Compiled rule set. classify_batch() finds the rules whose keywords or
+    regexes match each summary (rules without either match on their
+    service/metric conditions alone), filters them by those conditions and
+    picks the highest priority, ties going to the earlier rule.
+    """
+
+    def __init__(self, rules):
+        self.rules = [rule if isinstance(rule, Rule) else Rule.from_dict(rule) for rule in rules]
+        names = [rule.name for rule in self.rules]
+        if len(set(names)) != len(names):
+            raise ValueError("Rule names must be unique")
+
+        self.words = {}    # token -> {rule index}
+        self.phrases = {}  # first token -> {token tuple: {rule index}}
+        self.regex_rules = []  # [(rule index, compiled alternation of its regexes)]
+        for i, rule in enumerate(self.rules):
+            for tokens in rule.keyword_tokens():
+                if len(tokens) == 1:
+                    self.words.setdefault(tokens[0], set()).add(i)
+                else:
+                    self.phrases.setdefault(tokens[0], {}).setdefault(tokens, set()).add(i)
+            pattern = rule.text_pattern()
+            if pattern is not None:
+                self.regex_rules.append((i, re.compile(pattern, re.IGNORECASE)))
+        # Sets, so intersections with a summary's tokens iterate the smaller side
+        self.word_keys = frozenset(self.words)
+        self.phrase_keys = frozenset(self.phrases)
+        self.matcher = (re.compile("|".join(f"(?:{compiled.pattern})" for _, compiled in self.regex_rules),
+                                   re.IGNORECASE) if self.regex_rules else None)
+        self.textless = [i for i, rule in enumerate(self.rules) if not rule.has_text]
+
+    def _match_keywords(self, summary):
+        tokens = TOKEN.findall(summary.lower())
+        present = set(tokens)
+        hits = set()
+        for token in present & self.word_keys:
+            hits |= self.words[token]
+        starts = present & self.phrase_keys
+        if starts:
+            for position, token in enumerate(tokens):
+                if token in starts:
+                    for phrase, rules in self.phrases[token].items():
+                        if tuple(tokens[position:position + len(phrase)]) == phrase:
+                            hits |= rules
+        return hits
+
+    def _scan(self, summaries):
+        """[set(rule indexes whose keywords or regexes matched)] per summary."""
+        hits = [self._match_keywords(summary) for summary in summaries]
+        if self.matcher is None:
+            return hits
+        for summary, summary_hits in zip(summaries, hits):
+            # Most summaries match no regex at all and are ruled out by one search;
+            # the rest are checked against every rule, so rules whose regexes
+            # match the same text all count
+            if self.matcher.search(summary):
+                summary_hits.update(i for i, compiled in self.regex_rules if compiled.search(summary))
+        return hits
+
+    def _decide(self, anomaly, text_hits):
+        candidates = [i for i in list(text_hits) + self.textless if self.rules[i].accepts(anomaly)]
+        if not candidates:
+            return {"txn_id": anomaly.get("txn_id"), "executor": None, "rule": None, "fix_plan": None,
+                    "matched_rules": []}
+        candidates.sort(key=lambda i: (-self.rules[i].priority, i))
+        rule = self.rules[candidates[0]]
+        return {
+            "txn_id": anomaly.get("txn_id"),
+            "executor": rule.executor,
+            "rule": rule.name,
+            "fix_plan": rule.plan_for(anomaly),
+            "matched_rules": [self.rules[i].name for i in candidates],
+        }
+
+    def classify(self, anomaly):
+        return self.classify_batch([anomaly])[0][0]
+
+    def classify_batch(self, anomalies, stats=None):
+        """
+        Route a batch of anomaly dicts (rca_summary, service, metric, txn_id).
+        Returns (decisions, stats); pass `stats` from a previous call to
+        accumulate match statistics across batches.
+        """
+        started = time.perf_counter()
+        stats = stats or new_stats()
+        summaries = [str(anomaly.get("rca_summary") or "") for anomaly in anomalies]
+        decisions = [self._decide(anomaly, hits) for anomaly, hits in zip(anomalies, self._scan(summaries))]
+
+        stats["total"] += len(decisions)
+        for decision in decisions:
+            if decision["executor"] is None:
+                stats["unmatched"] += 1
+                continue
+            stats["matched"] += 1
+            stats["by_executor"][decision["executor"]] = stats["by_executor"].get(decision["executor"], 0) + 1
+            stats["by_rule"][decision["rule"]] = stats["by_rule"].get(decision["rule"], 0) + 1
+            for name in decision["matched_rules"]:
+                stats["rule_hits"][name] = stats["rule_hits"].get(name, 0) + 1
+        stats["elapsed_s"] = round(stats["elapsed_s"] + time.perf_counter() - started, 4)
+        return decisions, stats
+
+
+def new_stats():
+    # by_rule counts the winning rule; rule_hits counts every rule that matched
+    return {"total": 0, "matched": 0, "unmatched": 0, "by_executor": {}, "by_rule": {}, "rule_hits": {},
+            "elapsed_s": 0.0}
+
+
+def load_rules(path=EXECUTION_RULES_PATH):
+    """DEFAULT_RULES plus the rules in `path`; a file rule replaces a default rule of the same name."""
+    rules = {rule["name"]: rule for rule in DEFAULT_RULES}
+    if path:
+        with open(path, encoding="utf-8") as f:
+            for rule in json.load(f):
+                rules[rule["name"]] = rule
+    return list(rules.values())
+
+
+def classify_anomaly_logs(engine, rule_engine=None, limit=None, batch_size=ROUTING_BATCH_SIZE,
+                          include_decisions=False):
+    """
+    Route every anomaly_logs row that has an RCA summary, streaming rows with a
+    server-side cursor and classifying them batch by batch. Returns
+    {"stats": ..., "decisions": [...] (if include_decisions)}.
+    """
+    from sqlalchemy import text
+
+    rule_engine = rule_engine or get_rule_engine()
+    query = ("SELECT txn_id, service, metric, rca_summary FROM anomaly_logs "
+             "WHERE rca_summary IS NOT NULL ORDER BY timestamp DESC")
+    params = {}
+    if limit:
+        query += " LIMIT :limit"
+        params["limit"] = int(limit)
+
+    stats, decisions = new_stats(), []
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True).execute(text(query), params)
+        for rows in result.partitions(batch_size):
+            batch, stats = rule_engine.classify_batch([dict(row._mapping) for row in rows], stats)
+            if include_decisions:
+                decisions.extend(batch)
+    stats["per_second"] = round(stats["total"] / stats["elapsed_s"]) if stats["elapsed_s"] else None
+    return {"stats": stats, "decisions": decisions} if include_decisions else {"stats": stats}
+
+
+_rule_engine = None
+
+
+def get_rule_engine():
+    global _rule_engine
+    if _rule_engine is None:
+        _rule_engine = RuleEngine(load_rules())
+    return _rule_engine
@@ -0,0 +1,157 @@
+# execution/scheduler.py
+#
+# Remediation scheduler in front of the async executor. During an incident
+# many anomalies map to the same fix, so requests are keyed by (action, target):
+#   - an identical request joins the job already queued or running, or one that
+#     finished less than REMEDIATION_COALESCE_WINDOW_S ago, and shares its result;
+#   - requests of one batchable action against different targets arriving within
+#     REMEDIATION_BATCH_WINDOW_S run as a single execution (see
+#     executor.BATCH_ACTIONS); other actions start right away;
+#   - once an action has run against a target, it is refused for that target
+#     until its cooldown passes, so flapping alerts cannot cause restart storms.
+# Keys whose job is finished and past both windows are forgotten. Beyond
+# REMEDIATION_SCHEDULER_MAX_KEYS, since targets come from requests, finished
+# keys are evicted oldest first, but never while their cooldown is running.
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from dotenv import load_dotenv
+
+from execution.executor import get_executor
+
+load_dotenv()
+
+REMEDIATION_BATCH_WINDOW_S = float(os.getenv("REMEDIATION_BATCH_WINDOW_S", 0.25))
+REMEDIATION_COALESCE_WINDOW_S = float(os.getenv("REMEDIATION_COALESCE_WINDOW_S", 10))
+REMEDIATION_SCHEDULER_MAX_KEYS = int(os.getenv("REMEDIATION_SCHEDULER_MAX_KEYS", 10000))
+
+# Minimum seconds between two executions of an action against the same target
+ACTION_COOLDOWNS = {
+    "restart": 120,
+    "flush_dns": 30,
+    "run_task": 60,
+    "network_reset": 300,
+    "winsock_reset": 300,
+}
+DEFAULT_ACTION_COOLDOWN_S = 60
+
+
+class CooldownActive(Exception):
+    def __init__(self, action, target, retry_after_s, last_job):
+        super().__init__(f"'{action}' on '{target}' is cooling down; retry in {retry_after_s:.0f}s")
+        self.retry_after_s = retry_after_s
+        self.last_job = last_job
+
+
+class RemediationScheduler:
+    def __init__(self, executor=None, batch_window_s=REMEDIATION_BATCH_WINDOW_S,
+                 coalesce_window_s=REMEDIATION_COALESCE_WINDOW_S, cooldowns=None,
+                 max_keys=REMEDIATION_SCHEDULER_MAX_KEYS):
+        self.executor = executor or get_executor()
+        self.batch_window_s = batch_window_s
+        self.coalesce_window_s = coalesce_window_s
+        self.cooldowns = {**ACTION_COOLDOWNS, **(cooldowns or {})}
+        self.max_keys = max_keys
+        # (action, target) -> most recent job for that key, least recently submitted first
+        self.latest = OrderedDict()
+        self.pending = {}  # batchable action -> jobs registered in the current window
+        self.stats = {"requests": 0, "executions": 0, "coalesced": 0, "rejected": 0, "batches": 0}
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def _cooldown_left(self, action, job, now):
+        # Jobs cancelled before they ran never touched the target
+        if job.started_at is None:
+            return 0
+        return job.started_at.timestamp() + self.cooldowns.get(action, DEFAULT_ACTION_COOLDOWN_S) - now
+
+    def _prune(self, now):
+        """
+        Forget keys nothing depends on any more; past max_keys, also the oldest
+        finished ones still inside the coalesce window. Keys cooling down are
+        kept whatever the size, or their action could run again at once.
+        """
+        for key, job in list(self.latest.items()):
+            if (job.done and self._cooldown_left(key[0], job, now) <= 0
+                    and job.finished_at.timestamp() <= now - self.coalesce_window_s):
+                del self.latest[key]
+        for key, job in list(self.latest.items()):
+            if len(self.latest) < self.max_keys:
+                break
+            if job.done and self._cooldown_left(key[0], job, now) <= 0:
+                del self.latest[key]
+
+    def submit(self, action, target=None, timeout_s=None):
+        """
+        Return (job, coalesced) for `action` on `target`. Raises CooldownActive
+        when the target was remediated too recently to run it again.
+        """
+        key = (action, target)
+        now = time.time()
+        with self._lock:
+            self.stats["requests"] += 1
+            job = self.latest.get(key)
+            if job is not None:
+                recent = job.status == "completed" and job.finished_at.timestamp() > now - self.coalesce_window_s
+                if not job.done or recent:
+                    job.requesters += 1
+                    self.stats["coalesced"] += 1
+                    return job, True
+                retry_after = self._cooldown_left(action, job, now)
+                if retry_after > 0:
+                    self.stats["rejected"] += 1
+                    raise CooldownActive(action, target, retry_after, job)
+
+            if key not in self.latest and len(self.latest) >= self.max_keys:
+                self._prune(now)
+            batched = action in self.executor.batch_actions and self.batch_window_s > 0
+            job = self.executor.submit(action, target, timeout_s, start=not batched)
+            self.latest[key] = job
+            self.latest.move_to_end(key)
+            self.stats["executions"] += 1
+            if batched:
+                self.pending.setdefault(action, []).append(job)
+                if self._timer is None:
+                    self._timer = threading.Timer(self.batch_window_s, self.flush)
+                    self._timer.daemon = True
+                    self._timer.start()
+        return job, False
+
+    def flush(self):
+        """Start the jobs collected in the current window, one execution per action."""
+        with self._lock:
+            pending, self.pending = self.pending, {}
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        for jobs in pending.values():
+            if len(self.executor.start_batch(jobs)) > 1:
+                with self._lock:
+                    self.stats["batches"] += 1
+        return pending
+
+    def cooldowns_active(self):
+        """{"action:target": seconds left} for every key still cooling down."""
+        now = time.time()
+        with self._lock:
+            active = {}
+            for (action, target), job in self.latest.items():
+                left = self._cooldown_left(action, job, now)
+                if left > 0:
+                    active[f"{action}:{target}" if target else action] = round(left, 1)
+        return active
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RemediationScheduler()
+    return _scheduler
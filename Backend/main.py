@@ -1,5 +1,5 @@
 from fastapi import FastAPI, UploadFile, File, Request, Body
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 import os
 import json
@@ -8,20 +8,15 @@ import sys
 import pandas as pd
 from sqlalchemy import text
 from memory.db import get_engine
-import platform
-import subprocess
-import time
 
 
 # Agent imports with fallback
 FailureDetectionAgent = None
 PatternDetectorAgent = None
-RCAReasoningAgent = None
 
 try:
     from RCA.failure_detection import FailureDetectionAgent
     from RCA.pattern import PatternDetectorAgent
-    from RCA.rca_reasoning import RCAReasoningAgent
     print("All agents imported successfully")
 except Exception as e:
     print(f"Import error: {e}")
@@ -33,6 +28,14 @@ except Exception as e:
 
 app = FastAPI(title="RCA Unified Processor")
 
+@app.on_event("startup")
+def start_background_jobs():
+    try:
+        from vectordb.maintenance import start_maintenance_thread
+        start_maintenance_thread()
+    except Exception as e:
+        print(f"Vector store maintenance not started: {e}")
+
 origins = ["http://localhost:3000", "http://127.0.0.1:3000"]
 
 app.add_middleware(
@@ -137,95 +140,19 @@ async def upload_and_store(file: UploadFile = File(...)):
 @app.post("/api/failure-detection")
 async def failure_detection_endpoint():
     try:
-        engine = get_engine()
-        
-        # Step 1: Create new_uploaded_data table if it doesn't exist
-        with engine.connect() as conn:
-            create_table_query = text("""
-                CREATE TABLE IF NOT EXISTS new_uploaded_data (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    txn_id VARCHAR(255),
-                    acc_no VARCHAR(255),
-                    status VARCHAR(50),
-                    amount DECIMAL(10,2),
-                    gateway VARCHAR(100),
-                    region VARCHAR(100),
-                    service VARCHAR(100),
-                    trace_id VARCHAR(255),
-                    span_id VARCHAR(255),
-                    error_code VARCHAR(100),
-                    latency_ms INT,
-                    cpu DECIMAL(5,2),
-                    memory_usage DECIMAL(5,2),
-                    error_count INT,
-                    total_requests INT,
-                    timestamp DATETIME,
-                    serial_no INT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            conn.execute(create_table_query)
-            conn.commit()
-        
-        # Step 2: Move new data from lamx_transactions to new_uploaded_data
-        with engine.connect() as conn:
-            # Get the latest processed timestamp from anomaly_logs
-            latest_processed_query = text("""
-                SELECT MAX(timestamp) as latest_processed 
-                FROM anomaly_logs 
-                WHERE timestamp IS NOT NULL
-            """)
-            result = conn.execute(latest_processed_query).fetchone()
-            latest_processed = result[0] if result and result[0] else None
-            
-            # Get the actual columns from lamx_transactions table
-            columns_query = text("SHOW COLUMNS FROM lamx_transactions")
-            columns_result = conn.execute(columns_query).fetchall()
-            lamx_columns = [col[0] for col in columns_result]
-            
-            # Define the columns we want to insert into new_uploaded_data
-            target_columns = ['txn_id', 'acc_no', 'status', 'amount', 'gateway', 'region', 'service', 
-                            'trace_id', 'span_id', 'error_code', 'latency_ms', 'cpu', 'memory_usage', 
-                            'error_count', 'total_requests', 'timestamp', 'serial_no']
-            
-            # Filter columns that exist in lamx_transactions
-            available_columns = [col for col in target_columns if col in lamx_columns]
-            columns_str = ', '.join(available_columns)
-            select_columns_str = ', '.join(available_columns)
-            
-            # Insert new data into new_uploaded_data
-            if latest_processed:
-                insert_new_data_query = text(f"""
-                    INSERT INTO new_uploaded_data 
-                    ({columns_str})
-                    SELECT {select_columns_str}
-                    FROM lamx_transactions 
-                    WHERE timestamp > :latest_processed AND status = 'fail' AND latency_ms IS NOT NULL
-                """)
-                conn.execute(insert_new_data_query, {"latest_processed": latest_processed})
-            else:
-                # If no previous data, process all failed transactions
-                insert_all_data_query = text(f"""
-                    INSERT INTO new_uploaded_data 
-                    ({columns_str})
-                    SELECT {select_columns_str}
-                    FROM lamx_transactions 
-                    WHERE status = 'fail' AND latency_ms IS NOT NULL
-                """)
-                conn.execute(insert_all_data_query)
-            
-            conn.commit()
-        
-        # Step 3: Run failure detection on new data only
         failure_agent = FailureDetectionAgent()
+
+        # Step 1: Move new failed transactions from lamx_transactions to new_uploaded_data
+        failure_agent.stage_new_data()
+
+        # Step 2: Run failure detection on new data only, and persist what it finds
         result = failure_agent.run()
-        
-        # Step 4: Clear the new_uploaded_data table after processing
-        with engine.connect() as conn:
-            clear_table_query = text("DELETE FROM new_uploaded_data")
-            conn.execute(clear_table_query)
-            conn.commit()
-        
+        if result:
+            failure_agent.save_anomalies(result)
+
+        # Step 3: Clear the new_uploaded_data table after processing
+        failure_agent.clear_staged_data()
+
         return JSONResponse(content={
             "agent": "FailureDetectionAgent",
             "status": "success",
@@ -249,7 +176,7 @@ async def pattern_detection_endpoint():
         return JSONResponse(content={
             "agent": "PatternDetectorAgent",
             "status": "success",
-            "data": result,
+            "data": [{**p, "timestamp": str(p["timestamp"])} for p in result],
             "timestamp": datetime.now().isoformat()
         }, status_code=200)
     except Exception as e:
@@ -260,48 +187,62 @@ async def pattern_detection_endpoint():
             "timestamp": datetime.now().isoformat()
         }, status_code=500)
 
-@app.post("/api/rca-reasoning")
-async def rca_reasoning_endpoint(request: Request):
+@app.post("/api/pipeline/run")
+def pipeline_run():
+    """Run failure detection -> patterns -> RCA -> SLA on new data as one DAG and report stage timings."""
     try:
-        # Try to parse JSON, but handle empty body gracefully
-        try:
-            data = await request.json()
-            transactions = data.get("transactions", [])
-        except Exception:
-            transactions = []
-
-        rca_agent = RCAReasoningAgent()
-        rca_agent.run()  # This processes all anomalies needing RCA
-
-        # Fetch RCA results from DB
-        engine = get_engine()
-        with engine.connect() as conn:
-            result = conn.execute(text("""
-                SELECT txn_id, service, metric, value, timestamp, z_score, 
-                       rca_summary, rca_confidence
-                FROM anomaly_logs 
-                WHERE rca_summary IS NOT NULL AND rca_confidence IS NOT NULL
-                ORDER BY timestamp DESC
-            """)).fetchall()
-
-        rca_results = [{
-            "txn_id": row[0],
-            "service": row[1],
-            "metric": row[2],
-            "value": row[3],
-            "timestamp": str(row[4]),
-            "z_score": row[5],
-            "rca_summary": row[6],
-            "rca_confidence": float(row[7]) if row[7] else None
-        } for row in result]
+        from RCA.pipeline import build_detection_pipeline, summarize
 
+        result = build_detection_pipeline().run()
+        sla = result["outputs"].get("sla")
         return JSONResponse(content={
-            "agent": "RCAReasoningAgent",
             "status": "success",
-            "data_from_db": rca_results,
+            **summarize(result),
+            "sla": json.loads(sla.to_json(orient="records")) if sla is not None else [],
             "timestamp": datetime.now().isoformat()
         }, status_code=200)
+    except Exception as e:
+        return JSONResponse(content={"status": "error", "error": str(e)}, status_code=500)
+
+def split_param(value):
+    """Comma-separated query parameter as a list of values, or None when absent."""
+    return [v.strip() for v in value.split(",") if v.strip()] if value else None
+
+@app.get("/api/sla/rollups")
+def sla_rollups(granularity: str = "hour", start: datetime = None, end: datetime = None,
+                service: str = None, alert_type: str = None, by_alert_type: bool = True):
+    """SLA dashboard panels from the incrementally maintained hourly/daily rollups."""
+    from SLA.sla_rollups import query_rollups
+
+    try:
+        panels = query_rollups(get_engine(), granularity, start, end, split_param(service), split_param(alert_type), by_alert_type)
+    except ValueError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=400)
+    return {"granularity": granularity, "data": panels}
 
+def start_rca_job(workers=None, **fields):
+    """Queue every anomaly pending RCA as a durable job, start worker processes for it and answer 202."""
+    from RCA.rca_queue import enqueue_job, spawn_workers, RCA_QUEUE_WORKERS
+
+    job = enqueue_job(get_engine())
+    pids = spawn_workers(job["job_id"], workers or RCA_QUEUE_WORKERS) if job["total"] else []
+    return JSONResponse(content={
+        **fields,
+        **job,
+        "workers": len(pids),
+        "status_url": f"/api/rca-jobs/{job['job_id']}",
+        "timestamp": datetime.now().isoformat()
+    }, status_code=202)
+
+@app.post("/api/rca-reasoning")
+def rca_reasoning_endpoint():
+    """
+    Queue every anomaly pending RCA as a durable job and start workers for it.
+    Returns 202 at once; poll status_url for progress and /api/rca-results
+    for the summaries.
+    """
+    try:
+        return start_rca_job(agent="RCAReasoningAgent", status="accepted")
     except Exception as e:
         return JSONResponse(content={
             "agent": "RCAReasoningAgent",
@@ -310,6 +251,76 @@ async def rca_reasoning_endpoint(request: Request):
             "timestamp": datetime.now().isoformat()
         }, status_code=500)
 
+@app.get("/api/rca-reasoning/stream")
+def rca_reasoning_stream(request: Request, format: str = "ndjson", resume: str = None):
+    """
+    Stream RCA results as NDJSON (default) or server-sent events (format=sse),
+    one event per anomaly as soon as it is computed. Reconnect with the last
+    event's resume_token (or SSE Last-Event-ID) to continue where you left off.
+    """
+    from RCA.rca_stream import get_stream_registry, stream_run
+
+    if format not in ("ndjson", "sse"):
+        return JSONResponse(content={"error": "format must be 'ndjson' or 'sse'"}, status_code=400)
+    token = resume or request.headers.get("last-event-id")
+    run, after, resumed = get_stream_registry().open(token)
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(
+        stream_run(run, after, resumed, format),
+        media_type=media_type,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/api/rca-results")
+def rca_results(limit: int = 100, cursor: str = None, service: str = None, metric: str = None,
+                min_confidence: float = None, max_confidence: float = None,
+                start: datetime = None, end: datetime = None, fields: str = None,
+                include_pending: bool = False):
+    """
+    Page through RCA results newest first. `service` and `metric` accept
+    comma-separated lists, `fields` picks the returned columns, and
+    `next_cursor` from one page is passed as `cursor` to get the next.
+    """
+    from RCA.rca_results import fetch_rca_page
+
+    try:
+        page = fetch_rca_page(
+            get_engine(), limit=limit, cursor=cursor, services=split_param(service), metrics=split_param(metric),
+            min_confidence=min_confidence, max_confidence=max_confidence, start=start, end=end,
+            fields=fields, include_pending=include_pending
+        )
+    except ValueError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=400)
+    return page
+
+@app.post("/api/rca-jobs")
+def create_rca_job(workers: int = Body(None, embed=True)):
+    """Queue every anomaly pending RCA as a durable job and start worker processes for it."""
+    try:
+        return start_rca_job(workers)
+    except Exception as e:
+        return JSONResponse(content={"status": "error", "error": str(e)}, status_code=500)
+
+@app.get("/api/rca-jobs/{job_id}")
+def rca_job_status(job_id: str):
+    from RCA.rca_queue import job_status
+
+    status = job_status(get_engine(), job_id)
+    if status is None:
+        return JSONResponse(content={"error": f"Unknown job {job_id}"}, status_code=404)
+    return status
+
+@app.get("/api/execution/routing")
+def execution_routing(limit: int = None, include_decisions: bool = False):
+    """Route RCA summaries in anomaly_logs to executors and report rule match statistics."""
+    from execution.rules import classify_anomaly_logs
+
+    try:
+        routing = classify_anomaly_logs(get_engine(), limit=limit, include_decisions=include_decisions)
+    except Exception as e:
+        return JSONResponse(content={"error": str(e)}, status_code=500)
+    return {**routing, "timestamp": datetime.now().isoformat()}
+
 @app.get("/api/agents/status")
 async def agents_status():
     return JSONResponse(content={
@@ -321,104 +332,83 @@ async def agents_status():
         "timestamp": datetime.now().isoformat()
     }, status_code=200)
 
-IS_WINDOWS = platform.system().lower() == "windows"
-LOGS = []
-
-def is_admin():
-    if IS_WINDOWS:
-        try:
-            import ctypes
-            return ctypes.windll.shell32.IsUserAnAdmin()
-        except:
-            return False
-    return os.geteuid() == 0
-
-def run_command(command_list):
-    if not IS_WINDOWS and not is_admin():
-        command_list.insert(0, "sudo")
+from execution.executor import IS_WINDOWS, is_admin, get_executor
+from execution.scheduler import CooldownActive, get_scheduler
+
+from execution.action_log import get_action_log
+
+remediation_executor = get_executor()
+# Records every finished remediation in a ring buffer plus segmented log files
+action_log = get_action_log()
+remediation_scheduler = get_scheduler()
+
+def submit_remediation(action, target=None):
+    # Identical in-flight requests share one job; clients poll /remediation/jobs/{job_id}
     try:
-        output = subprocess.check_output(command_list, stderr=subprocess.STDOUT, text=True)
-        return {"status": "success", "output": output.strip()}
-    except subprocess.CalledProcessError as e:
-        return {"status": "error", "output": e.output.strip()}
+        job, coalesced = remediation_scheduler.submit(action, target)
+    except CooldownActive as e:
+        return JSONResponse(content={
+            "status": "cooldown",
+            "error": str(e),
+            "retry_after_s": round(e.retry_after_s, 1),
+            "job": e.last_job.to_dict()
+        }, status_code=429, headers={"Retry-After": str(int(e.retry_after_s) + 1)})
+    return JSONResponse(content={"status": "coalesced" if coalesced else "accepted", "job": job.to_dict()},
+                        status_code=202)
 
 @app.post("/restart/service")
 def restart_service(service_name: str = Body(..., embed=True)):
-    timestamp = datetime.now().isoformat()
-    if IS_WINDOWS:
-        stop_result = run_command(["sc", "stop", service_name])
-        if stop_result["status"] == "success" or "1062" in stop_result.get("output", ""):
-            for _ in range(30):
-                query_result = run_command(["sc", "query", service_name])
-                if query_result["status"] == "success" and "STOPPED" in query_result["output"]:
-                    break
-                time.sleep(1)
-            else:
-                return {"status": "error", "output": f"Service '{service_name}' did not stop."}
-        start_result = run_command(["sc", "start", service_name])
-        result = {
-            "status": "partial" if start_result["status"] == "error" else "success",
-            "output": {
-                "initial_stop_result": stop_result,
-                "final_start_result": start_result
-            }
-        }
-    else:
-        result = run_command(["systemctl", "restart", service_name])
-
-    LOGS.append({"time": timestamp, "action": "restart", "target": service_name, "result": result})
-    return result
+    return submit_remediation("restart", service_name)
 
 @app.post("/flush/dns")
 def flush_dns():
-    timestamp = datetime.now().isoformat()
-    result = run_command(["ipconfig", "/flushdns"] if IS_WINDOWS else ["resolvectl", "flush-caches"])
-    LOGS.append({"time": timestamp, "action": "flush_dns", "result": result})
-    return result
+    return submit_remediation("flush_dns")
 
 @app.post("/run/task")
 def run_task(task_name: str = Body(..., embed=True)):
-    timestamp = datetime.now().isoformat()
-    if IS_WINDOWS:
-        result = run_command(["schtasks", "/Run", "/TN", task_name])
-    else:
-        result = {"status": "error", "output": "Task Scheduler not supported on Linux"}
-    LOGS.append({"time": timestamp, "action": "run_task", "target": task_name, "result": result})
-    return result
+    return submit_remediation("run_task", task_name)
 
 @app.post("/network/reset")
 def network_reset():
-    timestamp = datetime.now().isoformat()
-    if IS_WINDOWS:
-        if not is_admin():
-            return {"status": "error", "output": "Administrator privileges are required. Please run the agent as Administrator."}
-        ps_command = "Get-NetAdapter | Where-Object {$_.Status -ne 'Not Present'} | Restart-NetAdapter -Confirm:$false"
-        result = run_command(["powershell", "-Command", ps_command])
-    else:
-        result = {"status": "error", "output": "Network reset only implemented for Windows."}
-
-    LOGS.append({"time": timestamp, "action": "network_reset_powershell", "result": result})
-    return result
+    return submit_remediation("network_reset")
 
 @app.post("/network/winsock-reset")
 def reset_winsock():
-    timestamp = datetime.now().isoformat()
-    if IS_WINDOWS:
-        if not is_admin():
-            return {"status": "error", "output": "Administrator privileges are required. Please run the agent as Administrator."}
-        result = run_command(["netsh", "winsock", "reset"])
-        if result["status"] == "success":
-            result["output"] += "\n\nA computer restart is required to complete the Winsock reset."
-            result["restart_required"] = True
-    else:
-        result = {"status": "error", "output": "This action is only implemented for Windows."}
-
-    LOGS.append({"time": timestamp, "action": "winsock_reset", "result": result})
-    return result
+    return submit_remediation("winsock_reset")
+
+@app.get("/remediation/jobs")
+def list_remediation_jobs(status: str = None):
+    return {"jobs": [job.to_dict() for job in remediation_executor.list_jobs(status)]}
+
+@app.get("/remediation/scheduler")
+def remediation_scheduler_status():
+    return {"stats": remediation_scheduler.stats, "cooldowns": remediation_scheduler.cooldowns_active()}
+
+@app.get("/remediation/jobs/{job_id}")
+def remediation_job(job_id: str):
+    job = remediation_executor.get(job_id)
+    if job is None:
+        return JSONResponse(content={"error": f"Unknown job {job_id}"}, status_code=404)
+    return job.to_dict()
+
+@app.post("/remediation/jobs/{job_id}/cancel")
+def cancel_remediation_job(job_id: str):
+    job = remediation_executor.cancel(job_id)
+    if job is None:
+        return JSONResponse(content={"error": f"Unknown job {job_id}"}, status_code=404)
+    return job.to_dict()
 
 @app.get("/logs")
-def get_logs():
-    return {"logs": LOGS}
+def get_logs(start: datetime = None, end: datetime = None, action: str = None, target: str = None,
+             cursor: str = None, limit: int = 100):
+    """
+    Remediation log, newest first. `action` and `target` accept
+    comma-separated lists; pass `next_cursor` back as `cursor` for older entries.
+    """
+    try:
+        return action_log.query(start, end, split_param(action), split_param(target), cursor, limit)
+    except ValueError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=400)
 
 @app.get("/whoami")
 def whoami():
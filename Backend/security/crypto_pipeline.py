@@ -0,0 +1,365 @@
+# security/crypto_pipeline.py
+#
+# Bulk Fernet encryption/decryption for the encrypted `logs` table. Rows are
+# processed in chunks on a process pool (Fernet is pure CPU work, so threads
+# would serialize on the GIL), with a bounded number of chunks in flight so
+# memory stays flat however many rows pass through. Writes bulk-load each
+# chunk with COPY (or execute_values); reads stream through a server-side
+# cursor instead of fetchall().
+#
+# Fernet ciphertext is randomized, so txn_id/acc_no also get a blind index: a
+# keyed HMAC-SHA256 of the plaintext, stored in an indexed column next to the
+# ciphertext. Exact-match lookups seek on the HMAC and decrypt only the hits.
+
+import csv
+import hashlib
+import hmac
+import io
+import os
+import secrets
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import psycopg2
+from cryptography.fernet import Fernet
+from dotenv import load_dotenv
+from psycopg2.extras import execute_values
+
+load_dotenv()
+
+SECRET_KEY_PATH = os.getenv("SECRET_KEY_PATH", "secret.key")
+# Separate from the Fernet key, so rotating one does not touch the other
+BLIND_INDEX_KEY_PATH = os.getenv("BLIND_INDEX_KEY_PATH", "blind_index.key")
+CRYPTO_PROCESSES = int(os.getenv("CRYPTO_PROCESSES", os.cpu_count() or 2))
+CRYPTO_CHUNK_SIZE = int(os.getenv("CRYPTO_CHUNK_SIZE", 5000))
+
+# Data columns of the logs table, in order; the first two hold Fernet ciphertext
+DATA_COLUMNS = [
+    "enc_txn_id", "enc_acc_no", "status", "amount",
+    "gateway", "region", "service", "trace_id", "span_id",
+    "error_code", "latency_ms", "cpu", "memory_usage",
+    "error_count", "total_requests", "timestamp",
+]
+ENCRYPTED_COLUMNS = 2
+# HMAC blind index of each encrypted column, in the same order
+BLIND_INDEX_COLUMNS = ["txn_id_bidx", "acc_no_bidx"]
+LOG_COLUMNS = DATA_COLUMNS + BLIND_INDEX_COLUMNS
+# Dataset (JSON) field feeding each column
+DATASET_FIELDS = [
+    "txn_id", "acc_no", "status", "amount",
+    "gateway", "region", "service", "trace_id", "span_id",
+    "error_code", "latency_ms", "CPU", "memory_usage",
+    "error_count", "total_requests", "timestamp",
+]
+
+
+def connect():
+    return psycopg2.connect(
+        host=os.getenv("LOGS_DB_HOST", "localhost"),
+        dbname=os.getenv("LOGS_DB_NAME", "AREALIS_DATABASE"),
+        user=os.getenv("LOGS_DB_USER", "postgres"),
+        password=os.getenv("LOGS_DB_PASSWORD", "123@SITPune"),
+    )
+
+
+def load_key(path=SECRET_KEY_PATH, create=False, generate=Fernet.generate_key):
+    """Read a key file, generating and saving a key only if `create` and none exists yet."""
+    if not os.path.exists(path):
+        if not create:
+            raise FileNotFoundError(f"No key at {path}")
+        with open(path, "wb") as key_file:
+            key_file.write(generate())
+    with open(path, "rb") as key_file:
+        return key_file.read().strip()
+
+
+def load_blind_index_key(path=BLIND_INDEX_KEY_PATH, create=False):
+    return load_key(path, create, generate=lambda: secrets.token_hex(32).encode())
+
+
+def normalize_value(value):
+    """
+    Canonical plaintext of an encrypted field. Applied before encrypting,
+    HMACing and comparing alike, so all three always agree.
+    """
+    return str(value).strip()
+
+
+def blind_index(value, blind_key):
+    """Keyed HMAC-SHA256 (hex) of a normalized plaintext value, for exact-match lookups."""
+    return hmac.new(blind_key, normalize_value(value).encode(), hashlib.sha256).hexdigest()
+
+
+def dataset_row(data):
+    """Plaintext logs row (txn_id and acc_no in the encrypted positions) from one dataset record."""
+    return tuple(data[field] for field in DATASET_FIELDS)
+
+
+# --- Worker side: one Fernet instance per process ---
+
+_cipher = None
+_new_cipher = None
+_blind_key = None
+
+
+def _init_worker(key, new_key=None, blind_key=None):
+    global _cipher, _new_cipher, _blind_key
+    _cipher = Fernet(key)
+    _new_cipher = Fernet(new_key) if new_key else None
+    _blind_key = blind_key
+
+
+def _encrypt_chunk(rows):
+    """Plaintext data rows -> encrypted data rows, plus the blind index columns when a blind key is set."""
+    encrypted = []
+    for row in rows:
+        plain = tuple(normalize_value(value) for value in row[:ENCRYPTED_COLUMNS])
+        out = tuple(_cipher.encrypt(value.encode()).decode() for value in plain) + tuple(row[ENCRYPTED_COLUMNS:])
+        if _blind_key is not None:
+            out += tuple(blind_index(value, _blind_key) for value in plain)
+        encrypted.append(out)
+    return encrypted
+
+
+def _decrypt_chunk(rows):
+    return [
+        tuple(_cipher.decrypt(value.encode()).decode() for value in row[:ENCRYPTED_COLUMNS]) + tuple(row[ENCRYPTED_COLUMNS:])
+        for row in rows
+    ]
+
+
+def _blind_index_chunk(rows):
+    """(row key, ciphertext...) -> (row key, blind index...), for backfilling existing rows."""
+    return [
+        (row[0],) + tuple(blind_index(_cipher.decrypt(value.encode()).decode(), _blind_key) for value in row[1:])
+        for row in rows
+    ]
+
+
+def _reencrypt_chunk(rows):
+    return [
+        tuple(_new_cipher.encrypt(_cipher.decrypt(value.encode())).decode() for value in row[:ENCRYPTED_COLUMNS])
+        + tuple(row[ENCRYPTED_COLUMNS:])
+        for row in rows
+    ]
+
+
+def chunked(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class CryptoPipeline:
+    """
+    Process pool applying Fernet to the encrypted columns of row tuples.
+    Results come back in input order, chunk by chunk; at most
+    `processes * 2` chunks are in flight at a time.
+
+        with CryptoPipeline(key) as pipeline:
+            for chunk in pipeline.encrypt_chunks(rows): ...
+    """
+
+    def __init__(self, key, new_key=None, blind_key=None, processes=CRYPTO_PROCESSES, chunk_size=CRYPTO_CHUNK_SIZE):
+        self.processes = processes
+        self.chunk_size = chunk_size
+        self._pool = ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                                         initargs=(key, new_key, blind_key))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._pool.shutdown(cancel_futures=True)
+
+    def _map(self, fn, rows):
+        in_flight = deque()
+        for chunk in chunked(rows, self.chunk_size):
+            in_flight.append(self._pool.submit(fn, chunk))
+            if len(in_flight) >= self.processes * 2:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+
+    def encrypt_chunks(self, rows):
+        return self._map(_encrypt_chunk, rows)
+
+    def decrypt_chunks(self, rows):
+        return self._map(_decrypt_chunk, rows)
+
+    def blind_index_chunks(self, rows):
+        return self._map(_blind_index_chunk, rows)
+
+    def reencrypt_chunks(self, rows):
+        """Decrypt with `key` and encrypt with `new_key` (key rotation)."""
+        return self._map(_reencrypt_chunk, rows)
+
+
+# --- Database side ---
+
+def copy_rows(cur, table, columns, rows):
+    """Bulk-load one chunk of row tuples with COPY ... FROM STDIN (CSV)."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        # COPY CSV reads an unquoted empty field as NULL
+        writer.writerow(["" if value is None else value for value in row])
+    buffer.seek(0)
+    cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+
+def bulk_insert(conn, chunks, table="logs", columns=LOG_COLUMNS, method="copy", page_size=1000):
+    """
+    Write chunks of row tuples into `table` in one transaction, with COPY or
+    execute_values. Returns the number of rows written.
+    """
+    written = 0
+    with conn.cursor() as cur:
+        for rows in chunks:
+            if method == "copy":
+                copy_rows(cur, table, columns, rows)
+            else:
+                execute_values(cur, f"INSERT INTO {table} ({', '.join(columns)}) VALUES %s", rows, page_size=page_size)
+            written += len(rows)
+    conn.commit()
+    return written
+
+
+def stream_rows(conn, table="logs", columns=LOG_COLUMNS, itersize=CRYPTO_CHUNK_SIZE, name="crypto_stream"):
+    """Yield row tuples from `table` through a server-side (named) cursor, `itersize` rows per round trip."""
+    with conn.cursor(name=name) as cur:
+        cur.itersize = itersize
+        cur.execute(f"SELECT {', '.join(columns)} FROM {table}")
+        yield from cur
+
+
+def encrypt_dataset(conn, records, key, blind_key, method="copy", processes=CRYPTO_PROCESSES,
+                    chunk_size=CRYPTO_CHUNK_SIZE):
+    """Encrypt dataset records (dicts), with their blind indexes, and bulk-load them into logs. Returns the row count."""
+    with CryptoPipeline(key, blind_key=blind_key, processes=processes, chunk_size=chunk_size) as pipeline:
+        return bulk_insert(conn, pipeline.encrypt_chunks(dataset_row(data) for data in records), method=method)
+
+
+def iter_decrypted_logs(conn, key, processes=CRYPTO_PROCESSES, chunk_size=CRYPTO_CHUNK_SIZE):
+    """Yield logs rows as dicts with txn_id/acc_no decrypted, streaming the table."""
+    names = ["txn_id", "acc_no"] + LOG_COLUMNS[ENCRYPTED_COLUMNS:]
+    with CryptoPipeline(key, processes=processes, chunk_size=chunk_size) as pipeline:
+        for rows in pipeline.decrypt_chunks(stream_rows(conn, columns=DATA_COLUMNS, itersize=chunk_size)):
+            for row in rows:
+                yield dict(zip(names, row))
+
+
+def rotate_key(conn, old_key, new_key, table="logs", processes=CRYPTO_PROCESSES, chunk_size=CRYPTO_CHUNK_SIZE):
+    """
+    Re-encrypt every row of `table` under `new_key`: stream it, re-encrypt on
+    the pool, COPY into a copy of the table, then swap the two in the same
+    transaction. Writes to `table` are blocked for the whole rotation (reads
+    are not), so no row can change between the copy and the swap, and the old
+    table is only dropped once the copy holds as many rows as it does. Blind
+    indexes use their own key and are carried over as they are. Returns the
+    number of rows rotated.
+    """
+    ensure_blind_index(conn, table)
+    staging = f"{table}_rotating"
+    try:
+        with conn.cursor() as cur:
+            # Held until the commit below
+            cur.execute(f"LOCK TABLE {table} IN SHARE ROW EXCLUSIVE MODE")
+            cur.execute(f"DROP TABLE IF EXISTS {staging}")
+            cur.execute(f"CREATE TABLE {staging} (LIKE {table} INCLUDING ALL)")
+        with CryptoPipeline(old_key, new_key, processes=processes, chunk_size=chunk_size) as pipeline:
+            chunks = pipeline.reencrypt_chunks(stream_rows(conn, table, itersize=chunk_size, name="rotate_stream"))
+            written = 0
+            with conn.cursor() as cur:
+                for rows in chunks:
+                    copy_rows(cur, staging, LOG_COLUMNS, rows)
+                    written += len(rows)
+                cur.execute(f"SELECT count(*) FROM {table}")
+                expected = cur.fetchone()[0]
+                if written != expected:
+                    raise RuntimeError(f"Rotated {written} rows but {table} has {expected}; keeping the old table")
+                cur.execute(f"ALTER TABLE {table} RENAME TO {table}_old")
+                cur.execute(f"ALTER TABLE {staging} RENAME TO {table}")
+                cur.execute(f"DROP TABLE {table}_old")
+    except Exception:
+        conn.rollback()
+        raise
+    conn.commit()
+    return written
+
+
+# --- Blind index ---
+
+def ensure_blind_index(conn, table="logs"):
+    """Add the blind index columns and their indexes to `table` if missing."""
+    with conn.cursor() as cur:
+        for column in BLIND_INDEX_COLUMNS:
+            cur.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column} CHAR(64)")
+            cur.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_{column} ON {table} ({column})")
+    conn.commit()
+
+
+def backfill_blind_index(conn, key, blind_key, table="logs", processes=CRYPTO_PROCESSES,
+                         chunk_size=CRYPTO_CHUNK_SIZE):
+    """
+    Compute the blind index of rows written before it existed: stream them,
+    decrypt and HMAC on the pool, and update each chunk with one statement.
+    Returns the number of rows updated.
+    """
+    ensure_blind_index(conn, table)
+    assignments = ", ".join(f"{column} = v.{column}" for column in BLIND_INDEX_COLUMNS)
+    update = (f"UPDATE {table} SET {assignments} FROM (VALUES %s) AS v (row_id, {', '.join(BLIND_INDEX_COLUMNS)}) "
+              f"WHERE {table}.ctid = v.row_id::tid")
+    with conn.cursor(name="blind_index_backfill") as source:
+        source.itersize = chunk_size
+        source.execute(f"SELECT ctid::text, {', '.join(DATA_COLUMNS[:ENCRYPTED_COLUMNS])} FROM {table} "
+                       f"WHERE {' OR '.join(f'{column} IS NULL' for column in BLIND_INDEX_COLUMNS)}")
+        updated = 0
+        with CryptoPipeline(key, blind_key=blind_key, processes=processes, chunk_size=chunk_size) as pipeline:
+            with conn.cursor() as cur:
+                for rows in pipeline.blind_index_chunks(source):
+                    execute_values(cur, update, rows, page_size=len(rows))
+                    updated += len(rows)
+    conn.commit()
+    return updated
+
+
+def find_logs(conn, field, value, key, blind_key, table="logs"):
+    """
+    Exact-match lookup of logs rows by plaintext txn_id or acc_no: one indexed
+    seek on the blind index, then only the matching rows are decrypted (and
+    compared, so an HMAC collision can never return a wrong row).
+    """
+    position = {"txn_id": 0, "acc_no": 1}.get(field)
+    if position is None:
+        raise ValueError("field must be 'txn_id' or 'acc_no'")
+    with conn.cursor() as cur:
+        cur.execute(f"SELECT {', '.join(DATA_COLUMNS)} FROM {table} WHERE {BLIND_INDEX_COLUMNS[position]} = %s",
+                    (blind_index(value, blind_key),))
+        rows = cur.fetchall()
+    cipher = Fernet(key)
+    names = ["txn_id", "acc_no"] + DATA_COLUMNS[ENCRYPTED_COLUMNS:]
+    wanted = normalize_value(value)
+    matches = []
+    for row in rows:
+        record = dict(zip(names, [cipher.decrypt(v.encode()).decode() for v in row[:ENCRYPTED_COLUMNS]] + list(row[ENCRYPTED_COLUMNS:])))
+        # Rows encrypted before normalization may still carry surrounding whitespace
+        if normalize_value(record[field]) == wanted:
+            matches.append(record)
+    return matches
+
+
+def find_by_txn_id(conn, txn_id, key, blind_key, table="logs"):
+    return find_logs(conn, "txn_id", txn_id, key, blind_key, table)
+
+
+def find_by_acc_no(conn, acc_no, key, blind_key, table="logs"):
+    return find_logs(conn, "acc_no", acc_no, key, blind_key, table)
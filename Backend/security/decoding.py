@@ -1,49 +1,45 @@
-import psycopg2
-from cryptography.fernet import Fernet
+import argparse
+import json
+import sys
 
-with open("secret.key", "rb") as key_file:
-    key = key_file.read()
-
-cipher = Fernet(key)
-
-
-# Decrypt Function
-def decrypt_field(value):
-    return cipher.decrypt(value.encode()).decode()
-
-
-conn = psycopg2.connect(
-    host="localhost", dbname="AREALIS_DATABASE", user="postgres", password="123@SITPune"
+from crypto_pipeline import (
+    backfill_blind_index, connect, find_by_acc_no, find_by_txn_id, iter_decrypted_logs, load_blind_index_key, load_key,
 )
-cur = conn.cursor()
 
-cur.execute("SELECT * FROM logs")
-rows = cur.fetchall()
-decrypted_data = []
-for row in rows:
-    dec_txn_id = decrypt_field(row[0])
-    dec_acc_no = decrypt_field(row[1])
-    decrypted_data.append(
-        {
-            "txn_id": dec_txn_id,
-            "acc_no": dec_acc_no,
-            "status": row[2],
-            "amount": row[3],
-            "gateway": row[4],
-            "region": row[5],
-            "service": row[6],
-            "trace_id": row[7],
-            "span_id": row[8],
-            "error_code": row[9],
-            "latency_ms": row[10],
-            "cpu": row[11],
-            "memory_usage": row[12],
-            "error_count": row[13],
-            "total_requests": row[14],
-            "timestamp": row[15],
-        }
-    )
 
-cur.close()
-conn.close()
-print("Decryption successfully!")
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Decrypt the logs table")
+    parser.add_argument("--txn-id", help="Only the rows for this transaction (blind index lookup)")
+    parser.add_argument("--acc-no", help="Only the rows for this account (blind index lookup)")
+    parser.add_argument("--backfill", action="store_true", help="Compute blind indexes for rows that lack them")
+    parser.add_argument("--output", help="Write the decrypted records here as JSON lines (default: stdout)")
+    args = parser.parse_args()
+
+    key = load_key()
+
+    conn = connect()
+    try:
+        if args.backfill:
+            print(f"Blind index backfilled for {backfill_blind_index(conn, key, load_blind_index_key())} rows")
+        elif args.txn_id or args.acc_no:
+            blind_key = load_blind_index_key()
+            if args.txn_id:
+                matches = find_by_txn_id(conn, args.txn_id, key, blind_key)
+            else:
+                matches = find_by_acc_no(conn, args.acc_no, key, blind_key)
+            print(json.dumps(matches, indent=2, default=str))
+        else:
+            # Streams logs through a server-side cursor and decrypts chunks on a process pool;
+            # one JSON record per line, so the output never has to fit in memory
+            out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+            decrypted = 0
+            try:
+                for record in iter_decrypted_logs(conn, key):
+                    out.write(json.dumps(record, default=str) + "\n")
+                    decrypted += 1
+            finally:
+                if out is not sys.stdout:
+                    out.close()
+            print(f"Decryption successfully! ({decrypted} rows)", file=sys.stderr)
+    finally:
+        conn.close()
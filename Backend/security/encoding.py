@@ -1,65 +1,23 @@
 import json
-import psycopg2
-from cryptography.fernet import Fernet
 
+from crypto_pipeline import connect, encrypt_dataset, ensure_blind_index, load_blind_index_key, load_key
 
-with open("secret.key", "wb") as key_file:
-    key = Fernet.generate_key()
-    key_file.write(key)
 
-cipher = Fernet(key)
+if __name__ == "__main__":
+    # Reuse the existing keys: a fresh key per run would make earlier rows undecryptable
+    key = load_key(create=True)
+    blind_key = load_blind_index_key(create=True)
 
+    with open("lamx_dataset.json") as f:
+        data_list = json.load(f)
 
-# Encrypt Function
-def encrypt_field(value):
-    return cipher.encrypt(value.encode()).decode()
+    # database Connection
+    conn = connect()
+    try:
+        ensure_blind_index(conn)
+        # Encrypted on a process pool in chunks, each chunk bulk-loaded with COPY
+        inserted = encrypt_dataset(conn, data_list, key, blind_key)
+    finally:
+        conn.close()
 
-
-with open("lamx_dataset.json") as f:
-    data_list = json.load(f)
-
-# database Connection
-conn = psycopg2.connect(
-    host="localhost", dbname="AREALIS_DATABASE", user="postgres", password="123@SITPune"
-)
-cur = conn.cursor()
-
-for data in data_list:
-    enc_txn_id = encrypt_field(data["txn_id"])
-    enc_acc_no = encrypt_field(data["acc_no"])
-
-    cur.execute(
-        """
-        INSERT INTO logs (
-            enc_txn_id, enc_acc_no, status, amount,
-            gateway, region, service, trace_id, span_id,
-            error_code, latency_ms, cpu, memory_usage,
-            error_count, total_requests, timestamp
-        )
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s);
-    """,
-        (
-            enc_txn_id,
-            enc_acc_no,
-            data["status"],
-            data["amount"],
-            data["gateway"],
-            data["region"],
-            data["service"],
-            data["trace_id"],
-            data["span_id"],
-            data["error_code"],
-            data["latency_ms"],
-            data["CPU"],
-            data["memory_usage"],
-            data["error_count"],
-            data["total_requests"],
-            data["timestamp"],
-        ),
-    )
-
-conn.commit()
-cur.close()
-conn.close()
-
-print("Encrypted data inserted successfully!")
+    print(f"Encrypted data inserted successfully! ({inserted} rows)")
@@ -0,0 +1,250 @@
+import asyncio
+import multiprocessing
+import os
+from datetime import datetime
+
+import httpx
+import pytest
+
+from execution.action_log import ActionLog
+from execution.execution import request_with_retry
+from execution.executor import RemediationExecutor
+from execution.rules import DEFAULT_RULES, RuleEngine
+from execution.scheduler import CooldownActive, RemediationScheduler
+
+
+# --- retries ---
+
+def _retry_calls(method, outcome):
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if isinstance(outcome, int):
+            return httpx.Response(outcome)
+        raise outcome("boom", request=request)
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            try:
+                await request_with_retry(client, method, "http://agent/restart/service", retries=2, backoff_s=0)
+            except httpx.TransportError:
+                pass
+
+    asyncio.run(run())
+    return len(calls)
+
+
+@pytest.mark.parametrize("outcome", [500, 502, httpx.ReadTimeout])
+def test_post_not_retried_when_agent_may_have_acted(outcome):
+    assert _retry_calls("POST", outcome) == 1
+
+
+@pytest.mark.parametrize("outcome", [429, 503, httpx.ConnectError])
+def test_post_retried_when_agent_cannot_have_acted(outcome):
+    assert _retry_calls("POST", outcome) == 3
+
+
+@pytest.mark.parametrize("outcome", [500, httpx.ReadTimeout])
+def test_get_retried_on_any_transient_failure(outcome):
+    assert _retry_calls("GET", outcome) == 3
+
+
+# --- scheduler ---
+
+def _executor(runs, delay=0.0):
+    async def action(target):
+        runs.append(target)
+        await asyncio.sleep(delay)
+        return {"status": "success", "output": target}
+
+    return RemediationExecutor(actions={"restart": action, "flush_dns": action})
+
+
+def test_scheduler_coalesces_identical_requests():
+    runs = []
+    scheduler = RemediationScheduler(_executor(runs, delay=0.2), coalesce_window_s=5)
+    first, coalesced = scheduler.submit("restart", "api")
+    assert not coalesced
+    for _ in range(9):
+        job, coalesced = scheduler.submit("restart", "api")
+        assert coalesced and job is first
+    first.wait(5)
+    assert runs == ["api"]
+    assert first.requesters == 10
+    assert scheduler.stats["executions"] == 1 and scheduler.stats["coalesced"] == 9
+
+
+def test_scheduler_refuses_during_cooldown():
+    runs = []
+    scheduler = RemediationScheduler(_executor(runs), coalesce_window_s=0, cooldowns={"restart": 60})
+    job, _ = scheduler.submit("restart", "api")
+    job.wait(5)
+    with pytest.raises(CooldownActive) as raised:
+        scheduler.submit("restart", "api")
+    assert 0 < raised.value.retry_after_s <= 60
+    assert "restart:api" in scheduler.cooldowns_active()
+    # Another target is not affected
+    scheduler.submit("restart", "db")[0].wait(5)
+    assert runs == ["api", "db"]
+
+
+def test_scheduler_bounds_its_key_map():
+    runs = []
+    scheduler = RemediationScheduler(_executor(runs), coalesce_window_s=0, cooldowns={"flush_dns": 0}, max_keys=3)
+    for i in range(20):
+        scheduler.submit("flush_dns", f"host-{i}")[0].wait(5)
+    assert len(runs) == 20
+    assert len(scheduler.latest) <= 3
+
+
+def test_scheduler_batches_targets_of_one_action():
+    """Distinct targets of a batchable action within the window run as one execution"""
+    runs, batches = [], []
+
+    async def restart_many(targets):
+        batches.append(list(targets))
+        return {"status": "success", "output": ",".join(targets)}
+
+    async def action(target):
+        runs.append(target)
+        return {"status": "success", "output": target}
+
+    executor = RemediationExecutor(actions={"restart": action, "run_task": action},
+                                   batch_actions={"restart": restart_many})
+    scheduler = RemediationScheduler(executor, batch_window_s=0.1, coalesce_window_s=5)
+    jobs = [scheduler.submit("restart", service)[0] for service in ("api", "db", "web")]
+    assert scheduler.submit("restart", "db") == (jobs[1], True)
+    # Not batchable: starts without waiting for the window
+    scheduler.submit("run_task", "backup")[0].wait(5)
+    assert runs == ["backup"] and batches == []
+
+    for job in jobs:
+        job.wait(5)
+    assert batches == [["api", "db", "web"]]
+    assert {job.status for job in jobs} == {"completed"}
+    assert {job.result["output"] for job in jobs} == {"api,db,web"}
+    assert scheduler.stats["batches"] == 1
+
+
+def test_scheduler_never_evicts_keys_in_cooldown():
+    runs = []
+    scheduler = RemediationScheduler(_executor(runs), coalesce_window_s=0, cooldowns={"restart": 60}, max_keys=2)
+    for service in ("api", "db", "web"):
+        scheduler.submit("restart", service)[0].wait(5)
+    assert len(scheduler.latest) == 3
+    with pytest.raises(CooldownActive):
+        scheduler.submit("restart", "api")
+    assert runs == ["api", "db", "web"]
+
+
+# --- action log ---
+
+def _append_many(directory, worker, count):
+    log = ActionLog(directory, capacity=10, segment_bytes=2048)
+    for i in range(count):
+        log.append({"action": "restart", "target": f"w{worker}", "i": i})
+
+
+def _all_entries(directory):
+    entries = []
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".jsonl"):
+            with open(os.path.join(directory, name)) as f:
+                entries += ActionLog._parse(f)
+    return entries
+
+
+def test_action_log_pages_newest_first(tmp_path):
+    log = ActionLog(str(tmp_path), capacity=5, segment_bytes=512)
+    for i in range(30):
+        log.append({"time": "2024-01-01T00:00:00", "action": "restart" if i % 2 else "flush_dns", "target": "api"})
+
+    seqs, cursor = [], None
+    while True:
+        page = log.query(cursor=cursor, limit=7)
+        seqs += [entry["seq"] for entry in page["logs"]]
+        if not page["has_more"]:
+            break
+        cursor = page["next_cursor"]
+    assert seqs == list(range(30, 0, -1))
+    assert all(entry["action"] == "restart" for entry in log.query(actions=["restart"], limit=100)["logs"])
+
+    reopened = ActionLog(str(tmp_path), capacity=5, segment_bytes=512)
+    assert reopened.append({"action": "restart"})["seq"] == 31
+
+
+def test_action_log_start_stops_at_older_segments(tmp_path, monkeypatch):
+    log = ActionLog(str(tmp_path), capacity=2, segment_bytes=256)
+    for i in range(40):
+        log.append({"time": f"2024-01-01T10:{i:02d}:00", "action": "restart", "target": "api"})
+    read = []
+    original = ActionLog._read_segment.__func__
+    monkeypatch.setattr(ActionLog, "_read_segment", classmethod(lambda cls, path: read.append(path) or original(cls, path)))
+
+    page = log.query(start=datetime(2024, 1, 1, 10, 35), limit=100)
+    assert [entry["seq"] for entry in page["logs"]] == list(range(40, 35, -1))
+    assert 0 < len(read) < len(log._segments()) - 1
+
+
+def test_action_log_seqs_unique_across_processes(tmp_path):
+    directory = str(tmp_path)
+    workers = [multiprocessing.Process(target=_append_many, args=(directory, w, 50)) for w in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(30)
+        assert worker.exitcode == 0
+
+    seqs = [entry["seq"] for entry in _all_entries(directory)]
+    assert seqs == list(range(1, 201))
+    log = ActionLog(directory)
+    assert len(log.query(limit=1000)["logs"]) == 200
+
+
+def test_action_log_recovers_from_torn_line(tmp_path):
+    log = ActionLog(str(tmp_path))
+    log.append({"action": "restart"})
+    segment = [name for name in os.listdir(tmp_path) if name.endswith(".jsonl")][0]
+    with open(tmp_path / segment, "a") as f:
+        f.write('{"seq": 2, "act')
+
+    reopened = ActionLog(str(tmp_path))
+    assert reopened.append({"action": "flush_dns"})["seq"] == 2
+    assert [entry["seq"] for entry in _all_entries(str(tmp_path))] == [1, 2]
+    assert [entry["action"] for entry in reopened.query()["logs"]] == ["flush_dns", "restart"]
+
+
+# --- rule engine ---
+
+def test_rules_route_to_highest_priority():
+    engine = RuleEngine(DEFAULT_RULES)
+    decision = engine.classify({"txn_id": "t1", "service": "payments", "metric": "latency_ms",
+                                "rca_summary": "Name resolution failed: nameserver unreachable"})
+    assert decision["rule"] == "dns_resolution"
+    assert decision["fix_plan"] == {"action": "flush_dns"}
+
+    decision = engine.classify({"txn_id": "t2", "service": "payments", "metric": "cpu",
+                                "rca_summary": "Service crashed and is unresponsive"})
+    assert decision["fix_plan"] == {"action": "restart", "service": "payments"}
+
+
+def test_regexes_never_match_across_summaries():
+    """Each summary is scanned on its own, so a regex cannot span two of them"""
+    engine = RuleEngine([{"name": "oom", "executor": "service", "patterns": [r"out of\s+memory"],
+                          "fix_plan": {"action": "restart"}}])
+    decisions, stats = engine.classify_batch([{"rca_summary": "ran out of"}, {"rca_summary": "memory pressure"}])
+    assert [d["rule"] for d in decisions] == [None, None]
+    assert stats["unmatched"] == 2
+
+
+def test_every_matching_regex_rule_counts():
+    """When two rules' regexes match one summary, the higher priority wins regardless of rule order"""
+    engine = RuleEngine([
+        {"name": "low", "executor": "a", "patterns": [r"disk"], "priority": 1},
+        {"name": "high", "executor": "b", "patterns": [r"disk full"], "priority": 9},
+    ])
+    decisions, stats = engine.classify_batch([{"rca_summary": "disk full on /var"}])
+    assert decisions[0]["rule"] == "high"
+    assert sorted(decisions[0]["matched_rules"]) == ["high", "low"]
+    assert stats["rule_hits"] == {"high": 1, "low": 1}
@@ -0,0 +1,168 @@
+import math
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, text
+
+from RCA.incident_clustering import cluster_incidents
+from RCA.llm_executor import LLMExecutor, TokenBucket
+from RCA.rca_cache import anomaly_signature, value_bucket
+from RCA.rca_results import decode_cursor, encode_cursor, fetch_rca_page
+
+
+# --- rate limiting ---
+
+def test_zero_rate_token_bucket_is_unlimited():
+    bucket = TokenBucket(0, 0)
+    started = time.monotonic()
+    for _ in range(1000):
+        bucket.acquire(500)
+        assert bucket.try_acquire(500)
+    assert time.monotonic() - started < 1
+
+
+def test_token_bucket_refuses_beyond_capacity():
+    bucket = TokenBucket(0.001, 2)
+    assert bucket.try_acquire() and bucket.try_acquire()
+    assert not bucket.try_acquire()
+
+
+class _Failure(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+
+
+def test_llm_executor_retries_retryable_failures_only():
+    executor = LLMExecutor(max_workers=4, requests_per_minute=0, tokens_per_minute=0, max_retries=3, base_delay=0)
+    attempts = {}
+
+    def call(name, failures, status):
+        attempts[name] = attempts.get(name, 0) + 1
+        if attempts[name] <= failures:
+            raise _Failure(status)
+        return name
+
+    results = executor.map(call, [("flaky", 2, 503), ("bad", 1, 400), ("ok", 0, 200)])
+    assert results[0] == "flaky" and results[2] == "ok"
+    assert isinstance(results[1], _Failure)
+    assert attempts == {"flaky": 3, "bad": 1, "ok": 1}
+    assert executor.stats["retries"] == 2 and executor.stats["failures"] == 1
+
+
+def test_llm_executor_caps_retry_after_at_max_delay():
+    class Response:
+        headers = {"retry-after": "3600"}
+
+    failure = _Failure(429)
+    failure.response = Response()
+    executor = LLMExecutor(max_workers=1, requests_per_minute=0, tokens_per_minute=0, max_retries=1, max_delay=0.05)
+    calls = []
+
+    def call():
+        calls.append(1)
+        if len(calls) == 1:
+            raise failure
+        return "ok"
+
+    started = time.monotonic()
+    assert executor.call(call) == "ok"
+    assert time.monotonic() - started < 1
+
+
+def test_llm_executor_as_completed_cancels_pending_calls_when_closed():
+    executor = LLMExecutor(max_workers=1, requests_per_minute=0, tokens_per_minute=0)
+    calls = []
+
+    def call(i):
+        calls.append(i)
+        time.sleep(0.05)
+        return i
+
+    started = time.monotonic()
+    results = executor.as_completed(call, [(i,) for i in range(50)])
+    assert next(results) == (0, 0)
+    results.close()
+    assert time.monotonic() - started < 1
+    time.sleep(0.2)
+    assert len(calls) < 5
+
+
+# --- RCA cache signatures ---
+
+@pytest.mark.parametrize("value", [math.nan, math.inf, -math.inf, "nan", "inf"])
+def test_value_bucket_handles_non_finite_values(value):
+    assert value_bucket("latency_ms", value) == str(float(value))
+    assert value_bucket("unknown_metric", value) == str(float(value))
+
+
+def test_value_bucket_groups_nearby_values():
+    assert value_bucket("latency_ms", 1010) == value_bucket("latency_ms", 1200) != value_bucket("latency_ms", 1300)
+    assert value_bucket("queue_depth", 9) == value_bucket("queue_depth", 15) == "log3"
+    assert value_bucket("queue_depth", 0) == "0"
+    assert value_bucket("cpu", None) == "nan"
+    assert anomaly_signature({"service": "api", "metric": "CPU", "value": 91}, None) == "api|cpu|18|none"
+
+
+# --- incident clustering ---
+
+def test_cluster_incidents():
+    df = pd.DataFrame({
+        "service": ["api", "api", "api", "db", "api", "api"],
+        "timestamp": pd.to_datetime(["2024-01-01 10:00", "2024-01-01 10:20", "2024-01-01 10:40",
+                                     "2024-01-01 10:00", "2024-01-01 14:00", "2024-01-01 10:10"]),
+    })
+    similar, different = [1.0, 0.0], [0.0, 1.0]
+    embeddings = [similar, similar, similar, similar, similar, different]
+    labels = cluster_incidents(df, embeddings, window_minutes=30, similarity=0.9)
+
+    # Chained within the window on one service
+    assert labels[0] == labels[1] == labels[2]
+    # Other service, hours later, or a dissimilar description: separate incidents
+    assert len({labels[0], labels[3], labels[4], labels[5]}) == 4
+    assert len(cluster_incidents(df.iloc[:0], np.zeros((0, 2)))) == 0
+
+
+# --- keyset pagination ---
+
+def test_cursor_round_trip():
+    cursor = encode_cursor(pd.Timestamp("2024-01-01 10:00:00").to_pydatetime(), 42)
+    assert decode_cursor(cursor) == (pd.Timestamp("2024-01-01 10:00:00").to_pydatetime(), 42)
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+
+def test_keyset_pages_cover_every_row_once(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'rca.db'}")
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE anomaly_logs (id INTEGER PRIMARY KEY, txn_id TEXT, service TEXT, metric TEXT, "
+            "value REAL, timestamp TEXT, z_score REAL, rca_summary TEXT, rca_confidence REAL)"
+        ))
+        # Several rows share a timestamp, so pages must break ties on id. Stored the way
+        # the SQLite dialect binds datetimes, so the cursor compares like for like
+        conn.execute(text(
+            "INSERT INTO anomaly_logs (id, txn_id, service, metric, value, timestamp, z_score, rca_summary, "
+            "rca_confidence) VALUES (:id, :txn_id, :service, 'cpu', 1, :timestamp, 3, :summary, 0.9)"
+        ), [{"id": i, "txn_id": f"T{i}", "service": "api" if i % 3 else "db",
+             "timestamp": f"2024-01-01 10:0{i // 4}:00.000000", "summary": None if i == 7 else "root cause"}
+            for i in range(1, 26)])
+
+    seen, cursor = [], None
+    while True:
+        page = fetch_rca_page(engine, limit=4, cursor=cursor, fields="txn_id,service")
+        assert all(set(row) == {"txn_id", "service"} for row in page["data"])
+        seen += [row["txn_id"] for row in page["data"]]
+        assert len(seen) <= 25, "pagination repeated rows"
+        if not page["has_more"]:
+            break
+        cursor = page["next_cursor"]
+    expected = [f"T{i}" for i in sorted(range(1, 26), key=lambda i: (i // 4, i), reverse=True) if i != 7]
+    assert seen == expected
+
+    db_rows = fetch_rca_page(engine, limit=100, services=["db"])["data"]
+    assert {row["service"] for row in db_rows} == {"db"}
+    with pytest.raises(ValueError):
+        fetch_rca_page(engine, fields="password")
@@ -0,0 +1,72 @@
+import pytest
+
+pytest.importorskip("psycopg2")
+from cryptography.fernet import Fernet
+
+from security.crypto_pipeline import (
+    DATA_COLUMNS, DATASET_FIELDS, ENCRYPTED_COLUMNS, LOG_COLUMNS, CryptoPipeline, blind_index, dataset_row,
+    find_by_acc_no, find_by_txn_id,
+)
+
+BLIND_KEY = b"0" * 64
+
+
+def _rows(count):
+    records = [{field: f"TXN{i}" if field == "txn_id" else f"ACC{i % 3}" if field == "acc_no" else i
+                for field in DATASET_FIELDS} for i in range(count)]
+    return [dataset_row(record) for record in records]
+
+
+def test_encrypt_decrypt_round_trip():
+    key = Fernet.generate_key()
+    rows = _rows(11)
+    with CryptoPipeline(key, processes=2, chunk_size=3) as pipeline:
+        encrypted = [row for chunk in pipeline.encrypt_chunks(rows) for row in chunk]
+        assert all(row[0] != plain[0] for row, plain in zip(encrypted, rows))
+        decrypted = [row for chunk in pipeline.decrypt_chunks(encrypted) for row in chunk]
+    assert [row[:ENCRYPTED_COLUMNS] for row in decrypted] == [tuple(map(str, row[:ENCRYPTED_COLUMNS])) for row in rows]
+    assert [row[ENCRYPTED_COLUMNS:] for row in decrypted] == [row[ENCRYPTED_COLUMNS:] for row in rows]
+
+
+def test_key_rotation_round_trip():
+    old_key, new_key = Fernet.generate_key(), Fernet.generate_key()
+    rows = _rows(5)
+    with CryptoPipeline(old_key, processes=1) as pipeline:
+        encrypted = [row for chunk in pipeline.encrypt_chunks(rows) for row in chunk]
+    with CryptoPipeline(old_key, new_key=new_key, processes=1) as pipeline:
+        rotated = [row for chunk in pipeline.reencrypt_chunks(encrypted) for row in chunk]
+    cipher = Fernet(new_key)
+    assert [cipher.decrypt(row[0].encode()).decode() for row in rotated] == [row[0] for row in rows]
+
+
+def test_whitespace_is_normalized_for_ciphertext_and_blind_index():
+    """A padded value encrypts, indexes and looks up the same as its trimmed form"""
+    key = Fernet.generate_key()
+    row = dataset_row({**dict.fromkeys(DATASET_FIELDS, 1), "txn_id": " TXN1 ", "acc_no": "ACC1\t"})
+    with CryptoPipeline(key, blind_key=BLIND_KEY, processes=1) as pipeline:
+        encrypted = [r for chunk in pipeline.encrypt_chunks([row]) for r in chunk][0]
+    assert len(encrypted) == len(LOG_COLUMNS)
+    assert Fernet(key).decrypt(encrypted[0].encode()).decode() == "TXN1"
+    assert encrypted[-2] == blind_index("TXN1", BLIND_KEY) == blind_index(" TXN1", BLIND_KEY)
+
+    class Cursor:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            pass
+
+        def execute(self, sql, params):
+            self.column = LOG_COLUMNS.index(sql.rsplit("WHERE ", 1)[1].split(" ")[0])
+            self.value = params[0]
+
+        def fetchall(self):
+            return [encrypted[:len(DATA_COLUMNS)]] if encrypted[self.column] == self.value else []
+
+    class Connection:
+        def cursor(self):
+            return Cursor()
+
+    assert [m["txn_id"] for m in find_by_txn_id(Connection(), "TXN1 ", key, BLIND_KEY)] == ["TXN1"]
+    assert [m["acc_no"] for m in find_by_acc_no(Connection(), " ACC1", key, BLIND_KEY)] == ["ACC1"]
+    assert find_by_txn_id(Connection(), "TXN2", key, BLIND_KEY) == []
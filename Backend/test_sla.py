@@ -0,0 +1,99 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("mysql.connector")
+from SLA.sla_full import SLAAgent, sla_results_frame
+
+DETECTED = datetime(2024, 1, 1, 10, 0, 0)
+ALERT_TYPES = ["latency_spike", "gateway_error", "timeout", "validation_error", "insufficient_funds", "unknown"]
+# Durations on and around every threshold
+DURATIONS = [0, 30, 31, 60, 61, 120, 121, 300, 301, 600, 601, 900, 1800, 1801, 7200]
+
+
+def _cases():
+    return [(alert_type, seconds) for alert_type in ALERT_TYPES for seconds in DURATIONS]
+
+
+def test_batch_matches_scalar_sla_compliance():
+    agent = SLAAgent()
+    cases = _cases()
+    detected = [DETECTED] * len(cases)
+    completed = [DETECTED + timedelta(seconds=seconds) for _, seconds in cases]
+    alert_types = [alert_type for alert_type, _ in cases]
+
+    batch = agent.calculate_sla_compliance_batch(detected, completed, alert_types)
+    for i, (alert_type, seconds) in enumerate(cases):
+        scalar = agent.calculate_sla_compliance(detected[i], completed[i], alert_type)
+        row = batch.iloc[i]
+        assert row["sla_level"] == scalar["sla_level"], (alert_type, seconds)
+        assert bool(row["breached"]) == scalar["breached"]
+        assert row["duration_seconds"] == scalar["duration_seconds"]
+        assert row["thresholds"] == scalar["thresholds"]
+        assert row["alert_type"] == alert_type
+
+
+def test_batch_keeps_positions_of_indexed_series():
+    """Inputs carrying their own non-default index are matched by position, not realigned"""
+    agent = SLAAgent()
+    index = [7, 3, 11]
+    detected = pd.Series([DETECTED] * 3, index=index)
+    completed = pd.Series([DETECTED + timedelta(seconds=s) for s in (10, 400, 5000)], index=index)
+    alert_types = pd.Series(["latency_spike", "timeout", "gateway_error"], index=[0, 1, 2])
+
+    batch = agent.calculate_sla_compliance_batch(detected, completed, alert_types)
+    assert list(batch.index) == index
+    assert list(batch["alert_type"]) == ["latency_spike", "timeout", "gateway_error"]
+    assert list(batch["sla_level"]) == ["met", "critical_breach", "critical_breach"]
+
+    users = agent.calculate_users_affected_batch(pd.Series(["timeout", "gateway_error"], index=[5, 9]),
+                                                 pd.Series(["us-east", "mars"], index=[1, 2]))
+    assert users.tolist() == [agent.calculate_users_affected("timeout", "us-east"),
+                              agent.calculate_users_affected("gateway_error", "mars")]
+
+
+def test_batch_marks_unparseable_timestamps_unknown():
+    agent = SLAAgent()
+    batch = agent.calculate_sla_compliance_batch(["not a date", DETECTED], [DETECTED, DETECTED], ["timeout"] * 2)
+    assert list(batch["sla_level"]) == ["unknown", "met"]
+    assert list(batch["breached"]) == [True, False]
+    assert batch["thresholds"].iloc[0] == {}
+
+
+def test_users_affected_batch_matches_scalar():
+    agent = SLAAgent()
+    alert_types = ALERT_TYPES * 6
+    regions = [region for region in list(agent.region_multipliers) + ["nowhere"] for _ in ALERT_TYPES]
+    batch = agent.calculate_users_affected_batch(alert_types, regions)
+    assert isinstance(batch, np.ndarray)
+    assert batch.tolist() == [agent.calculate_users_affected(a, r) for a, r in zip(alert_types, regions)]
+
+
+def test_results_frame_fills_in_missing_compliance():
+    """Anomalies carrying only a metric get its alert type and are evaluated against now"""
+    frame = sla_results_frame([
+        {"timestamp": datetime.now() - timedelta(hours=2), "service": "api", "metric": "latency_ms"},
+        {"timestamp": datetime.now(), "service": "db", "metric": "cpu"},
+    ])
+    assert list(frame["alert_type"]) == ["latency_spike", "gateway_error"]
+    assert list(frame["breached"]) == [True, False]
+    assert frame["duration_seconds"].iloc[0] >= 7200
+
+
+def test_pipeline_sla_stage_skips_failed_rca_results():
+    from RCA.pipeline import sla_stage
+
+    failed = pd.DataFrame([{"txn_id": "T1", "service": "api", "metric": "latency_ms", "timestamp": DETECTED,
+                            "status": "failed", "error": "boom"}])
+    assert sla_stage({"rca": failed}).empty
+    assert sla_stage({"rca": pd.DataFrame()}).empty
+
+    mixed = pd.concat([failed, pd.DataFrame([{"txn_id": "T2", "service": "db", "metric": "error_rate",
+                                              "timestamp": DETECTED, "status": "ok", "rca_summary": "pool exhausted",
+                                              "rca_confidence": 0.8}])])
+    sla = sla_stage({"rca": mixed})
+    assert list(sla["txn_id"]) == ["T2"]
+    assert list(sla["alert_type"]) == ["gateway_error"]
+    assert sla["rca_confidence"].tolist() == [0.8]
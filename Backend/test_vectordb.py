@@ -0,0 +1,107 @@
+import numpy as np
+
+from vectordb.flat_store import FlatVectorStore
+from vectordb.snapshot import export_snapshot, import_snapshot, load_snapshot, snapshot_header
+
+
+def _store(tmp_path, name="failure_patterns"):
+    return FlatVectorStore(str(tmp_path), name=name)
+
+
+def test_flat_store_query_and_where(tmp_path):
+    """Exact search returns the nearest live rows, restricted by the where filter"""
+    store = _store(tmp_path)
+    store.add(
+        ids=["a", "b", "c"],
+        embeddings=[[1, 0, 0], [0, 1, 0], [0.9, 0.1, 0]],
+        documents=["dns", "cpu", "dns again"],
+        metadatas=[{"service": "api"}, {"service": "db"}, {"service": "db"}],
+    )
+    result = store.query(query_embeddings=[[1, 0, 0]], n_results=2)
+    assert result["ids"][0] == ["a", "c"]
+    result = store.query(query_embeddings=[[1, 0, 0]], n_results=2, where={"service": "db"})
+    assert result["ids"][0] == ["c", "b"]
+
+
+def _records(store):
+    with open(store._records_path) as f:
+        return sum(1 for line in f if line.strip())
+
+
+def test_compact_reclaims_records_superseded_by_upsert(tmp_path):
+    """Upserts of existing ids leave superseded records that compact() must drop"""
+    store = _store(tmp_path)
+    store.add(ids=["a", "b"], embeddings=[[1, 0], [0, 1]], documents=["one", "two"])
+    assert store.compact() == 0
+
+    store.upsert(ids=["a"], embeddings=[[1, 1]], documents=["one v2"])
+    store.upsert(ids=["a"], embeddings=[[1, 2]], documents=["one v3"])
+    assert _records(store) == 4
+    assert store.compact() == 2
+    assert _records(store) == 2
+    assert store.get(ids=["a"])["documents"] == ["one v3"]
+
+    reopened = _store(tmp_path)
+    assert reopened.count() == 2
+    assert reopened.compact() == 0
+
+
+def test_compact_reclaims_deleted_rows(tmp_path):
+    store = _store(tmp_path)
+    store.add(ids=["a", "b", "c"], embeddings=np.eye(3).tolist(), documents=["x", "y", "z"])
+    store.delete(ids=["b"])
+    store.compact()
+    assert store.count() == 2
+    assert _records(store) == 2
+    assert sorted(store.get()["ids"]) == ["a", "c"]
+
+
+def test_snapshot_round_trip(tmp_path):
+    """Strings of any length, unicode and typed metadata survive export and import"""
+    source = _store(tmp_path / "source")
+    documents = ["short", "ünïcødé – 障害", "x" * 5000]
+    metadatas = [{"service": "api", "count": 3}, {"flag": True}, None]
+    source.add(ids=["a", "b", "c"], embeddings=np.eye(3).tolist(), documents=documents, metadatas=metadatas)
+
+    path = str(tmp_path / "snapshot.npz")
+    assert export_snapshot(source, path) == 3
+    assert snapshot_header(path)["count"] == 3
+
+    ids, loaded_documents, embeddings, loaded_metadatas = load_snapshot(path)
+    assert ids == ["a", "b", "c"]
+    assert loaded_documents == documents
+    assert loaded_metadatas == metadatas
+    np.testing.assert_allclose(embeddings, np.eye(3), atol=1e-6)
+
+    target = _store(tmp_path / "target")
+    assert import_snapshot(target, path) == 3
+    assert target.get(ids=["b"])["documents"] == [documents[1]]
+
+
+def test_snapshot_of_empty_store(tmp_path):
+    path = str(tmp_path / "empty.npz")
+    assert export_snapshot(_store(tmp_path / "empty"), path) == 0
+    ids, documents, embeddings, metadatas = load_snapshot(path)
+    assert ids == [] and documents == [] and metadatas == []
+    assert embeddings.shape[0] == 0
+
+
+def test_collapse_keeps_patterns_of_other_metrics(tmp_path):
+    """Patterns are merged only within their (service, metric) key, other types within their service"""
+    from vectordb.maintenance import collapse_near_duplicates
+
+    store = _store(tmp_path)
+    store.add(
+        ids=["pattern_api_cpu", "pattern_api_latency_ms", "log_1", "log_2"],
+        embeddings=[[1, 0], [1, 0.01], [0, 1], [0.01, 1]],
+        documents=["cpu spike", "latency spike", "api cpu anomaly", "api cpu anomaly again"],
+        metadatas=[
+            {"type": "pattern", "service": "api", "metric": "cpu", "created_at": 1, "count": 2},
+            {"type": "pattern", "service": "api", "metric": "latency_ms", "created_at": 2},
+            {"type": "failure_log", "service": "api", "created_at": 1},
+            {"type": "failure_log", "service": "api", "created_at": 2},
+        ],
+    )
+    assert collapse_near_duplicates(store, threshold=0.95) == 1
+    assert sorted(store.get()["ids"]) == ["log_2", "pattern_api_cpu", "pattern_api_latency_ms"]
+    assert store.get(ids=["log_2"])["metadatas"][0]["count"] == 2
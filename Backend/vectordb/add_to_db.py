@@ -1,15 +1,18 @@
 # vector_db/add_to_db.py
 
-from vectordb.chroma_client import get_chroma_collection 
+import time
+from vectordb.store import get_vector_store
 
 def add_failure_summary(doc_text, txn_id, service, error_code):
-    collection = get_chroma_collection()
+    collection = get_vector_store()
 
     doc_id = f"log_{txn_id[:8]}"
     metadata = {
         "txn_id": txn_id,
         "service": service,
-        "error_code": error_code
+        "error_code": error_code,
+        "type": "failure_log",
+        "created_at": int(time.time())
     }
 
     collection.add(
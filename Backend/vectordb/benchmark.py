@@ -0,0 +1,129 @@
+# vectordb/benchmark.py
+#
+# Compare query latency and load time of the vector store backends on random
+# embeddings, e.g. from the Backend directory:
+#   python -m vectordb.benchmark --vectors 1000000 --queries 200
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from vectordb.flat_store import FlatVectorStore
+
+DIM = 384  # all-MiniLM-L6-v2
+BATCH_SIZE = 20000
+
+
+def random_vectors(n, dim, seed):
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((n, dim), dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def batches(n, size):
+    for start in range(0, n, size):
+        yield start, min(start + size, n)
+
+
+def metadata_for(i):
+    return {"type": "pattern", "service": f"svc_{i % 5}", "metric": "latency_ms"}
+
+
+def time_queries(collection, queries, k):
+    latencies = []
+    for q in queries:
+        start = time.perf_counter()
+        collection.query(query_embeddings=[q.tolist()], n_results=k)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return np.percentile(latencies, 50), np.percentile(latencies, 95)
+
+
+def bench_flat(root, vectors, queries, k, index):
+    path = os.path.join(root, f"flat_{index}")
+    store = FlatVectorStore(path, "bench", index=index)
+    start = time.perf_counter()
+    for lo, hi in batches(len(vectors), BATCH_SIZE):
+        store.add(
+            ids=[f"id_{i}" for i in range(lo, hi)],
+            embeddings=vectors[lo:hi],
+            metadatas=[metadata_for(i) for i in range(lo, hi)],
+            documents=[f"doc {i}" for i in range(lo, hi)],
+        )
+    store.close()
+    ingest_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    store = FlatVectorStore(path, "bench", index=index)
+    store.query(query_embeddings=[queries[0].tolist()], n_results=k)
+    load_s = time.perf_counter() - start
+    p50, p95 = time_queries(store, queries, k)
+    return ingest_s, load_s, p50, p95
+
+
+def bench_chroma(root, vectors, queries, k):
+    import chromadb
+    from chromadb.config import Settings
+
+    path = os.path.join(root, "chroma")
+    settings = Settings(anonymized_telemetry=False)
+    client = chromadb.PersistentClient(path=path, settings=settings)
+    collection = client.get_or_create_collection("bench", metadata={"hnsw:space": "cosine"})
+    batch_size = min(BATCH_SIZE, client.max_batch_size)
+    start = time.perf_counter()
+    for lo, hi in batches(len(vectors), batch_size):
+        collection.add(
+            ids=[f"id_{i}" for i in range(lo, hi)],
+            embeddings=vectors[lo:hi].tolist(),
+            metadatas=[metadata_for(i) for i in range(lo, hi)],
+            documents=[f"doc {i}" for i in range(lo, hi)],
+        )
+    ingest_s = time.perf_counter() - start
+    del collection, client
+
+    # Chroma loads its HNSW segment lazily, so include the first query in load time
+    start = time.perf_counter()
+    client = chromadb.PersistentClient(path=path, settings=settings)
+    collection = client.get_collection("bench")
+    collection.query(query_embeddings=[queries[0].tolist()], n_results=k)
+    load_s = time.perf_counter() - start
+    p50, p95 = time_queries(collection, queries, k)
+    return ingest_s, load_s, p50, p95
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark vector store backends")
+    parser.add_argument("--vectors", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--backends", default="flat,hnsw,chroma")
+    parser.add_argument("--dir", default=None, help="Working directory (defaults to a temp dir)")
+    args = parser.parse_args()
+
+    root = args.dir or tempfile.mkdtemp(prefix="vector_bench_")
+    vectors = random_vectors(args.vectors, DIM, seed=0)
+    queries = random_vectors(args.queries, DIM, seed=1)
+    print(f"Benchmarking {args.vectors} vectors x {DIM} dims, {args.queries} queries, k={args.k}")
+    print(f"{'backend':<8} {'ingest_s':>10} {'load_s':>10} {'p50_ms':>10} {'p95_ms':>10}")
+
+    try:
+        for backend in args.backends.split(","):
+            if backend == "chroma":
+                try:
+                    row = bench_chroma(root, vectors, queries, args.k)
+                except ImportError:
+                    print("chroma   skipped (chromadb not installed)")
+                    continue
+            else:
+                row = bench_flat(root, vectors, queries, args.k, index=backend)
+            print(f"{backend:<8} {row[0]:>10.2f} {row[1]:>10.2f} {row[2]:>10.2f} {row[3]:>10.2f}")
+    finally:
+        if args.dir is None:
+            shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,18 @@
 import chromadb
 from chromadb.config import Settings
+from vectordb.config import CHROMA_COLLECTION_METADATA, CHROMA_STORE_PATH, VECTOR_COLLECTION
 
 # Disable telemetry here
 settings = Settings(anonymized_telemetry=False)
 
-client = chromadb.PersistentClient(path="./backend/vector_db/vector_store", settings=settings)
-collection = client.get_or_create_collection("failure_patterns")
+client = chromadb.PersistentClient(path=CHROMA_STORE_PATH, settings=settings)
+collection = client.get_or_create_collection(VECTOR_COLLECTION, metadata=CHROMA_COLLECTION_METADATA)
+# The metadata only applies when the collection is created; one made before
+# keeps its distance function, so migrate it by exporting a snapshot and
+# importing it with --chroma-path pointing at a fresh directory
+if (collection.metadata or {}).get("hnsw:space", "l2") != "cosine":
+    print(f"Collection '{VECTOR_COLLECTION}' uses L2 distances - export and re-import it "
+          "into a new store with vectordb/snapshot.py to get cosine similarities.")
 
 def get_chroma_collection():
     return collection
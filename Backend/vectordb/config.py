@@ -0,0 +1,38 @@
+# vectordb/config.py
+
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Resolve store paths against the Backend directory instead of the cwd, so the
+# API, the agents and one-off scripts all open the same store.
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# "chroma" (chromadb PersistentClient) or "flat" (in-process NumPy store)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma").lower()
+VECTOR_COLLECTION = os.getenv("VECTOR_COLLECTION", "failure_patterns")
+# Chroma defaults to squared L2; callers treat distances as cosine distances
+# (similarity = 1 - distance), as the flat store returns them
+CHROMA_COLLECTION_METADATA = {"hnsw:space": "cosine"}
+
+CHROMA_STORE_PATH = os.getenv(
+    "CHROMA_STORE_PATH", os.path.join(BACKEND_DIR, "backend", "vector_db", "vector_store")
+)
+FLAT_STORE_PATH = os.getenv(
+    "FLAT_STORE_PATH", os.path.join(BACKEND_DIR, "backend", "vector_db", "flat_store")
+)
+
+# Flat store only: "flat" for exact top-k, "hnsw" to add an approximate index (needs hnswlib)
+FLAT_STORE_INDEX = os.getenv("FLAT_STORE_INDEX", "flat").lower()
+
+# Retention: documents older than their type's TTL are evicted by vectordb/maintenance.py
+VECTOR_TTL_DAYS = {
+    "failure_log": float(os.getenv("VECTOR_TTL_DAYS_FAILURE_LOG", 7)),
+    "pattern": float(os.getenv("VECTOR_TTL_DAYS_PATTERN", 30)),
+    "rca_summary": float(os.getenv("VECTOR_TTL_DAYS_RCA_SUMMARY", 90)),
+}
+# Cosine similarity above which documents of the same type and service are merged
+VECTOR_DEDUP_THRESHOLD = float(os.getenv("VECTOR_DEDUP_THRESHOLD", 0.95))
+# Seconds between background maintenance runs; 0 disables the job
+VECTOR_MAINTENANCE_INTERVAL_S = int(os.getenv("VECTOR_MAINTENANCE_INTERVAL_S", 0))
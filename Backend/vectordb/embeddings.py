@@ -0,0 +1,19 @@
+# vectordb/embeddings.py
+
+# Same model Chroma's default embedding function uses, so documents added
+# without explicit embeddings land in the same space on either backend.
+MODEL_NAME = "all-MiniLM-L6-v2"
+
+_model = None
+
+
+def get_embedding_model():
+    global _model
+    if _model is None:
+        from sentence_transformers import SentenceTransformer
+        _model = SentenceTransformer(MODEL_NAME)
+    return _model
+
+
+def embed_texts(texts):
+    return get_embedding_model().encode(list(texts)).tolist()
@@ -0,0 +1,500 @@
+# vectordb/flat_store.py
+
+import atexit
+import json
+import os
+import threading
+
+import numpy as np
+
+from vectordb.embeddings import embed_texts
+
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+INITIAL_CAPACITY = 1024
+
+_COMPARATORS = {
+    "$gt": lambda a, b: a > b,
+    "$gte": lambda a, b: a >= b,
+    "$lt": lambda a, b: a < b,
+    "$lte": lambda a, b: a <= b,
+}
+
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _empty_query_result(n_queries):
+    return {
+        "ids": [[] for _ in range(n_queries)],
+        "documents": [[] for _ in range(n_queries)],
+        "metadatas": [[] for _ in range(n_queries)],
+        "distances": [[] for _ in range(n_queries)],
+        "embeddings": None,
+    }
+
+
+class FlatVectorStore:
+    """
+    In-process vector store exposing the parts of the Chroma collection API the
+    agents use (add, upsert, query, get, update, delete, count).
+
+    Files under <path>/<name>/:
+      manifest.json  - embedding dimension
+      vectors.f32    - memory-mapped float32 matrix, one L2-normalised row per record
+      records.jsonl  - append-only log of ids, documents and metadata per row
+      hnsw.bin       - optional approximate index, rebuilt from vectors.f32 when stale
+
+    Distances are cosine distances (1 - cosine similarity). Queries accept
+    Chroma-style `where` filters; equality and $in clauses are answered from
+    per-key partitions (metadata value -> rows), so only the matching slice of
+    the matrix is scored.
+    """
+
+    def __init__(self, path, name="failure_patterns", index="flat"):
+        self.name = name
+        self.dir = os.path.join(path, name)
+        os.makedirs(self.dir, exist_ok=True)
+        self._manifest_path = os.path.join(self.dir, "manifest.json")
+        self._vectors_path = os.path.join(self.dir, "vectors.f32")
+        self._records_path = os.path.join(self.dir, "records.jsonl")
+        self._hnsw_path = os.path.join(self.dir, "hnsw.bin")
+        self._hnsw_meta_path = os.path.join(self.dir, "hnsw.json")
+        self._lock = threading.RLock()
+
+        self.use_hnsw = index == "hnsw"
+        if self.use_hnsw and hnswlib is None:
+            print("hnswlib is not installed - falling back to exact search.")
+            self.use_hnsw = False
+
+        self._load()
+        atexit.register(self.close)
+
+    # --- persistence -------------------------------------------------------
+
+    def _load(self):
+        self.dim = None
+        self._capacity = 0
+        self._vectors = None
+        self._alive = np.zeros(0, dtype=bool)
+        self._ids = []
+        self._documents = []
+        self._metadatas = []
+        self._row_of = {}
+        self._partitions = {}
+        self._hnsw = None
+        self._log_records = 0  # lines in records.jsonl, live or superseded
+        if os.path.exists(self._manifest_path):
+            with open(self._manifest_path) as f:
+                self.dim = json.load(f)["dim"]
+        if self.dim and os.path.exists(self._vectors_path):
+            capacity = os.path.getsize(self._vectors_path) // (self.dim * 4)
+            self._map_vectors(capacity)
+        if os.path.exists(self._records_path):
+            with open(self._records_path) as f:
+                for line in f:
+                    if line.strip():
+                        self._apply_record(json.loads(line))
+        if self.use_hnsw and self.dim:
+            self._open_hnsw()
+
+    def _write_manifest(self):
+        with open(self._manifest_path, "w") as f:
+            json.dump({"dim": self.dim, "metric": "cosine"}, f)
+
+    def _map_vectors(self, capacity):
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._vectors = None
+        with open(self._vectors_path, "ab") as f:
+            f.truncate(capacity * self.dim * 4)
+        self._capacity = capacity
+        self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:len(self._alive)] = self._alive[:capacity]
+        self._alive = alive
+
+    def _reserve(self, rows):
+        if rows <= self._capacity:
+            return
+        self._map_vectors(max(rows, self._capacity * 2, INITIAL_CAPACITY))
+        if self._hnsw is not None:
+            self._hnsw.resize_index(self._capacity)
+
+    def _append_records(self, records):
+        with open(self._records_path, "a") as f:
+            f.write("".join(json.dumps(r, default=str) + "\n" for r in records))
+
+    def _apply_record(self, record):
+        self._log_records += 1
+        op = record["op"]
+        if op == "add":
+            row = record["row"]
+            if row == len(self._ids):
+                self._ids.append(record["id"])
+                self._documents.append(record.get("document"))
+                self._metadatas.append(record.get("metadata"))
+            else:
+                self._unindex(row)
+                self._ids[row] = record["id"]
+                self._documents[row] = record.get("document")
+                self._metadatas[row] = record.get("metadata")
+            self._index(row)
+            self._alive[row] = True
+            self._row_of[record["id"]] = row
+        elif op == "update":
+            row = self._row_of[record["id"]]
+            self._unindex(row)
+            self._documents[row] = record.get("document")
+            self._metadatas[row] = record.get("metadata")
+            self._index(row)
+        elif op == "delete":
+            row = self._row_of.pop(record["id"], None)
+            if row is not None:
+                self._alive[row] = False
+
+    # --- metadata partitions -----------------------------------------------
+
+    def _partition(self, key):
+        """Rows grouped by metadata value for `key`, built on first use and kept current by writes."""
+        groups = self._partitions.get(key)
+        if groups is None:
+            groups = {}
+            for row, metadata in enumerate(self._metadatas):
+                value = (metadata or {}).get(key)
+                if value is not None:
+                    groups.setdefault(value, set()).add(row)
+            self._partitions[key] = groups
+        return groups
+
+    def _index(self, row):
+        metadata = self._metadatas[row] or {}
+        for key, groups in self._partitions.items():
+            value = metadata.get(key)
+            if value is not None:
+                groups.setdefault(value, set()).add(row)
+
+    def _unindex(self, row):
+        metadata = self._metadatas[row] or {}
+        for key, groups in self._partitions.items():
+            rows = groups.get(metadata.get(key))
+            if rows is not None:
+                rows.discard(row)
+
+    def _rows_with(self, key, values):
+        groups = self._partition(key)
+        mask = np.zeros(len(self._ids), dtype=bool)
+        for value in values:
+            rows = groups.get(value)
+            if rows:
+                mask[np.fromiter(rows, dtype=np.int64, count=len(rows))] = True
+        return mask
+
+    def _where_mask(self, where):
+        count = len(self._ids)
+        mask = np.ones(count, dtype=bool)
+        for key, condition in where.items():
+            if key == "$and":
+                for clause in condition:
+                    mask &= self._where_mask(clause)
+                continue
+            if key == "$or":
+                any_mask = np.zeros(count, dtype=bool)
+                for clause in condition:
+                    any_mask |= self._where_mask(clause)
+                mask &= any_mask
+                continue
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            for op, operand in condition.items():
+                if op == "$eq":
+                    mask &= self._rows_with(key, [operand])
+                elif op == "$in":
+                    mask &= self._rows_with(key, operand)
+                elif op == "$ne":
+                    mask &= ~self._rows_with(key, [operand])
+                elif op == "$nin":
+                    mask &= ~self._rows_with(key, operand)
+                elif op in _COMPARATORS:
+                    compare = _COMPARATORS[op]
+                    values = [(m or {}).get(key) for m in self._metadatas]
+                    mask &= np.fromiter(
+                        (isinstance(v, (int, float)) and compare(v, operand) for v in values),
+                        dtype=bool, count=count,
+                    )
+                else:
+                    raise ValueError(f"Unsupported where operator: {op}")
+        return mask
+
+    def _filtered_rows(self, where):
+        if not where:
+            return self._live_rows()
+        count = len(self._ids)
+        return np.flatnonzero(self._where_mask(where) & self._alive[:count])
+
+    def _log_size(self):
+        return os.path.getsize(self._records_path) if os.path.exists(self._records_path) else 0
+
+    def _open_hnsw(self):
+        self._hnsw = hnswlib.Index(space="cosine", dim=self.dim)
+        if os.path.exists(self._hnsw_path) and os.path.exists(self._hnsw_meta_path):
+            with open(self._hnsw_meta_path) as f:
+                meta = json.load(f)
+            if meta.get("log_size") == self._log_size():
+                self._hnsw.load_index(self._hnsw_path, max_elements=max(self._capacity, 1))
+                self._hnsw.set_ef(64)
+                return
+        print(f"Building HNSW index for {self.name} ({len(self._ids)} rows)...")
+        self._hnsw.init_index(max_elements=max(self._capacity, INITIAL_CAPACITY), ef_construction=200, M=16)
+        self._hnsw.set_ef(64)
+        count = len(self._ids)
+        if count:
+            self._hnsw.add_items(self._vectors[:count], np.arange(count))
+            for row in np.flatnonzero(~self._alive[:count]):
+                self._hnsw.mark_deleted(int(row))
+
+    def save_index(self):
+        with self._lock:
+            if self._hnsw is None:
+                return
+            self._hnsw.save_index(self._hnsw_path)
+            with open(self._hnsw_meta_path, "w") as f:
+                json.dump({"log_size": self._log_size()}, f)
+
+    def compact(self):
+        """
+        Rewrite vectors.f32 and records.jsonl with only the live rows, dropping
+        deleted rows and superseded log entries (upserts and updates of an
+        existing id). Returns the number of log records reclaimed.
+        """
+        with self._lock:
+            if self.dim is None or self._log_records <= len(self._row_of):
+                return 0
+            rows = np.flatnonzero(self._alive[:len(self._ids)])
+            reclaimed = self._log_records - len(rows)
+
+            tmp_vectors = self._vectors_path + ".tmp"
+            capacity = max(len(rows), INITIAL_CAPACITY)
+            compacted = np.memmap(tmp_vectors, dtype=np.float32, mode="w+", shape=(capacity, self.dim))
+            for start in range(0, len(rows), 65536):
+                chunk = rows[start:start + 65536]
+                compacted[start:start + len(chunk)] = self._vectors[chunk]
+            compacted.flush()
+            del compacted
+
+            tmp_records = self._records_path + ".tmp"
+            with open(tmp_records, "w") as f:
+                for new_row, row in enumerate(rows.tolist()):
+                    record = {
+                        "op": "add", "row": new_row, "id": self._ids[row],
+                        "document": self._documents[row], "metadata": self._metadatas[row],
+                    }
+                    f.write(json.dumps(record, default=str) + "\n")
+
+            self._vectors.flush()
+            self._vectors = None
+            os.replace(tmp_vectors, self._vectors_path)
+            os.replace(tmp_records, self._records_path)
+            for path in (self._hnsw_path, self._hnsw_meta_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            self._load()
+            self.save_index()
+            print(f"Compacted {self.name}: reclaimed {reclaimed} records, {len(rows)} live.")
+            return reclaimed
+
+    def close(self):
+        with self._lock:
+            if not os.path.isdir(self.dir):
+                return
+            if self._vectors is not None:
+                self._vectors.flush()
+            self.save_index()
+
+    # --- writes ------------------------------------------------------------
+
+    def add(self, ids, embeddings=None, metadatas=None, documents=None):
+        self._write(ids, embeddings, metadatas, documents, overwrite=False)
+
+    def upsert(self, ids, embeddings=None, metadatas=None, documents=None):
+        self._write(ids, embeddings, metadatas, documents, overwrite=True)
+
+    def _write(self, ids, embeddings, metadatas, documents, overwrite):
+        ids = list(ids)
+        n = len(ids)
+        if n == 0:
+            return
+        documents = list(documents) if documents is not None else [None] * n
+        metadatas = list(metadatas) if metadatas is not None else [None] * n
+        if embeddings is None:
+            embeddings = embed_texts(documents)
+        vectors = _normalize(np.asarray(embeddings, dtype=np.float32).reshape(n, -1))
+
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                self._write_manifest()
+                if self.use_hnsw:
+                    self._reserve(INITIAL_CAPACITY)
+                    self._open_hnsw()
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match store dimension {self.dim}")
+
+            rows, keep, pending = [], [], {}
+            next_row = len(self._ids)
+            for i, doc_id in enumerate(ids):
+                row = self._row_of.get(doc_id, pending.get(doc_id))
+                if row is not None and not overwrite:
+                    print(f"Skipping existing id in {self.name}: {doc_id}")
+                    continue
+                if row is None:
+                    row = next_row
+                    next_row += 1
+                    pending[doc_id] = row
+                rows.append(row)
+                keep.append(i)
+            if not rows:
+                return
+
+            self._reserve(next_row)
+            rows = np.asarray(rows)
+            vectors = vectors[keep]
+            self._vectors[rows] = vectors
+            self._vectors.flush()
+
+            records = [
+                {"op": "add", "row": int(row), "id": ids[i], "document": documents[i], "metadata": metadatas[i]}
+                for row, i in zip(rows, keep)
+            ]
+            self._append_records(records)
+            for record in records:
+                self._apply_record(record)
+            if self._hnsw is not None:
+                self._hnsw.add_items(vectors, rows)
+
+    def update(self, ids, embeddings=None, metadatas=None, documents=None):
+        ids = list(ids)
+        with self._lock:
+            records = []
+            for i, doc_id in enumerate(ids):
+                row = self._row_of.get(doc_id)
+                if row is None:
+                    print(f"Cannot update missing id in {self.name}: {doc_id}")
+                    continue
+                metadata = self._metadatas[row]
+                if metadatas is not None and metadatas[i] is not None:
+                    metadata = {**(metadata or {}), **metadatas[i]}
+                document = documents[i] if documents is not None else self._documents[row]
+                records.append({"op": "update", "id": doc_id, "document": document, "metadata": metadata})
+                if embeddings is not None:
+                    vector = _normalize(np.asarray([embeddings[i]], dtype=np.float32))
+                    self._vectors[row] = vector[0]
+                    if self._hnsw is not None:
+                        self._hnsw.add_items(vector, [row])
+            if not records:
+                return
+            self._vectors.flush()
+            self._append_records(records)
+            for record in records:
+                self._apply_record(record)
+
+    def delete(self, ids=None, where=None):
+        with self._lock:
+            if where:
+                ids = [self._ids[r] for r in self._filtered_rows(where) if ids is None or self._ids[r] in ids]
+            records = [{"op": "delete", "id": doc_id} for doc_id in (ids or []) if doc_id in self._row_of]
+            if not records:
+                return
+            rows = [self._row_of[r["id"]] for r in records]
+            self._append_records(records)
+            for record in records:
+                self._apply_record(record)
+            if self._hnsw is not None:
+                for row in rows:
+                    self._hnsw.mark_deleted(row)
+
+    # --- reads -------------------------------------------------------------
+
+    def count(self):
+        return len(self._row_of)
+
+    def _live_rows(self):
+        count = len(self._ids)
+        if len(self._row_of) == count:
+            return None
+        return np.flatnonzero(self._alive[:count])
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=("metadatas", "documents")):
+        with self._lock:
+            if ids is not None:
+                rows = [self._row_of[i] for i in ids if i in self._row_of]
+                if where:
+                    allowed = set(self._filtered_rows(where).tolist())
+                    rows = [r for r in rows if r in allowed]
+            else:
+                rows = self._filtered_rows(where)
+                rows = list(range(len(self._ids))) if rows is None else rows.tolist()
+            rows = rows[offset or 0:]
+            if limit is not None:
+                rows = rows[:limit]
+            return {
+                "ids": [self._ids[r] for r in rows],
+                "embeddings": self._vectors[rows].tolist() if "embeddings" in include and rows else
+                ([] if "embeddings" in include else None),
+                "documents": [self._documents[r] for r in rows] if "documents" in include else None,
+                "metadatas": [self._metadatas[r] for r in rows] if "metadatas" in include else None,
+            }
+
+    def query(self, query_embeddings=None, query_texts=None, n_results=10, where=None, include=None):
+        if query_embeddings is None:
+            query_embeddings = embed_texts(query_texts)
+        queries = _normalize(np.asarray(query_embeddings, dtype=np.float32).reshape(len(query_embeddings), -1))
+
+        with self._lock:
+            live = len(self._row_of)
+            if live == 0:
+                return _empty_query_result(len(queries))
+            if where:
+                # Score only the filtered partition; it is small enough that exact search beats HNSW
+                rows = self._filtered_rows(where)
+                if len(rows) == 0:
+                    return _empty_query_result(len(queries))
+                top_rows, top_dist = self._exact_top_k(queries, rows, min(n_results, len(rows)))
+            elif self._hnsw is not None:
+                k = min(n_results, live)
+                self._hnsw.set_ef(max(64, 2 * k))
+                top_rows, top_dist = self._hnsw.knn_query(queries, k=k)
+            else:
+                top_rows, top_dist = self._exact_top_k(queries, self._live_rows(), min(n_results, live))
+            return self._format_query(top_rows, top_dist)
+
+    def _exact_top_k(self, queries, rows, k):
+        matrix = self._vectors[:len(self._ids)] if rows is None else self._vectors[rows]
+        scores = matrix @ queries.T
+        top_rows, top_dist = [], []
+        for j in range(scores.shape[1]):
+            column = scores[:, j]
+            if k < len(column):
+                top = np.argpartition(-column, k - 1)[:k]
+            else:
+                top = np.arange(len(column))
+            top = top[np.argsort(-column[top])]
+            top_rows.append(top if rows is None else rows[top])
+            top_dist.append(1.0 - column[top])
+        return top_rows, top_dist
+
+    def _format_query(self, top_rows, top_dist):
+        result = {"ids": [], "documents": [], "metadatas": [], "distances": [], "embeddings": None}
+        for rows, dists in zip(top_rows, top_dist):
+            rows = [int(r) for r in rows]
+            result["ids"].append([self._ids[r] for r in rows])
+            result["documents"].append([self._documents[r] for r in rows])
+            result["metadatas"].append([self._metadatas[r] for r in rows])
+            result["distances"].append([float(d) for d in dists])
+        return result
@@ -0,0 +1,196 @@
+# vectordb/maintenance.py
+#
+# Keeps the vector store bounded: evicts documents past their type's TTL,
+# collapses near-duplicates into one representative with a count, then
+# compacts the store. Run once with `python -m vectordb.maintenance`, or let
+# main.py schedule it every VECTOR_MAINTENANCE_INTERVAL_S seconds.
+
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from vectordb.config import VECTOR_TTL_DAYS, VECTOR_DEDUP_THRESHOLD, VECTOR_MAINTENANCE_INTERVAL_S
+from vectordb.store import get_vector_store, store_lock
+
+DEDUP_TYPES = ["failure_log", "pattern", "rca_summary"]
+# Metadata a document must share with another to be merged into it. Patterns
+# are keyed by service and metric (RCA/pattern.py), so merging across metrics
+# would only see the other document written again on the next detection run
+DEDUP_GROUP_KEYS = {"pattern": ("service", "metric")}
+BLOCK_SIZE = 1024
+
+
+def document_time(metadata):
+    """Epoch seconds a document was written, falling back to its `timestamp` metadata."""
+    metadata = metadata or {}
+    if metadata.get("created_at") is not None:
+        return float(metadata["created_at"])
+    try:
+        return datetime.fromisoformat(str(metadata["timestamp"])).timestamp()
+    except (KeyError, ValueError):
+        return None
+
+
+def first_seen(metadata):
+    return (metadata or {}).get("first_seen") or document_time(metadata)
+
+
+def evict_expired(store, ttl_days=None, now=None):
+    ttl_days = ttl_days or VECTOR_TTL_DAYS
+    now = now or time.time()
+    evicted = 0
+    for doc_type, days in ttl_days.items():
+        if days <= 0:
+            continue
+        cutoff = now - days * 86400
+        with store_lock:
+            docs = store.get(where={"type": doc_type}, include=["metadatas"])
+            expired = [
+                doc_id for doc_id, metadata in zip(docs["ids"], docs["metadatas"])
+                if (document_time(metadata) or now) < cutoff
+            ]
+            if expired:
+                store.delete(ids=expired)
+        if expired:
+            evicted += len(expired)
+            print(f"Evicted {len(expired)} expired {doc_type} documents.")
+    return evicted
+
+
+def greedy_clusters(vectors, threshold):
+    """
+    Assign each row to the first earlier row (a representative) whose cosine
+    similarity is at least `threshold`. Rows are compared block by block
+    against the representatives found so far, so memory stays at
+    O(block x representatives) instead of O(n^2).
+    """
+    n = len(vectors)
+    assign = np.arange(n)
+    reps = []
+    rep_matrix = np.zeros((0, vectors.shape[1]), dtype=vectors.dtype)
+    for start in range(0, n, BLOCK_SIZE):
+        block = vectors[start:start + BLOCK_SIZE]
+        if reps:
+            sims = block @ rep_matrix.T
+            best = sims.argmax(axis=1)
+            best_sim = sims[np.arange(len(block)), best]
+        else:
+            best = np.zeros(len(block), dtype=int)
+            best_sim = np.full(len(block), -np.inf)
+        intra = block @ block.T
+        new_reps = []
+        for i in range(len(block)):
+            if best_sim[i] >= threshold:
+                assign[start + i] = reps[best[i]]
+                continue
+            if new_reps:
+                local = intra[i, new_reps]
+                j = int(local.argmax())
+                if local[j] >= threshold:
+                    assign[start + i] = start + new_reps[j]
+                    continue
+            new_reps.append(i)
+        if new_reps:
+            reps.extend(start + i for i in new_reps)
+            rep_matrix = np.vstack([rep_matrix, block[new_reps]])
+    return assign
+
+
+def _collapse_type(store, doc_type, threshold):
+    """Collapse one document type; returns (documents removed, representatives updated)."""
+    docs = store.get(where={"type": doc_type}, include=["embeddings", "metadatas"])
+    if len(docs["ids"]) < 2:
+        return 0, 0
+    keys = DEDUP_GROUP_KEYS.get(doc_type, ("service",))
+    groups = {}
+    for i, metadata in enumerate(docs["metadatas"]):
+        groups.setdefault(tuple((metadata or {}).get(key) for key in keys), []).append(i)
+
+    updates, removed = {}, []
+    for indices in groups.values():
+        if len(indices) < 2:
+            continue
+        # Newest first, so each cluster is represented by its most recent document
+        indices.sort(key=lambda i: document_time(docs["metadatas"][i]) or 0, reverse=True)
+        vectors = np.asarray([docs["embeddings"][i] for i in indices], dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        assign = greedy_clusters(vectors / norms, threshold)
+
+        for member, rep in enumerate(assign):
+            if member == rep:
+                continue
+            rep_meta = docs["metadatas"][indices[rep]]
+            member_meta = docs["metadatas"][indices[member]] or {}
+            meta = updates.setdefault(indices[rep], {
+                "count": int((rep_meta or {}).get("count", 1)),
+                "first_seen": first_seen(rep_meta),
+            })
+            meta["count"] += int(member_meta.get("count", 1))
+            seen = [t for t in (meta["first_seen"], first_seen(member_meta)) if t is not None]
+            meta["first_seen"] = min(seen) if seen else None
+            removed.append(docs["ids"][indices[member]])
+
+    # Chroma rejects None metadata values
+    updates = {i: {k: v for k, v in meta.items() if v is not None} for i, meta in updates.items()}
+    if updates:
+        store.update(ids=[docs["ids"][i] for i in updates], metadatas=list(updates.values()))
+    if removed:
+        store.delete(ids=removed)
+    return len(removed), len(updates)
+
+
+def collapse_near_duplicates(store, threshold=None):
+    """
+    Merge documents of the same type and service (and metric, for patterns) whose embeddings are within
+    `threshold` cosine similarity. The newest document is kept; its metadata
+    gets `count` (documents merged into it, including earlier merges) and `first_seen`.
+    """
+    threshold = threshold or VECTOR_DEDUP_THRESHOLD
+    merged = 0
+    for doc_type in DEDUP_TYPES:
+        # Writers wait until this type's updates and deletes are applied
+        with store_lock:
+            removed, kept = _collapse_type(store, doc_type, threshold)
+        if removed:
+            merged += removed
+            print(f"Collapsed {removed} near-duplicate {doc_type} documents into {kept}.")
+    return merged
+
+
+def run_maintenance(store=None):
+    store = store or get_vector_store()
+    started = time.perf_counter()
+    stats = {
+        "evicted": evict_expired(store),
+        "merged": collapse_near_duplicates(store),
+        "reclaimed": store.compact() if hasattr(store, "compact") else 0,
+        "remaining": store.count(),
+    }
+    stats["duration_s"] = round(time.perf_counter() - started, 3)
+    print(f"Vector store maintenance: {stats}")
+    return stats
+
+
+def start_maintenance_thread(interval_s=None):
+    interval_s = interval_s if interval_s is not None else VECTOR_MAINTENANCE_INTERVAL_S
+    if interval_s <= 0:
+        return None
+
+    def loop():
+        while True:
+            time.sleep(interval_s)
+            try:
+                run_maintenance()
+            except Exception as e:
+                print(f"Vector store maintenance failed: {e}")
+
+    thread = threading.Thread(target=loop, name="vector-maintenance", daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == "__main__":
+    run_maintenance()
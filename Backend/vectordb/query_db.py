@@ -1,12 +1,13 @@
 # vector_db/query_db.py
 
-from vectordb.chroma_client import get_chroma_collection
+from vectordb.store import get_vector_store
 
-def query_similar_logs(query_text, top_k=3):
-    collection = get_chroma_collection()
+def query_similar_logs(query_text, top_k=3, where=None):
+    collection = get_vector_store()
     results = collection.query(
         query_texts=[query_text],
-        n_results=top_k
+        n_results=top_k,
+        where=where
     )
 
     matches = []
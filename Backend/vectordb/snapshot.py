@@ -0,0 +1,178 @@
+# vectordb/snapshot.py
+#
+# Export the vector store to one compressed columnar .npz file, written chunk by
+# chunk, and bulk-load it elsewhere without re-embedding anything:
+#   python -m vectordb.snapshot export snapshots/failure_patterns.npz
+#   python -m vectordb.snapshot import snapshots/failure_patterns.npz
+# `--chroma-path` reads from / writes to a specific Chroma directory instead of
+# the configured store, e.g. to fold Backend/RCA/backend/vector_db into the main copy.
+
+import argparse
+import json
+import os
+import time
+import zipfile
+
+import numpy as np
+
+from vectordb.config import CHROMA_COLLECTION_METADATA, VECTOR_COLLECTION
+from vectordb.flat_store import FlatVectorStore
+from vectordb.store import get_vector_store
+
+SNAPSHOT_VERSION = 2
+PAGE_SIZE = 5000
+META_PREFIX = "meta:"
+
+
+def open_store(chroma_path=None):
+    if chroma_path is None:
+        return get_vector_store()
+    import chromadb
+    from chromadb.config import Settings
+    client = chromadb.PersistentClient(path=chroma_path, settings=Settings(anonymized_telemetry=False))
+    return client.get_or_create_collection(VECTOR_COLLECTION, metadata=CHROMA_COLLECTION_METADATA)
+
+
+def _write_array(archive, name, array):
+    with archive.open(name + ".npy", "w", force_zip64=True) as f:
+        np.lib.format.write_array(f, np.asanyarray(array), allow_pickle=False)
+
+
+def _write_strings(archive, name, values):
+    """
+    Store strings as int64 offsets plus one UTF-8 byte buffer, rather than a
+    fixed-width unicode array padded to the longest value.
+    """
+    encoded = [value.encode("utf-8") for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    _write_array(archive, name + ".offsets", offsets)
+    _write_array(archive, name + ".bytes", np.frombuffer(b"".join(encoded), dtype=np.uint8))
+
+
+def _read_strings(data, name):
+    offsets = data[name + ".offsets"].tolist()
+    buffer = data[name + ".bytes"].tobytes()
+    return [buffer[start:end].decode("utf-8") for start, end in zip(offsets[:-1], offsets[1:])]
+
+
+def export_snapshot(store, path, half=False):
+    """
+    Write the store to `path` one page at a time: each page becomes a chunk of
+    columns (ids, documents, embeddings and one column per metadata key), so
+    memory stays bounded by PAGE_SIZE whatever the store size.
+    """
+    started = time.perf_counter()
+    dtype = np.float16 if half else np.float32
+    count, chunks = 0, 0
+    # Known up front for the flat store; otherwise taken from the first page
+    dim = getattr(store, "dim", None)
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED, allowZip64=True) as archive:
+        while True:
+            page = store.get(limit=PAGE_SIZE, offset=count, include=["embeddings", "documents", "metadatas"])
+            if not page["ids"]:
+                break
+            n = len(page["ids"])
+            embeddings = np.asarray(page["embeddings"], dtype=dtype).reshape(n, -1)
+            dim = embeddings.shape[1]
+            metadatas = page["metadatas"] or [None] * n
+            prefix = f"{chunks:06d}/"
+            _write_strings(archive, prefix + "ids", page["ids"])
+            _write_strings(archive, prefix + "documents", [d or "" for d in page["documents"] or [None] * n])
+            _write_array(archive, prefix + "embeddings", embeddings)
+            # Values are JSON-encoded so ints, floats and bools round-trip; "" means missing
+            for key in sorted({k for m in metadatas if m for k in m}):
+                _write_strings(archive, prefix + META_PREFIX + key,
+                               ["" if (m or {}).get(key) is None else json.dumps(m[key]) for m in metadatas])
+            count += n
+            chunks += 1
+        header = {"version": SNAPSHOT_VERSION, "count": count, "chunks": chunks, "dim": dim or 0}
+        _write_array(archive, "__header__", np.asarray(json.dumps(header)))
+
+    print(f"Exported {count} documents to {path} in {time.perf_counter() - started:.2f}s "
+          f"({os.path.getsize(path) / 1e6:.1f} MB)")
+    return count
+
+
+def iter_snapshot(path):
+    """Yield (ids, documents, embeddings, metadatas) for each chunk of a snapshot."""
+    with np.load(path, allow_pickle=False) as data:
+        header = json.loads(str(data["__header__"]))
+        if header["version"] != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version: {header['version']}")
+        for chunk in range(header["chunks"]):
+            prefix = f"{chunk:06d}/"
+            ids = _read_strings(data, prefix + "ids")
+            documents = [d or None for d in _read_strings(data, prefix + "documents")]
+            embeddings = data[prefix + "embeddings"].astype(np.float32)
+            metadatas = [{} for _ in ids]
+            meta_prefix = prefix + META_PREFIX
+            keys = sorted(
+                name[len(meta_prefix):-len(".offsets")] for name in data.files
+                if name.startswith(meta_prefix) and name.endswith(".offsets")
+            )
+            for key in keys:
+                for metadata, value in zip(metadatas, _read_strings(data, meta_prefix + key)):
+                    if value:
+                        metadata[key] = json.loads(value)
+            yield ids, documents, embeddings, [m or None for m in metadatas]
+
+
+def snapshot_header(path):
+    with np.load(path, allow_pickle=False) as data:
+        return json.loads(str(data["__header__"]))
+
+
+def load_snapshot(path):
+    """The whole snapshot as (ids, documents, embeddings, metadatas)."""
+    ids, documents, embeddings, metadatas = [], [], [], []
+    for chunk_ids, chunk_documents, chunk_embeddings, chunk_metadatas in iter_snapshot(path):
+        ids.extend(chunk_ids)
+        documents.extend(chunk_documents)
+        embeddings.append(chunk_embeddings)
+        metadatas.extend(chunk_metadatas)
+    if not embeddings:
+        return [], [], np.zeros((0, snapshot_header(path)["dim"]), dtype=np.float32), []
+    return ids, documents, np.concatenate(embeddings), metadatas
+
+
+def import_snapshot(store, path, batch_size=PAGE_SIZE):
+    started = time.perf_counter()
+    count = 0
+    for ids, documents, embeddings, metadatas in iter_snapshot(path):
+        for start in range(0, len(ids), batch_size):
+            end = start + batch_size
+            batch = embeddings[start:end]
+            store.upsert(
+                ids=ids[start:end],
+                # Chroma validates embeddings as Python lists; the flat store takes the array as is
+                embeddings=batch if isinstance(store, FlatVectorStore) else batch.tolist(),
+                documents=documents[start:end],
+                metadatas=metadatas[start:end],
+            )
+        count += len(ids)
+    print(f"Imported {count} documents from {path} in {time.perf_counter() - started:.2f}s")
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export or import a vector store snapshot")
+    parser.add_argument("command", choices=["export", "import"])
+    parser.add_argument("path", help="Snapshot .npz file")
+    parser.add_argument("--chroma-path", default=None, help="Use this Chroma directory instead of the configured store")
+    parser.add_argument("--half", action="store_true", help="Store embeddings as float16 (export only)")
+    args = parser.parse_args()
+
+    store = open_store(args.chroma_path)
+    if args.command == "export":
+        export_snapshot(store, args.path, half=args.half)
+    else:
+        import_snapshot(store, args.path)
+        if hasattr(store, "close"):
+            store.close()
+
+
+if __name__ == "__main__":
+    main()
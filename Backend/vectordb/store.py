@@ -0,0 +1,28 @@
+# vectordb/store.py
+
+import threading
+
+from vectordb.config import VECTOR_BACKEND, VECTOR_COLLECTION, FLAT_STORE_PATH, FLAT_STORE_INDEX
+
+_store = None
+# Held by writers and by maintenance across a read-modify-write, so a pass
+# never acts on documents that changed after it read them
+store_lock = threading.RLock()
+
+def get_vector_store():
+    """
+    Return the configured vector store. Both backends expose the Chroma
+    collection API (add, upsert, query, get, update, delete, count), so callers
+    do not need to know which one is active.
+    """
+    global _store
+    if _store is None:
+        if VECTOR_BACKEND == "flat":
+            from vectordb.flat_store import FlatVectorStore
+            _store = FlatVectorStore(FLAT_STORE_PATH, VECTOR_COLLECTION, index=FLAT_STORE_INDEX)
+        elif VECTOR_BACKEND == "chroma":
+            from vectordb.chroma_client import get_chroma_collection
+            _store = get_chroma_collection()
+        else:
+            raise ValueError(f"Unknown VECTOR_BACKEND: {VECTOR_BACKEND}")
+    return _store
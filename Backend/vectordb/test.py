@@ -1,10 +1,11 @@
 # vectordb/test.py
 
 import chromadb
+from vectordb.config import CHROMA_STORE_PATH
 
 try:
-    # Make sure the client path is correct and matches your chroma_client.py
-    client = chromadb.PersistentClient(path="./backend/vector_db/vector_store")
+    # Same path chroma_client.py opens
+    client = chromadb.PersistentClient(path=CHROMA_STORE_PATH)
 
     print("🔍 Existing collections:")
     for col in client.list_collections():